@@ -0,0 +1,202 @@
+import argparse
+import glob
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+from gcode_reader import iter_gcode_file, parse_words
+from simplify import iter_paths
+
+DEFAULT_TOLERANCE = 0.1  # mm; maximum distance between the arc and the original chords
+MIN_ARC_MOVES = 4  # Shortest run of G1 moves worth replacing with one arc
+MAX_RADIUS = 2000.0  # mm; flatter runs are left to the line simplifier
+
+def circle_through(a, b, c):
+    """Center of the circle through three points, or None if they are collinear."""
+    (ax, ay), (bx, by), (cx, cy) = a, b, c
+    d = 2.0 * (ax * (by - cy) + bx * (cy - ay) + cx * (ay - by))
+    if abs(d) < 1e-9:
+        return None
+    a2, b2, c2 = ax * ax + ay * ay, bx * bx + by * by, cx * cx + cy * cy
+    ux = (a2 * (by - cy) + b2 * (cy - ay) + c2 * (ay - by)) / d
+    uy = (a2 * (cx - bx) + b2 * (ax - cx) + c2 * (bx - ax)) / d
+    return ux, uy
+
+def fit_arc(points, start, end, tolerance):
+    """Fit one arc to points[start..end] through both end points.
+
+    Returns (center, ccw, deviation) if every point and every chord between
+    them lies within tolerance of the arc, otherwise None.
+    """
+    pts = points[start:end + 1]
+    center = circle_through(pts[0], pts[len(pts) // 2], pts[-1])
+    if center is None:
+        return None
+    offsets = pts - center
+    dist = np.hypot(offsets[:, 0], offsets[:, 1])
+    radius = dist[0]
+    if radius > MAX_RADIUS:
+        return None
+
+    # Points must advance around the center in one direction, less than a turn
+    angles = np.unwrap(np.arctan2(offsets[:, 1], offsets[:, 0]))
+    steps = np.diff(angles)
+    if not ((steps >= 0).all() or (steps <= 0).all()):
+        return None
+    sweep = angles[-1] - angles[0]
+    if sweep == 0 or abs(sweep) >= 2 * math.pi - 1e-6:
+        return None
+
+    # Radial error of the points plus the sagitta of each chord
+    chords = np.hypot(*np.diff(pts, axis=0).T)
+    sagitta = radius - np.sqrt(np.maximum(radius * radius - (chords / 2) ** 2, 0.0))
+    deviation = max(np.abs(dist - radius).max(), sagitta.max())
+    if deviation > tolerance:
+        return None
+    return center, sweep > 0, deviation
+
+def fit_run(points, tolerance):
+    """Greedily split a polyline into arcs and straight moves.
+
+    Yields ('line', end) or ('arc', start, end, center, ccw, deviation), where
+    end is the index of the point the move ends on and points[0] is the
+    starting position.
+    """
+    n = len(points)
+    start = 0
+    while start < n - 1:
+        end = start + MIN_ARC_MOVES
+        best = fit_arc(points, start, end, tolerance) if end < n else None
+        if best is None:
+            start += 1
+            yield ('line', start)
+            continue
+
+        # Grow the arc by doubling, then binary-search the longest fit
+        good, bad = end, None
+        while bad is None:
+            end = min(start + 2 * (good - start), n - 1)
+            if end == good:
+                break
+            fit = fit_arc(points, start, end, tolerance)
+            if fit is None:
+                bad = end
+            else:
+                good, best = end, fit
+        while bad is not None and bad - good > 1:
+            end = (good + bad) // 2
+            fit = fit_arc(points, start, end, tolerance)
+            if fit is None:
+                bad = end
+            else:
+                good, best = end, fit
+
+        center, ccw, deviation = best
+        yield ('arc', start, good, center, ccw, deviation)
+        start = good
+
+def _with_motion(cmd, arc_active):
+    """Make a command that relies on modal G1 explicit after an arc was emitted."""
+    if not arc_active:
+        return cmd, False
+    words = parse_words(cmd)
+    if any(letter == 'G' and value in (0, 1, 2, 3) for letter, value in words):
+        return cmd, False
+    if any(letter in 'XYZ' for letter, _ in words):
+        return 'G1 ' + cmd, False
+    return cmd, True
+
+def fit_arcs(commands, tolerance=DEFAULT_TOLERANCE, stats=None):
+    """Yield commands with runs of G1 chords replaced by G2/G3 arcs.
+
+    If stats is a dict, its 'input', 'output', 'arcs' and 'max_deviation'
+    entries are updated as the commands are consumed.
+    """
+    if stats is None:
+        stats = {}
+    for key in ('input', 'output', 'arcs', 'max_deviation'):
+        stats.setdefault(key, 0)
+    arc_active = False  # Modal motion is G2/G3 after we emit an arc
+
+    for item in iter_paths(commands):
+        if item[0] == 'cmd':
+            cmd, arc_active = _with_motion(item[1], arc_active)
+            stats['input'] += 1
+            stats['output'] += 1
+            yield cmd
+            continue
+
+        _, anchor, moves = item
+        stats['input'] += len(moves)
+        if anchor is None:
+            # Unknown start position: the first move fixes it
+            cmd, arc_active = _with_motion(moves[0][0], arc_active)
+            stats['output'] += 1
+            yield cmd
+            anchor, moves = moves[0][1:], moves[1:]
+        points = np.array([anchor] + [(x, y) for _, x, y in moves])
+
+        for fit in fit_run(points, tolerance):
+            stats['output'] += 1
+            if fit[0] == 'line':
+                cmd, arc_active = _with_motion(moves[fit[1] - 1][0], arc_active)
+                yield cmd
+                continue
+            _, start, end, (cx, cy), ccw, deviation = fit
+            (px, py), (x, y) = points[start], points[end]
+            yield (f"{'G3' if ccw else 'G2'} X{x:.3f} Y{y:.3f} "
+                   f"I{cx - px:.3f} J{cy - py:.3f}")
+            arc_active = True
+            stats['arcs'] += 1
+            stats['max_deviation'] = max(stats['max_deviation'], deviation)
+
+def fit_file(gcode_file, tolerance=DEFAULT_TOLERANCE, output_file=None):
+    """Arc-fit one file; returns the stats dict from fit_arcs()."""
+    stats = {}
+    commands = fit_arcs(iter_gcode_file(gcode_file), tolerance, stats)
+    if output_file:
+        with open(output_file, 'w') as f:
+            for cmd in commands:
+                f.write(cmd + '\n')
+    else:
+        for _ in commands:
+            pass
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Replace runs of short G1 chords with G2/G3 arcs")
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Maximum deviation from the original path in mm (default {DEFAULT_TOLERANCE})")
+    parser.add_argument('-o', '--output-dir', type=str, help="Write arc-fitted files to this directory")
+    parser.add_argument('gcode_files', nargs='*', help="G-code file(s) (default: patterns/*.gcode)")
+    args = parser.parse_args()
+
+    gcode_files = args.gcode_files or sorted(glob.glob(os.path.join('patterns', '*.gcode')))
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    total_in = total_out = 0
+    start_time = time.perf_counter()
+    for gcode_file in gcode_files:
+        output_file = os.path.join(args.output_dir, os.path.basename(gcode_file)) if args.output_dir else None
+        try:
+            stats = fit_file(gcode_file, args.tolerance, output_file)
+        except FileNotFoundError as e:
+            print(e)
+            continue
+        total_in += stats['input']
+        total_out += stats['output']
+        ratio = stats['input'] / stats['output'] if stats['output'] else 1.0
+        print(f"{gcode_file}: {stats['input']} -> {stats['output']} lines, {stats['arcs']} arcs, "
+              f"{ratio:.2f}x, max deviation {stats['max_deviation']:.3f} mm")
+
+    if not total_in:
+        sys.exit(1)
+    print(f"Total: {total_in} -> {total_out} lines ({total_in / total_out:.2f}x) "
+          f"in {time.perf_counter() - start_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import contextlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from itertools import islice
+
+from gcode_reader import iter_gcode_file
+from latency import LatencyRecorder
+from send import connect_grbl, send_gcode, stream_gcode
+
+def start_simulator(baud, speedup):
+    """Run grbl_sim.py in its own process and return (process, port)."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grbl_sim.py')
+    process = subprocess.Popen([sys.executable, script, '--baud', str(baud), '--speedup', str(speedup)],
+                               stdout=subprocess.PIPE, text=True)
+    banner = process.stdout.readline().strip()
+    return process, banner.rsplit(' ', 1)[-1]
+
+def stop_simulator(process):
+    """Stop the simulator and return its stats."""
+    process.send_signal(signal.SIGINT)
+    output, _ = process.communicate(timeout=10)
+    return json.loads(output.strip().splitlines()[-1])
+
+def benchmark(commands, baud=115200, speedup=1.0, stream=True, quiet=True):
+    """Send commands to a fresh simulator; returns a dict of results."""
+    process, port = start_simulator(baud, speedup)
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')) if quiet else contextlib.nullcontext():
+            ser = connect_grbl(port)
+            latency = LatencyRecorder()
+            sender = stream_gcode if stream else send_gcode
+            start_time = time.perf_counter()
+            ok = sender(commands, ser, total=len(commands), latency=latency)
+            elapsed = time.perf_counter() - start_time
+        ser.close()
+    finally:
+        stats = stop_simulator(process)
+
+    return {
+        'ok': ok,
+        'lines': len(commands),
+        'seconds': elapsed,
+        'lines_per_second': len(commands) / elapsed if elapsed else 0.0,
+        'latency': latency,
+        'controller': stats,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark send.py against the simulated GRBL controller")
+    parser.add_argument('--lines', type=int, default=2000, help="Send at most this many lines per file (default 2000)")
+    parser.add_argument('--speedup', type=float, default=20.0,
+                        help="Run motion this many times faster than real time (default 20)")
+    parser.add_argument('--baud', type=int, default=115200, help="Baud rate to model (default 115200)")
+    parser.add_argument('--ping-pong', action='store_true', help="Benchmark send-and-wait instead of streaming")
+    parser.add_argument('--verbose', action='store_true', help="Show the sender's output")
+    parser.add_argument('gcode_files', nargs='*', help="G-code file(s) (default: patterns/zen.gcode)")
+    args = parser.parse_args()
+
+    gcode_files = args.gcode_files or [os.path.join('patterns', 'zen.gcode')]
+    for gcode_file in gcode_files:
+        try:
+            commands = list(islice(iter_gcode_file(gcode_file), args.lines))
+        except FileNotFoundError as e:
+            print(e)
+            continue
+        result = benchmark(commands, args.baud, args.speedup, not args.ping_pong, not args.verbose)
+        controller = result['controller']
+        mode = 'ping-pong' if args.ping_pong else 'stream'
+        print(f"{gcode_file} ({mode}, {args.speedup:g}x): {result['lines']} lines in {result['seconds']:.2f}s, "
+              f"{result['lines_per_second']:.0f} lines/s{'' if result['ok'] else ' (FAILED)'}")
+        print(result['latency'].report())
+        print(f"  Planner starved {controller['starved_seconds']:.2f}s, "
+              f"RX buffer peak {controller['max_rx_fill']} bytes, "
+              f"{controller['rx_overflow_bytes']} bytes overflowed, {controller['errors']} errors")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import json
+import os
+import time
+from collections import deque
+
+from compact import format_number
+from gcode_reader import parse_words
+from pattern_cache import file_digest
+
+CHECKPOINT_DIR = os.path.expanduser('~/.cache/sand/checkpoints')
+SAVE_INTERVAL = 2.0  # Seconds between checkpoint writes during a run
+# Lines GRBL has acknowledged may still be waiting in its 15-block planner,
+# so a resume starts this many lines before the last 'ok'
+BACKOFF_LINES = 15
+MOTION_G = {0, 1, 2, 3}
+
+def _path(gcode_file, checkpoint_dir=CHECKPOINT_DIR):
+    name = os.path.abspath(gcode_file).strip(os.sep).replace(os.sep, '_')
+    return os.path.join(checkpoint_dir, name + '.json')
+
+def _options(preprocess):
+    """Options that change the command list; the cache only changes where it comes from."""
+    return {key: value for key, value in preprocess.items() if value and key != 'cache'}
+
+def initial_state():
+    """Modal state at power-up: G0, absolute, mm, XY plane, no feed, unknown position."""
+    return {'motion': 0, 'absolute': True, 'units': 21, 'plane': 17, 'feed': None, 'x': None, 'y': None}
+
+def next_state(state, cmd):
+    """Modal state after cmd; state is not modified."""
+    words = parse_words(cmd)
+    if not words:
+        return state
+    state = dict(state)
+    for letter, value in words:
+        if letter == 'G':
+            if value in MOTION_G:
+                state['motion'] = int(value)
+            elif value in (90, 91):
+                state['absolute'] = value == 90
+            elif value in (20, 21):
+                state['units'] = int(value)
+            elif value in (17, 18, 19):
+                state['plane'] = int(value)
+            elif value in (10, 28, 30, 92):
+                # Coordinate changes and homing moves lose track of position
+                state['x'] = state['y'] = None
+                return state
+        elif letter == 'F':
+            state['feed'] = value
+        elif letter in 'XY':
+            axis = letter.lower()
+            if state['absolute']:
+                state[axis] = value
+            elif state[axis] is not None:
+                state[axis] += value
+    return state
+
+class Checkpoint:
+    """Persistent record of how far a file got, updated as lines are acknowledged.
+
+    The record is rewritten at most every SAVE_INTERVAL seconds with a
+    rename over the old one, without fsync: a crash loses a few seconds of
+    progress, never the whole record.
+    """
+
+    def __init__(self, gcode_file, preprocess=None, total=None, line=0, state=None,
+                 checkpoint_dir=CHECKPOINT_DIR):
+        self.path = _path(gcode_file, checkpoint_dir)
+        self.record = {
+            'file': os.path.abspath(gcode_file),
+            'digest': file_digest(gcode_file),
+            'options': _options(preprocess or {}),
+            'total': total,
+        }
+        self.state = state or initial_state()
+        # (line, state after it) for the last BACKOFF_LINES + 1 acknowledged lines
+        self.history = deque([(line, self.state)], maxlen=BACKOFF_LINES + 1)
+        self.next_save = time.monotonic() + SAVE_INTERVAL
+
+    def ack(self, i, cmd):
+        """Line i was acknowledged with 'ok'."""
+        self.state = next_state(self.state, cmd)
+        self.history.append((i, self.state))
+        if time.monotonic() >= self.next_save:
+            self.save()
+
+    def save(self, done=False):
+        """Write the checkpoint; the resume point is the oldest line in history."""
+        line, state = self.history[-1] if done else self.history[0]
+        record = dict(self.record, line=line, acked=self.history[-1][0], state=state, done=done,
+                      time=round(time.time(), 3))
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(record, f)
+        os.replace(tmp, self.path)
+        self.next_save = time.monotonic() + SAVE_INTERVAL
+
+def load_checkpoint(gcode_file, preprocess=None, checkpoint_dir=CHECKPOINT_DIR):
+    """The checkpoint for a file, or None if there is none or the file or options changed."""
+    path = _path(gcode_file, checkpoint_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if record['digest'] != file_digest(gcode_file) or record['options'] != _options(preprocess or {}):
+        return None
+    return record
+
+def restore_commands(record):
+    """Commands that put a freshly reset GRBL back in the checkpoint's state.
+
+    Returns (commands, motion) where motion is the motion mode they leave
+    active. The move to the resume point runs at the pattern's feed rate,
+    since a rapid would plough through the sand just the same.
+    """
+    state = record['state']
+    commands = [f"G{state['units']}", f"G{state['plane']}", 'G90']
+    motion = 0  # GRBL's power-up motion mode
+    if state['x'] is not None and state['y'] is not None:
+        feed = f" F{format_number(state['feed'])}" if state['feed'] else ''
+        commands.append(f"G1 X{format_number(state['x'])} Y{format_number(state['y'])}{feed}")
+        motion = 1
+    elif state['feed']:
+        commands.append(f"F{format_number(state['feed'])}")
+    if not state['absolute']:
+        commands.append('G91')
+    return commands, motion
+
+def with_motion(commands, motion, active):
+    """Give the first move an explicit motion word if it relies on a modal one other than active."""
+    pending = motion != active
+    for cmd in commands:
+        if pending:
+            words = parse_words(cmd)
+            if any(letter == 'G' and value in MOTION_G for letter, value in words):
+                pending = False
+            elif any(letter in 'XYZ' for letter, _ in words):
+                cmd = f"G{motion} {cmd}"
+                pending = False
+        yield cmd
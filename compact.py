@@ -0,0 +1,245 @@
+import argparse
+import glob
+import math
+import os
+import sys
+
+from gcode_reader import WORD, iter_gcode_file, parse_words
+
+MOTION_G = {0, 1, 2, 3}
+# Modal G codes we track: plane, units and distance mode
+MODAL_G = {17, 18, 19, 20, 21, 90, 91}
+AXES = 'XYZ'
+# Word order on output: motion and modal G codes, axes, arc offsets, feed, rest
+WORD_ORDER = 'GXYZIJKFRPSMT'
+
+def format_number(value):
+    """Shortest decimal form of a value, e.g. 426.040 -> '426.04', 0.5 -> '.5'."""
+    text = f"{value:.6f}".rstrip('0').rstrip('.')
+    if text in ('', '-0', '-'):
+        return '0'
+    if text.startswith('0.'):
+        return text[1:]
+    if text.startswith('-0.'):
+        return '-' + text[2:]
+    return text
+
+def format_steps(steps, steps_per_mm):
+    """Shortest decimal that GRBL rounds back to the same step count."""
+    for decimals in range(7):
+        value = round(steps / steps_per_mm, decimals)
+        # Stay clear of the half-step boundary so float32 rounding agrees
+        if abs(value * steps_per_mm - steps) < 0.45:
+            return format_number(value)
+    return format_number(steps / steps_per_mm)
+
+class CompactState:
+    """Modal state needed to decide which words are redundant."""
+
+    def __init__(self):
+        self.source_motion = None  # Motion mode as the input means it
+        self.motion = None  # Motion mode the controller has been sent
+        self.absolute = None
+        self.units = None
+        self.plane = None
+        self.feed = None
+        self.position = {}  # axis -> mm value the controller was last sent
+        self.source_position = {}  # axis -> mm value the input asked for
+
+    def forget_position(self):
+        self.position = {}
+        self.source_position = {}
+
+def _join(words):
+    """Concatenate (letter, text) words without spaces in WORD_ORDER."""
+    words = sorted(words, key=lambda word: WORD_ORDER.find(word[0]) if word[0] in WORD_ORDER else len(WORD_ORDER))
+    return ''.join(letter + text for letter, text in words)
+
+def compact_command(cmd, state, steps_per_mm=None):
+    """Serialize one command with redundant words removed.
+
+    Returns the new command text, or '' when nothing is left to send.
+    """
+    if cmd.startswith('$') or WORD.sub('', cmd).strip():
+        # System commands and anything we can't parse go through untouched
+        state.forget_position()
+        return cmd
+
+    words = parse_words(cmd)
+    gcodes = [value for letter, value in words if letter == 'G']
+    explicit_motion = [g for g in gcodes if g in MOTION_G]
+    if explicit_motion:
+        state.source_motion = explicit_motion[-1]
+
+    if any(g not in MOTION_G | MODAL_G for g in gcodes):
+        # Dwell, G10, G28, G53, G92...: axis words belong to the command, so
+        # only normalize it; coordinate changes invalidate the known position
+        if explicit_motion:
+            state.motion = state.source_motion
+        state.forget_position()
+        return _join([(letter, format_number(value)) for letter, value in words])
+
+    out = []
+    for g in gcodes:
+        if g in (90, 91):
+            if state.absolute == (g == 90):
+                continue
+            state.absolute = g == 90
+        elif g in (20, 21):
+            if state.units == g:
+                continue
+            state.units = g
+            state.forget_position()
+        elif g in (17, 18, 19):
+            if state.plane == g:
+                continue
+            state.plane = g
+        else:
+            continue  # Motion words are added below only when needed
+        out.append(('G', format_number(g)))
+
+    values = {letter: value for letter, value in words if letter != 'G'}
+    axis_words = [axis for axis in AXES if axis in values]
+    axes = []
+    start = dict(state.position)
+    source_start = dict(state.source_position)
+    for axis in axis_words:
+        value = values.pop(axis)
+        if not state.absolute:
+            # Relative (or unknown) mode: every word counts
+            axes.append((axis, format_number(value)))
+            continue
+        state.source_position[axis] = value
+        current = state.position.get(axis)
+        if steps_per_mm:
+            steps = round(value * steps_per_mm)
+            if current is not None and round(current * steps_per_mm) == steps:
+                continue
+            text = format_steps(steps, steps_per_mm)
+        else:
+            if current == value:
+                continue
+            text = format_number(value)
+        axes.append((axis, text))
+        state.position[axis] = float(text)
+
+    arc = state.source_motion in (2, 3) and bool(axis_words)
+    if arc and not axes:
+        # A full circle ends where it starts, but GRBL needs an axis word
+        axis = axis_words[0]
+        axes.append((axis, format_number(state.position[axis])))
+    if arc and steps_per_mm and 'R' not in values and state.plane in (None, 17):
+        _recenter_arc(values, start, source_start, state.position)
+    if not state.absolute:
+        state.forget_position()
+
+    if axes:
+        if state.motion != state.source_motion:
+            out.append(('G', format_number(state.source_motion)))
+            state.motion = state.source_motion
+        out += axes
+    if 'F' in values:
+        feed = values.pop('F')
+        if feed != state.feed:
+            out.append(('F', format_number(feed)))
+            state.feed = feed
+    # Arc offsets belong to the move and go if it was dropped; spindle,
+    # M codes etc. are always kept
+    out += [(letter, format_number(value)) for letter, value in values.items()
+            if axes or not axis_words or letter not in 'IJKR']
+
+    return _join(out)
+
+def _recenter_arc(values, start, source_start, end):
+    """Move an arc's center so it stays equidistant from quantized end points.
+
+    GRBL rejects arcs whose start and end radii disagree by more than
+    0.005 mm, so after snapping both ends to whole steps the center is
+    projected onto their perpendicular bisector.
+    """
+    try:
+        sx, sy = start['X'], start['Y']
+        ex, ey = end['X'], end['Y']
+        cx = source_start['X'] + values.get('I', 0.0)
+        cy = source_start['Y'] + values.get('J', 0.0)
+    except KeyError:
+        return
+    dx, dy = ex - sx, ey - sy
+    length = math.hypot(dx, dy)
+    if length > 0:
+        mx, my = (sx + ex) / 2, (sy + ey) / 2
+        nx, ny = -dy / length, dx / length
+        along = (cx - mx) * nx + (cy - my) * ny
+        cx, cy = mx + nx * along, my + ny * along
+    values['I'] = round(cx - sx, 4)
+    values['J'] = round(cy - sy, 4)
+
+def compact_commands(commands, steps_per_mm=None, stats=None):
+    """Yield minimal serializations of commands, dropping those that do nothing.
+
+    With steps_per_mm, axis targets are quantized to whole steps, which is
+    what GRBL does anyway, so the machine moves exactly as before. If stats
+    is a dict, its line and byte counters are updated as commands are consumed.
+    """
+    if stats is None:
+        stats = {}
+    for key in ('input_lines', 'output_lines', 'input_bytes', 'output_bytes'):
+        stats.setdefault(key, 0)
+    state = CompactState()
+
+    for cmd in commands:
+        stats['input_lines'] += 1
+        stats['input_bytes'] += len(cmd) + 1
+        compacted = compact_command(cmd, state, steps_per_mm)
+        if not compacted:
+            continue
+        stats['output_lines'] += 1
+        stats['output_bytes'] += len(compacted) + 1
+        yield compacted
+
+def compact_file(gcode_file, steps_per_mm=None, output_file=None):
+    """Compact one file; returns the stats dict from compact_commands()."""
+    stats = {}
+    commands = compact_commands(iter_gcode_file(gcode_file), steps_per_mm, stats)
+    if output_file:
+        with open(output_file, 'w') as f:
+            for cmd in commands:
+                f.write(cmd + '\n')
+    else:
+        for _ in commands:
+            pass
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Rewrite G-code with the fewest bytes for the same motion")
+    parser.add_argument('--steps-per-mm', type=float,
+                        help="Quantize axes to the machine's step resolution (GRBL $100/$101)")
+    parser.add_argument('-o', '--output-dir', type=str, help="Write compacted files to this directory")
+    parser.add_argument('gcode_files', nargs='*', help="G-code file(s) (default: patterns/*.gcode)")
+    args = parser.parse_args()
+
+    gcode_files = args.gcode_files or sorted(glob.glob(os.path.join('patterns', '*.gcode')))
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    total_in = total_out = 0
+    for gcode_file in gcode_files:
+        output_file = os.path.join(args.output_dir, os.path.basename(gcode_file)) if args.output_dir else None
+        try:
+            stats = compact_file(gcode_file, args.steps_per_mm, output_file)
+        except FileNotFoundError as e:
+            print(e)
+            continue
+        total_in += stats['input_bytes']
+        total_out += stats['output_bytes']
+        saved = stats['input_bytes'] - stats['output_bytes']
+        percent = 100.0 * saved / stats['input_bytes'] if stats['input_bytes'] else 0.0
+        print(f"{gcode_file}: {stats['input_bytes']} -> {stats['output_bytes']} bytes "
+              f"({saved} saved, {percent:.1f}%), {stats['input_lines']} -> {stats['output_lines']} lines")
+
+    if not total_in:
+        sys.exit(1)
+    print(f"Total: {total_in} -> {total_out} bytes ({100.0 * (total_in - total_out) / total_in:.1f}% saved)")
+
+if __name__ == "__main__":
+    main()
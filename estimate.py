@@ -0,0 +1,242 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from gcode_parser import parse_gcode, segment_lengths
+
+# $110/$111 max rate (mm/min), $120/$121 acceleration (mm/s^2), $11 junction
+# deviation and $12 arc tolerance (mm). Used when the controller's own $$
+# dump is not available; measure yours with '$$' and save it with --settings.
+DEFAULT_SETTINGS = {11: 0.010, 12: 0.002, 110: 4000.0, 111: 4000.0, 120: 100.0, 121: 100.0}
+PLANNER_BLOCKS = 15  # GRBL's 16-block planner buffer keeps one slot free
+SETTING = re.compile(r'^\s*\$(\d+)\s*=\s*([-+]?[\d.]+)', re.MULTILINE)
+
+PLAN_DTYPE = np.dtype([
+    ('length', np.float64),  # mm
+    ('nominal', np.float64),  # Cruise speed in mm/s
+    ('entry', np.float64),  # Planned speed at the start of the move, mm/s
+    ('exit', np.float64),  # ... and at its end
+    ('time', np.float64),  # Seconds
+])
+
+def parse_settings(text):
+    """Read '$n=value' lines (GRBL's $$ output) into {n: value} over the defaults."""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update((int(n), float(value)) for n, value in SETTING.findall(text))
+    return settings
+
+def load_settings(file_path):
+    """Read GRBL settings from a file holding a saved '$$' dump."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Settings file '{file_path}' not found")
+    with open(file_path, 'r') as f:
+        return parse_settings(f.read())
+
+def read_settings(ser, timeout=5):
+    """Ask GRBL for its settings with '$$'; falls back to defaults on silence.
+
+    Gives up after timeout seconds in all: each read waits no longer than
+    what is left of it, whatever the port's own timeout.
+    """
+    ser.flushInput()
+    ser.write(b'$$\n')
+    lines = []
+    port_timeout = ser.timeout
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            ser.timeout = remaining
+            line = ser.readline().decode().strip()
+            if line == 'ok' or line.lower().startswith('error'):
+                break
+            if line:
+                lines.append(line)
+    finally:
+        ser.timeout = port_timeout
+    return parse_settings('\n'.join(lines))
+
+def _limit_by_axis(limits, ux, uy):
+    """Largest vector magnitude along (ux, uy) that keeps each axis within its limit."""
+    with np.errstate(divide='ignore'):
+        lx = np.where(ux != 0, limits[0] / np.abs(ux), np.inf)
+        ly = np.where(uy != 0, limits[1] / np.abs(uy), np.inf)
+    return np.minimum(lx, ly)
+
+def _junction_speed_sqr(u, w, accel, deviation):
+    """GRBL's junction deviation limit between exit direction u and entry direction w."""
+    cos_theta = -np.einsum('ij,ij->i', u, w)
+    junction = w - u
+    norm = np.hypot(junction[:, 0], junction[:, 1])
+    norm[norm == 0] = 1.0
+    accel = _limit_by_axis(accel, junction[:, 0] / norm, junction[:, 1] / norm)
+    sin_theta_d2 = np.sqrt(np.clip(0.5 * (1.0 - cos_theta), 0.0, 1.0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        speed_sqr = accel * deviation * sin_theta_d2 / (1.0 - sin_theta_d2)
+    speed_sqr[cos_theta > 0.999999] = 0.0  # Reversal
+    speed_sqr[cos_theta < -0.999999] = np.inf  # Straight on
+    return speed_sqr
+
+def plan_moves(moves, settings=None, start=None, planner_blocks=PLANNER_BLOCKS):
+    """Simulate GRBL's planner over a MOVE_DTYPE array; returns a PLAN_DTYPE array.
+
+    Junction speeds follow GRBL's junction deviation rule and each move gets a
+    trapezoidal (or triangular) velocity profile. The look-ahead passes are
+    cumulative minima over v^2 + 2*a*s rather than a loop over moves, and no
+    junction is planned faster than the machine could stop within the next
+    planner_blocks blocks, as GRBL's finite buffer demands. The job starts and
+    ends at rest, and the sender is assumed to keep the buffer full.
+    """
+    settings = settings or DEFAULT_SETTINGS
+    rate = np.array([settings[110], settings[111]]) / 60.0
+    accel = np.array([settings[120], settings[121]], dtype=np.float64)
+    deviation = settings[11]
+    arc_tolerance = settings[12]
+
+    plan = np.zeros(len(moves), dtype=PLAN_DTYPE)
+    if not len(moves):
+        return plan
+    lengths = segment_lengths(moves, start)
+    plan['length'] = lengths
+    live = lengths > 0  # GRBL drops moves without steps
+    if not live.any():
+        return plan
+
+    x, y = moves['x'], moves['y']
+    px = np.empty_like(x)
+    py = np.empty_like(y)
+    px[1:], py[1:] = x[:-1], y[:-1]
+    px[:1], py[:1] = (start if start is not None else (x[:1], y[:1]))
+    px, py = np.nan_to_num(px), np.nan_to_num(py)
+    x, y = np.nan_to_num(x), np.nan_to_num(y)
+    m = moves[live]
+    x, y, px, py = x[live], y[live], px[live], py[live]
+    length = lengths[live]
+    motion = m['motion']
+    arcs = np.isin(motion, (2, 3))
+
+    # Entry and exit directions; lines keep theirs, arcs follow the tangent
+    entry_dir = np.column_stack([x - px, y - py]) / length[:, None]
+    exit_dir = entry_dir.copy()
+    radius = np.hypot(m['i'], m['j'])
+    if arcs.any():
+        sign = np.where(motion[arcs] == 3, 1.0, -1.0)[:, None]
+        r0 = np.column_stack([-m['i'][arcs], -m['j'][arcs]])
+        r1 = np.column_stack([x[arcs] - px[arcs] - m['i'][arcs], y[arcs] - py[arcs] - m['j'][arcs]])
+        entry_dir[arcs] = sign * np.column_stack([-r0[:, 1], r0[:, 0]]) / radius[arcs, None]
+        exit_dir[arcs] = sign * np.column_stack([-r1[:, 1], r1[:, 0]]) / radius[arcs, None]
+
+    # Per-move limits; an arc's direction turns, so it gets the tighter axis
+    block_accel = np.where(arcs, accel.min(), _limit_by_axis(accel, entry_dir[:, 0], entry_dir[:, 1]))
+    max_rate = np.where(arcs, rate.min(), _limit_by_axis(rate, entry_dir[:, 0], entry_dir[:, 1]))
+    feed = m['feed'] / 60.0
+    rapid = (motion <= 0) | np.isnan(feed)  # G0 (also GRBL's power-up mode) runs at max rate
+    nominal = np.where(rapid, max_rate, np.minimum(np.nan_to_num(feed), max_rate))
+
+    # GRBL cuts arcs into chords within $12; every chord is a planner block
+    # and the junctions between chords cap the speed through the arc
+    blocks = np.ones(len(m))
+    if arcs.any():
+        r = radius[arcs]
+        chord = np.sqrt(np.maximum(arc_tolerance * (2 * r - arc_tolerance), 1e-12))
+        segments = np.maximum(np.floor(length[arcs] / chord), 1)
+        half_angle = length[arcs] / r / segments / 2
+        blocks[arcs] = segments
+        with np.errstate(divide='ignore'):
+            chord_sqr = accel.min() * deviation * np.cos(half_angle) / (1.0 - np.cos(half_angle))
+        nominal[arcs] = np.minimum(nominal[arcs], np.sqrt(chord_sqr))
+
+    # Limits at each junction: start, between moves, end
+    limit = np.zeros(len(m) + 1)
+    limit[1:-1] = np.minimum(_junction_speed_sqr(exit_dir[:-1], entry_dir[1:], accel, deviation),
+                             np.minimum(nominal[:-1], nominal[1:]) ** 2)
+
+    # reach[k] = sum of 2*a*L over the moves before junction k: the most v^2
+    # can change between two junctions is the difference of their reach
+    reach = np.concatenate([[0.0], np.cumsum(2 * block_accel * length)])
+    backward = np.minimum.accumulate((limit + reach)[::-1])[::-1] - reach
+    forward = np.minimum.accumulate(limit - reach) + reach
+    count = np.concatenate([[0.0], np.cumsum(blocks)])
+    window = np.interp(count + planner_blocks, count, reach) - reach
+    speed_sqr = np.maximum(np.minimum.reduce([limit, backward, forward, window]), 0.0)
+
+    v0, v1 = np.sqrt(speed_sqr[:-1]), np.sqrt(speed_sqr[1:])
+    a = block_accel
+    accelerate = (nominal ** 2 - v0 ** 2) / (2 * a)
+    decelerate = (nominal ** 2 - v1 ** 2) / (2 * a)
+    cruise = length - accelerate - decelerate
+    peak = np.where(cruise >= 0, nominal,
+                    np.maximum(np.sqrt(np.maximum((2 * a * length + v0 ** 2 + v1 ** 2) / 2, 0.0)),
+                               np.maximum(v0, v1)))
+    duration = (peak - v0) / a + (peak - v1) / a + np.maximum(cruise, 0.0) / nominal
+
+    plan['nominal'][live] = nominal
+    plan['entry'][live] = v0
+    plan['exit'][live] = v1
+    plan['time'][live] = duration
+    return plan
+
+def command_schedule(moves, total, settings=None, start=None):
+    """Seconds of motion up to and including each command, indexed 0..total.
+
+    moves must come from gcode_parser.parse_commands(), whose 'line' field
+    is the 1-based command index, so schedule[-1] - schedule[i] is the time
+    left once command i has run.
+    """
+    done = np.zeros(total + 1)
+    np.add.at(done, np.minimum(moves['line'], total), plan_moves(moves, settings, start)['time'])
+    return np.cumsum(done)
+
+def format_duration(seconds):
+    """'1:02:03' or '2:03' for a number of seconds."""
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate G-code run times by simulating GRBL's motion planner")
+    parser.add_argument('--settings', type=str, help="File with GRBL '$$' output (default: built-in settings)")
+    parser.add_argument('--segments', action='store_true', help="Print the plan for every move")
+    parser.add_argument('gcode_files', nargs='*', help="G-code file(s) (default: patterns/*.gcode)")
+    args = parser.parse_args()
+
+    try:
+        settings = load_settings(args.settings) if args.settings else DEFAULT_SETTINGS
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+    gcode_files = args.gcode_files or sorted(glob.glob(os.path.join('patterns', '*.gcode')))
+
+    total_time = 0.0
+    start_time = time.perf_counter()
+    for gcode_file in gcode_files:
+        try:
+            moves = parse_gcode(gcode_file)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"{gcode_file}: {e}")
+            continue
+        plan = plan_moves(moves, settings)
+        if args.segments:
+            for move, step in zip(moves, plan):
+                print(f"{gcode_file}:{move['line']}: G{move['motion']} {step['length']:.3f} mm "
+                      f"{step['entry']:.1f} -> {step['nominal']:.1f} -> {step['exit']:.1f} mm/s, "
+                      f"{step['time']:.3f} s")
+        seconds = plan['time'].sum()
+        total_time += seconds
+        moving = plan['time'] > 0
+        average = plan['length'].sum() / seconds if seconds else 0.0
+        print(f"{gcode_file}: {format_duration(seconds)} for {moving.sum()} moves, "
+              f"{plan['length'].sum() / 1000:.2f} m at {average:.1f} mm/s average")
+
+    print(f"Total: {format_duration(total_time)} "
+          f"(estimated in {time.perf_counter() - start_time:.2f}s)")
+
+if __name__ == "__main__":
+    main()
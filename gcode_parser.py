@@ -0,0 +1,210 @@
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from sdf_render import is_sdf, sdf_commands
+
+COMMENT = re.compile(rb'\([^)\n]*\)|;[^\n]*')
+# Byte -> bool lookup tables, cheaper than np.isin on every byte
+IS_LETTER = np.zeros(256, dtype=bool)
+IS_LETTER[np.frombuffer(b'GXYFIJ', dtype=np.uint8)] = True
+IS_NUMBER = np.zeros(256, dtype=bool)
+IS_NUMBER[np.frombuffer(b'0123456789.-+', dtype=np.uint8)] = True
+IS_DIGIT = np.zeros(256, dtype=bool)
+IS_DIGIT[np.frombuffer(b'0123456789', dtype=np.uint8)] = True
+DIGIT_VALUE = np.maximum(np.arange(256, dtype=np.int64) - 48, 0) * IS_DIGIT
+POW10 = 10 ** np.arange(19, dtype=np.int64)
+# G codes whose axis words are not a move target
+NON_MOVE_G = (10, 28, 30, 92)
+MM_PER_INCH = 25.4
+
+MOVE_DTYPE = np.dtype([
+    ('line', np.int32),  # 1-based source line number
+    ('motion', np.int8),  # 0-3 for G0-G3, -1 if no motion mode was set yet
+    ('x', np.float64),  # Target in mm (NaN while the axis is still unknown)
+    ('y', np.float64),
+    ('i', np.float64),  # Arc center offsets in mm (0 for straight moves)
+    ('j', np.float64),
+    ('feed', np.float64),  # Modal feed rate in mm/min (NaN if never set)
+])
+
+def _last_value(word_lines, word_values, lines, default=np.nan):
+    """For each line, the value of the latest word at or before it (forward fill)."""
+    idx = np.searchsorted(word_lines, lines, side='right') - 1
+    if not len(word_values):
+        return np.full(len(lines), default, dtype=np.float64)
+    out = word_values[np.maximum(idx, 0)].astype(np.float64)
+    out[idx < 0] = default
+    return out
+
+def _same_line_value(word_lines, word_values, lines):
+    """For each line, the value of a word on that very line, or 0."""
+    idx = np.searchsorted(word_lines, lines, side='right') - 1
+    if not len(word_values):
+        return np.zeros(len(lines))
+    found = (idx >= 0) & (word_lines[np.maximum(idx, 0)] == lines)
+    return np.where(found, word_values[np.maximum(idx, 0)], 0.0)
+
+def parse_words_array(data):
+    """Find every G/X/Y/F/I/J word in cleaned, uppercase G-code bytes.
+
+    Returns (letters, values, lines) arrays. Numbers are decoded with array
+    arithmetic: digits are summed into an integer mantissa and divided by a
+    power of ten, which gives the same float as float() on the text.
+    """
+    buf = np.frombuffer(data + b'\n', dtype=np.uint8)
+    is_number = IS_NUMBER[buf]
+    starts = np.flatnonzero(IS_LETTER[buf[:-1]] & is_number[1:]) + 1
+    stops = np.flatnonzero(~is_number)
+    ends = stops[np.searchsorted(stops, starts)]
+
+    # Every byte of every number, tagged with its word
+    sizes = ends - starts
+    offsets = np.cumsum(sizes) - sizes
+    word = np.repeat(np.arange(len(starts)), sizes)
+    chars = buf[np.arange(sizes.sum()) + (starts - offsets)[word]]
+
+    is_digit = IS_DIGIT[chars]
+    digits_through = np.cumsum(is_digit)  # Digits up to and including this byte
+    digits_end = digits_through[offsets + sizes - 1]  # ... up to the end of each word
+    exponent = np.minimum(digits_end[word] - digits_through, 18)
+    mantissa = np.add.reduceat(DIGIT_VALUE[chars] * POW10[exponent], offsets)
+
+    # Digits after the decimal point set the divisor
+    dots = np.flatnonzero(chars == 46)
+    fraction = np.zeros(len(starts), dtype=np.int64)
+    fraction[word[dots]] = digits_end[word[dots]] - digits_through[dots]
+    values = mantissa / 10.0 ** fraction
+    values[chars[offsets] == 45] *= -1
+
+    letters = buf[starts - 1]
+    lines = np.searchsorted(np.flatnonzero(buf == 10), starts) + 1
+    return letters, values, lines
+
+def parse_text(data):
+    """Parse G-code text (bytes or str) into a MOVE_DTYPE array, one row per move.
+
+    Words are case-insensitive and ( ... ) and ; comments are ignored. Modal
+    motion, feed, units and unchanged axes are resolved with array lookups
+    instead of a Python loop over lines.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    data = data.upper()
+    if b';' in data or b'(' in data:
+        data = COMMENT.sub(b'', data)
+    letters, values, lines = parse_words_array(data.translate(None, b' \t\r'))
+    if not len(letters):
+        return np.zeros(0, dtype=MOVE_DTYPE)
+
+    def column(letter, mask=None):
+        select = letters == ord(letter)
+        if mask is not None:
+            select &= mask
+        return lines[select], values[select]
+
+    g_lines, g_values = column('G')
+    if (g_values == 91).any():
+        raise ValueError("Relative (G91) moves are not supported")
+    units = np.isin(g_values, (20, 21))
+    if (g_values[units] == 20).any():
+        # Convert inch words to mm using the units in force on their line
+        inches = _last_value(g_lines[units], g_values[units], lines, default=21) == 20
+        values = np.where(inches & (letters != ord('G')), values * MM_PER_INCH, values)
+
+    # Axis words on G10/G28/G30/G92 lines are not move targets
+    special = g_lines[np.isin(g_values, NON_MOVE_G)]
+    target = ~np.isin(lines, special) if len(special) else None
+    x_lines, x_values = column('X', target)
+    y_lines, y_values = column('Y', target)
+    has_axis = np.zeros(lines[-1] + 1, dtype=bool)
+    has_axis[x_lines] = True
+    has_axis[y_lines] = True
+    move_lines = np.flatnonzero(has_axis)
+
+    motion_words = np.isin(g_values, (0, 1, 2, 3))
+    motion = _last_value(g_lines[motion_words], g_values[motion_words], move_lines, default=-1)
+    moves = np.zeros(len(move_lines), dtype=MOVE_DTYPE)
+    moves['line'] = move_lines
+    moves['motion'] = motion
+    moves['x'] = _last_value(x_lines, x_values, move_lines)
+    moves['y'] = _last_value(y_lines, y_values, move_lines)
+    moves['i'] = _same_line_value(*column('I'), move_lines)
+    moves['j'] = _same_line_value(*column('J'), move_lines)
+    moves['feed'] = _last_value(*column('F'), move_lines)
+    return moves
+
+def parse_gcode(file_path):
+    """Parse a G-code file, or the rendering of a Sandify .sdf project, into a MOVE_DTYPE array."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"G-code file '{file_path}' not found")
+    if is_sdf(file_path):
+        return parse_text('\n'.join(sdf_commands(file_path)))
+    with open(file_path, 'rb') as f:
+        return parse_text(f.read())
+
+def parse_commands(commands):
+    """Parse a sequence of commands; 'line' is then the 1-based command index."""
+    return parse_text('\n'.join(commands))
+
+def segment_lengths(moves, start=None):
+    """Length in mm of each move, arcs measured along the arc.
+
+    The first move is measured from start (x, y) if given, otherwise it is 0.
+    """
+    x, y = moves['x'], moves['y']
+    px = np.empty_like(x)
+    py = np.empty_like(y)
+    px[1:], py[1:] = x[:-1], y[:-1]
+    px[:1], py[:1] = (start if start is not None else (x[:1], y[:1]))
+    lengths = np.hypot(x - px, y - py)
+
+    arcs = np.isin(moves['motion'], (2, 3))
+    if arcs.any():
+        cx, cy = px[arcs] + moves['i'][arcs], py[arcs] + moves['j'][arcs]
+        radius = np.hypot(moves['i'][arcs], moves['j'][arcs])
+        sweep = (np.arctan2(y[arcs] - cy, x[arcs] - cx)
+                 - np.arctan2(py[arcs] - cy, px[arcs] - cx))
+        # G2 turns clockwise (negative sweep), G3 counter-clockwise; a zero
+        # sweep with equal end points is a full circle
+        ccw = moves['motion'][arcs] == 3
+        sweep = np.where(ccw, np.mod(sweep, 2 * np.pi), np.mod(-sweep, 2 * np.pi))
+        sweep[sweep == 0] = 2 * np.pi
+        lengths[arcs] = radius * sweep
+    return np.nan_to_num(lengths)
+
+def bounds(moves):
+    """(min_x, min_y, max_x, max_y) of all move end points.
+
+    Arcs can bulge past their end points; this is the bounding box of the
+    targets, which is what a table limit check needs for Sandify exports.
+    """
+    return (np.nanmin(moves['x']), np.nanmin(moves['y']),
+            np.nanmax(moves['x']), np.nanmax(moves['y']))
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse G-code into move arrays and print a summary")
+    parser.add_argument('gcode_files', nargs='+', help="Path(s) to G-code file(s)")
+    args = parser.parse_args()
+
+    for gcode_file in args.gcode_files:
+        start_time = time.perf_counter()
+        try:
+            moves = parse_gcode(gcode_file)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"{gcode_file}: {e}")
+            continue
+        elapsed = time.perf_counter() - start_time
+        if not len(moves):
+            print(f"{gcode_file}: no moves")
+            continue
+        min_x, min_y, max_x, max_y = bounds(moves)
+        print(f"{gcode_file}: {len(moves)} moves in {elapsed * 1000:.1f} ms, "
+              f"X {min_x:.3f}..{max_x:.3f} Y {min_y:.3f}..{max_y:.3f}, "
+              f"path {segment_lengths(moves).sum() / 1000:.2f} m")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import mmap
+import os
+import re
+
+from sdf_render import is_sdf, sdf_commands
+
+# ( ... ) comments anywhere on a line; ';' comments run to the end of the line
+PAREN_COMMENT = re.compile(r'\([^)]*\)')
+# A line holding a command: first non-blank character after any leading
+# ( ... ) comments is not the start of a comment
+COMMAND_LINE = re.compile(rb'^[ \t]*(?:\([^)\n]*\)[ \t]*)*[^\s;(]', re.MULTILINE)
+# Letter/number pairs such as 'G1', 'x850' or 'Y-0.5'
+WORD = re.compile(r'([A-Za-z])\s*([-+]?(?:\d+\.?\d*|\.\d+))')
+
+def clean_line(line):
+    """Strip inline ( ... ) and ; ... comments and surrounding whitespace."""
+    if '(' in line:
+        line = PAREN_COMMENT.sub('', line)
+    if ';' in line:
+        line = line.split(';', 1)[0]
+    return line.strip()
+
+def parse_words(cmd):
+    """Split a cleaned command into (LETTER, value) pairs, e.g. [('G', 1.0), ('X', 850.0)]."""
+    return [(letter.upper(), float(value)) for letter, value in WORD.findall(cmd)]
+
+def _iter_commands(file_path):
+    with open(file_path, 'r') as f:
+        for line in f:
+            cmd = clean_line(line)
+            if cmd:
+                yield cmd
+
+def _iter_sdf_commands(file_path):
+    for line in sdf_commands(file_path):
+        cmd = clean_line(line)
+        if cmd:
+            yield cmd
+
+def iter_gcode_file(file_path):
+    """Lazily yield cleaned G-code commands from a file, one at a time.
+
+    Sandify projects (.sdf) are rendered to G-code on the fly (see sdf_render.py).
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"G-code file '{file_path}' not found")
+    if is_sdf(file_path):
+        return _iter_sdf_commands(file_path)
+    return _iter_commands(file_path)
+
+def read_gcode_file(file_path):
+    """Read G-code from file and return list of commands."""
+    return list(iter_gcode_file(file_path))
+
+def read_playlist(playlist_file):
+    """Read a playlist: one G-code path per line, '#' comments allowed.
+
+    Relative paths are resolved against the playlist's own directory.
+    """
+    if not os.path.exists(playlist_file):
+        raise FileNotFoundError(f"Playlist '{playlist_file}' not found")
+    base = os.path.dirname(os.path.abspath(playlist_file))
+    files = []
+    with open(playlist_file, 'r') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                files.append(os.path.join(base, line))
+    return files
+
+def count_gcode_lines(file_path):
+    """Count the commands iter_gcode_file() will yield, without decoding lines.
+
+    Scans a memory map of the file, so it is cheap enough to run before
+    streaming just to show [i/N] progress.
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"G-code file '{file_path}' not found")
+    if is_sdf(file_path):
+        return sum(1 for _ in _iter_sdf_commands(file_path))
+    if os.path.getsize(file_path) == 0:
+        return 0
+    with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return sum(1 for _ in COMMAND_LINE.finditer(mm))
@@ -0,0 +1,295 @@
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+import tty
+from collections import deque
+
+from estimate import DEFAULT_SETTINGS, load_settings
+
+BANNER = b"\r\nGrbl 1.1h ['$' for help]\r\n"
+RX_BUFFER_SIZE = 128  # Bytes of serial receive buffer
+PLANNER_BLOCKS = 15  # Usable planner slots (16-block buffer, one kept free)
+LINE_BUFFER_SIZE = 80  # Longest line GRBL accepts
+REALTIME = {ord('?'), ord('!'), ord('~'), 0x18}
+# Letter/number words of a line with spaces and comments removed
+WORD = re.compile(r'([A-Z])([-+]?(?:\d+\.?\d*|\.\d+))')
+SUPPORTED_G = {0, 1, 2, 3, 4, 10, 17, 18, 19, 20, 21, 28, 30, 53, 54, 55, 56, 57, 58, 59, 80, 90, 91, 92, 93, 94}
+SUPPORTED_M = {0, 1, 2, 3, 4, 5, 7, 8, 9, 30}
+
+class GrblSimulator:
+    """A stand-in GRBL controller on a pseudo-terminal.
+
+    Bytes reach the controller at the baud rate into a 128-byte RX buffer
+    (overflowing bytes are dropped, as on the real thing). Each line is
+    acknowledged once its motion is queued in a 15-block planner, and the
+    planner drains at each block's feed rate, optionally sped up by
+    time_scale. ?, !, ~ and Ctrl-X are handled as real-time commands.
+    """
+
+    def __init__(self, baud=115200, settings=None, time_scale=1.0):
+        self.byte_time = 10.0 / baud  # 8N1: start + 8 data + stop bits
+        self.settings = settings or DEFAULT_SETTINGS
+        self.time_scale = time_scale
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)
+        self.port = os.ttyname(self.slave)
+
+        self.cond = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.rx = bytearray()
+        self.planner = deque()  # (duration, x, y) blocks; [0] is executing
+        self.running = True
+        self.held = False
+        self.arrival = 0.0  # When the last received byte finished arriving
+        self.starved_since = None
+        self.reset_state()
+        self.stats = {'lines': 0, 'ok': 0, 'errors': 0, 'rx_overflow_bytes': 0, 'max_rx_fill': 0,
+                      'blocks': 0, 'starved_seconds': 0.0, 'status_reports': 0}
+
+    def reset_state(self):
+        self.motion = 0
+        self.feed = None
+        self.absolute = True
+        self.inches = False
+        self.position = [0.0, 0.0]  # Position after the last planned block
+        self.machine = [0.0, 0.0]  # Position after the last executed block
+
+    def start(self):
+        for target in (self._receive, self._parse, self._execute):
+            threading.Thread(target=target, daemon=True).start()
+        self.send(BANNER)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        os.close(self.master)
+        os.close(self.slave)
+
+    def send(self, data):
+        """Write to the host, taking the transmission time of the bytes."""
+        with self.write_lock:
+            time.sleep(len(data) * self.byte_time)
+            os.write(self.master, data)
+
+    def _receive(self):
+        """Move bytes from the pty into the RX buffer at the baud rate."""
+        while self.running:
+            try:
+                data = os.read(self.master, 16)
+            except OSError:
+                return
+            now = time.perf_counter()
+            self.arrival = max(self.arrival, now) + len(data) * self.byte_time
+            if self.arrival > now:
+                time.sleep(self.arrival - now)
+            with self.cond:
+                for byte in data:
+                    if byte in REALTIME or byte >= 0x80:
+                        self._realtime(byte)
+                    elif len(self.rx) >= RX_BUFFER_SIZE:
+                        self.stats['rx_overflow_bytes'] += 1
+                    else:
+                        self.rx.append(byte)
+                self.stats['max_rx_fill'] = max(self.stats['max_rx_fill'], len(self.rx))
+                self.cond.notify_all()
+
+    def _realtime(self, byte):
+        if byte == ord('?'):
+            self.stats['status_reports'] += 1
+            threading.Thread(target=self.send, args=(self.status_report().encode(),), daemon=True).start()
+        elif byte == ord('!'):
+            self.held = True
+        elif byte == ord('~'):
+            self.held = False
+            self.cond.notify_all()
+        elif byte == 0x18:
+            self.rx.clear()
+            self.planner.clear()
+            self.held = False
+            self.reset_state()
+            threading.Thread(target=self.send, args=(BANNER,), daemon=True).start()
+
+    def status_report(self):
+        """'<Run|MPos:..|Bf:..|FS:..>' the way GRBL 1.1 reports it."""
+        with self.cond:
+            state = 'Hold' if self.held else 'Run' if self.planner else 'Idle'
+            x, y = self.machine
+            free = PLANNER_BLOCKS - len(self.planner)
+            rx_free = RX_BUFFER_SIZE - len(self.rx)
+            feed = self.feed or 0
+        return f"<{state}|MPos:{x:.3f},{y:.3f},0.000|Bf:{free},{rx_free}|FS:{feed:.0f},0>\r\n"
+
+    def _parse(self):
+        """Take complete lines out of the RX buffer and execute them in order."""
+        while True:
+            with self.cond:
+                while self.running and b'\n' not in self.rx and b'\r' not in self.rx:
+                    self.cond.wait()
+                if not self.running:
+                    return
+                end = min(i for i in (self.rx.find(b'\n'), self.rx.find(b'\r')) if i >= 0)
+                line = self.rx[:end].decode(errors='replace')
+                del self.rx[:end + 1]
+            self.stats['lines'] += 1
+            reply = self.execute_line(line)
+            if reply.startswith('error'):
+                self.stats['errors'] += 1
+            else:
+                self.stats['ok'] += 1
+            self.send(f"{reply}\r\n".encode())
+
+    def execute_line(self, line):
+        """Run one line; returns 'ok' or 'error:N' once its blocks are planned.
+
+        Empty lines get an 'ok' too, so '\\r\\n' is acknowledged twice as by GRBL.
+        """
+        line = re.sub(r'\([^)]*\)|;.*', '', line).replace(' ', '').replace('\t', '').upper()
+        if not line:
+            return 'ok'
+        if len(line) > LINE_BUFFER_SIZE:
+            return 'error:14'
+        if line.startswith('$'):
+            if line == '$$':
+                for key, value in sorted(self.settings.items()):
+                    self.send(f"${key}={value:.3f}\r\n".encode())
+            return 'ok'
+        if not line[0].isalpha():
+            return 'error:1'
+        words = WORD.findall(line)
+        if ''.join(letter + number for letter, number in words) != line:
+            return 'error:2'
+
+        values = {}
+        motion = self.motion
+        non_modal = None
+        for letter, number in words:
+            value = float(number)
+            if letter == 'G':
+                if value not in SUPPORTED_G:
+                    return 'error:20'
+                if value in (10, 28, 30, 92):
+                    non_modal = value
+                if value in (0, 1, 2, 3):
+                    motion = int(value)
+                elif value in (90, 91):
+                    self.absolute = value == 90
+                elif value in (20, 21):
+                    self.inches = value == 20
+            elif letter == 'M':
+                if value not in SUPPORTED_M:
+                    return 'error:20'
+            elif letter in 'XYZIJKFRPSTN':
+                values[letter] = value * (25.4 if self.inches and letter in 'XYZIJKFR' else 1.0)
+            else:
+                return 'error:20'
+        if 'F' in values:
+            self.feed = values['F']
+
+        if non_modal == 92:
+            for index, axis in enumerate('XY'):
+                if axis in values:
+                    self.position[index] = self.machine[index] = values[axis]
+        if non_modal is not None or not any(axis in values for axis in 'XY'):
+            self.motion = motion
+            return 'ok'
+        if motion != 0 and not self.feed:
+            return 'error:22'  # Feed rate has not yet been set
+        self.motion = motion
+        start = list(self.position)
+        for index, axis in enumerate('XY'):
+            if axis in values:
+                self.position[index] = values[axis] if self.absolute else start[index] + values[axis]
+        for block in self._blocks(start, self.position, values):
+            with self.cond:
+                while self.running and len(self.planner) >= PLANNER_BLOCKS:
+                    self.cond.wait()
+                self.planner.append(block)
+                self.cond.notify_all()
+        return 'ok'
+
+    def _blocks(self, start, end, values):
+        """Planner blocks for a move: one for a line, $12-sized chords for an arc."""
+        max_rate = min(self.settings[110], self.settings[111])
+        speed = (max_rate if self.motion == 0 else min(self.feed, max_rate)) / 60.0
+        length = math.hypot(end[0] - start[0], end[1] - start[1])
+        segments = 1
+        if self.motion in (2, 3) and ('I' in values or 'J' in values):
+            radius = math.hypot(values.get('I', 0.0), values.get('J', 0.0))
+            cx, cy = start[0] + values.get('I', 0.0), start[1] + values.get('J', 0.0)
+            sweep = (math.atan2(end[1] - cy, end[0] - cx) - math.atan2(start[1] - cy, start[0] - cx))
+            sweep = sweep % (2 * math.pi) if self.motion == 3 else -sweep % (2 * math.pi)
+            sweep = sweep or 2 * math.pi
+            length = radius * sweep
+            tolerance = self.settings[12]
+            chord = math.sqrt(max(tolerance * (2 * radius - tolerance), 1e-12))
+            segments = max(int(length / chord), 1)
+        if length == 0:
+            return []
+        duration = length / speed / segments
+        blocks = []
+        for k in range(1, segments + 1):
+            fraction = k / segments  # Chord end points are only used for MPos
+            blocks.append((duration, start[0] + (end[0] - start[0]) * fraction,
+                           start[1] + (end[1] - start[1]) * fraction))
+        return blocks
+
+    def _execute(self):
+        """Drain the planner in real time, scaled by time_scale, and time starvation."""
+        while True:
+            with self.cond:
+                while self.running and (not self.planner or self.held):
+                    if not self.planner and self.starved_since is None:
+                        self.starved_since = time.perf_counter()
+                    self.cond.wait()
+                if not self.running:
+                    return
+                if self.starved_since is not None:
+                    # Only gaps between blocks count, not the idle time
+                    # before the first or after the last
+                    if self.stats['blocks']:
+                        self.stats['starved_seconds'] += time.perf_counter() - self.starved_since
+                    self.starved_since = None
+                duration = self.planner[0][0] / self.time_scale
+            time.sleep(duration)
+            with self.cond:
+                if self.planner:
+                    _, x, y = self.planner.popleft()
+                    self.machine = [x, y]
+                    self.stats['blocks'] += 1
+                self.cond.notify_all()
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated GRBL controller on a pseudo-terminal")
+    parser.add_argument('--link', type=str, help="Also make the port available at this path (symlink)")
+    parser.add_argument('--baud', type=int, default=115200, help="Baud rate to model (default 115200)")
+    parser.add_argument('--speedup', type=float, default=1.0, help="Run motion this many times faster than real time")
+    parser.add_argument('--settings', type=str, help="File with GRBL '$$' output for rates and arc tolerance")
+    args = parser.parse_args()
+
+    settings = load_settings(args.settings) if args.settings else None
+    sim = GrblSimulator(args.baud, settings, args.speedup)
+    if args.link:
+        if os.path.islink(args.link):
+            os.remove(args.link)
+        os.symlink(sim.port, args.link)
+    sim.start()
+    print(f"GRBL simulator on {sim.port}", flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        if args.link and os.path.islink(args.link):
+            os.remove(args.link)
+    # One JSON line so a benchmark can collect the controller-side numbers
+    print(json.dumps(sim.stats), flush=True)
+
+if __name__ == "__main__":
+    main()
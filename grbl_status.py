@@ -0,0 +1,173 @@
+import queue
+import threading
+import time
+
+import serial
+
+DEFAULT_RATE = 0.0  # Status reports per second the senders ask for: none unless --status-hz is given
+POLL_RATE = 5.0  # StatusPoller's reports per second when it isn't given a rate
+
+def _numbers(text):
+    return [float(value) for value in text.split(',')]
+
+def parse_status(line, wco=None):
+    """Parse a GRBL 1.1 '<State|MPos:..|FS:..|Bf:..|WCO:..>' report into a dict.
+
+    GRBL sends either MPos or WPos (per $10) and WCO only now and then, so
+    the last known work offset can be passed in to fill in the other one.
+    Returns None if line is not a status report.
+    """
+    line = line.strip()
+    if not (line.startswith('<') and line.endswith('>')):
+        return None
+    fields = line[1:-1].split('|')
+    state, _, substate = fields[0].partition(':')
+    status = {'time': time.monotonic(), 'state': state, 'substate': int(substate) if substate else None,
+              'mpos': None, 'wpos': None, 'wco': wco, 'feed': None, 'spindle': None,
+              'planner_free': None, 'rx_free': None}
+    for field in fields[1:]:
+        key, _, value = field.partition(':')
+        try:
+            if key == 'MPos':
+                status['mpos'] = _numbers(value)
+            elif key == 'WPos':
+                status['wpos'] = _numbers(value)
+            elif key == 'WCO':
+                status['wco'] = _numbers(value)
+            elif key == 'FS':
+                status['feed'], status['spindle'] = _numbers(value)
+            elif key == 'F':
+                status['feed'] = float(value)
+            elif key == 'Bf':
+                status['planner_free'], status['rx_free'] = (int(v) for v in _numbers(value))
+        except ValueError:
+            continue  # A garbled field doesn't spoil the rest of the report
+    offset = status['wco']
+    if offset is not None:
+        if status['mpos'] is not None and status['wpos'] is None:
+            status['wpos'] = [m - o for m, o in zip(status['mpos'], offset)]
+        elif status['wpos'] is not None and status['mpos'] is None:
+            status['mpos'] = [w + o for w, o in zip(status['wpos'], offset)]
+    return status
+
+class StatusPoller:
+    """Polls GRBL with '?' and separates status reports from replies.
+
+    A reader thread owns the serial input: '<...>' reports are parsed and
+    published, every other line is queued for readline(). The poller also
+    passes write() through, so it stands in for the serial port in the
+    senders, which never see a status report among their oks. '?' is a
+    real-time command, so it may land anywhere in a streamed line.
+
+    Consumers read the most recent report from latest (a plain attribute,
+    replaced atomically) or subscribe() for a queue of updates.
+    """
+
+    def __init__(self, ser, rate=POLL_RATE):
+        self.ser = ser
+        self.interval = 1.0 / rate if rate else None
+        self.timeout = ser.timeout  # readline() keeps the port's timeout
+        self.lines = queue.Queue()
+        self.subscribers = []
+        self.latest = None
+        self.wco = None
+        self.error = None
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.ser.timeout = 0.1  # Let the reader notice stop() promptly
+        threading.Thread(target=self._read, daemon=True).start()
+        if self.interval:
+            threading.Thread(target=self._poll, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.ser.timeout = self.timeout
+
+    def subscribe(self, maxsize=1):
+        """Queue of status dicts; when full, the oldest report is dropped."""
+        updates = queue.Queue(maxsize)
+        self.subscribers.append(updates)
+        return updates
+
+    def unsubscribe(self, updates):
+        if updates in self.subscribers:
+            self.subscribers.remove(updates)
+
+    def _publish(self, status):
+        self.latest = status
+        for updates in list(self.subscribers):
+            try:
+                updates.put_nowait(status)
+            except queue.Full:
+                try:
+                    updates.get_nowait()
+                except queue.Empty:
+                    pass
+                updates.put_nowait(status)
+
+    def _poll(self):
+        while self.running:
+            try:
+                self.ser.write(b'?')
+            except (serial.SerialException, OSError):
+                return  # The reader reports the failure
+            time.sleep(self.interval)
+
+    def _read(self):
+        pending = b''
+        while self.running:
+            try:
+                data = self.ser.read(self.ser.in_waiting or 1)
+            except (serial.SerialException, OSError) as e:
+                self.error = e
+                self.lines.put(None)
+                return
+            if not data:
+                continue
+            pending += data
+            *complete, pending = pending.split(b'\n')
+            for raw in complete:
+                line = raw.decode(errors='replace').strip()
+                if line.startswith('<'):
+                    status = parse_status(line, self.wco)
+                    if status is not None:
+                        self.wco = status['wco']
+                        self._publish(status)
+                elif line:
+                    self.lines.put(line)
+
+    # Serial port interface used by the senders
+
+    def readline(self):
+        """Next non-status line as bytes, or b'' after the port's timeout."""
+        if self.error is not None:
+            raise serial.SerialException(f"Status reader stopped: {self.error}")
+        try:
+            line = self.lines.get(timeout=self.timeout)
+        except queue.Empty:
+            return b''
+        if line is None:
+            raise serial.SerialException(f"Status reader stopped: {self.error}")
+        return (line + '\n').encode()
+
+    def write(self, data):
+        return self.ser.write(data)
+
+    def flushInput(self):
+        self.ser.flushInput()
+        while True:
+            try:
+                self.lines.get_nowait()
+            except queue.Empty:
+                return
+
+    def close(self):
+        self.stop()
+        self.ser.close()
+
+    @property
+    def is_open(self):
+        return self.ser.is_open
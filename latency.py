@@ -0,0 +1,104 @@
+import csv
+import heapq
+from array import array
+
+import numpy as np
+
+from estimate import format_duration
+
+SLOWEST = 5  # Commands listed in the summary
+SAMPLE_DTYPE = np.dtype([
+    ('line', np.int32),  # 1-based command index
+    ('sent', np.float64),  # time.monotonic() when the line was written
+    ('acked', np.float64),  # ... and when its ok/error arrived
+])
+
+class LatencyRecorder:
+    """Write-to-ack times of every command, cheap enough to leave on.
+
+    Samples go into typed arrays (no per-sample objects); only the slowest
+    few commands keep their text, in a small heap.
+    """
+
+    def __init__(self, slowest=SLOWEST):
+        self.lines = array('i')
+        self.sent = array('d')
+        self.acked = array('d')
+        self.slowest = slowest
+        self.heap = []  # (latency, line, command) of the slowest commands
+
+    def record(self, i, cmd, sent, acked):
+        self.lines.append(i)
+        self.sent.append(sent)
+        self.acked.append(acked)
+        latency = acked - sent
+        if len(self.heap) < self.slowest:
+            heapq.heappush(self.heap, (latency, i, cmd))
+        elif latency > self.heap[0][0]:
+            heapq.heappushpop(self.heap, (latency, i, cmd))
+
+    def __len__(self):
+        return len(self.lines)
+
+    def samples(self):
+        """All samples as a SAMPLE_DTYPE array."""
+        out = np.zeros(len(self.lines), dtype=SAMPLE_DTYPE)
+        out['line'] = np.frombuffer(self.lines, dtype=np.int32) if len(self.lines) else []
+        out['sent'] = np.frombuffer(self.sent) if len(self.sent) else []
+        out['acked'] = np.frombuffer(self.acked) if len(self.acked) else []
+        return out
+
+    def summary(self, buckets=10):
+        """Percentiles in ms, throughput per time bucket and the slowest commands."""
+        samples = self.samples()
+        if not len(samples):
+            return None
+        latency = (samples['acked'] - samples['sent']) * 1000
+        p50, p95, p99 = np.percentile(latency, [50, 95, 99])
+        start = samples['sent'].min()
+        elapsed = samples['acked'].max() - start
+        # Lines acknowledged per bucket of the run, as lines/s
+        width = max(elapsed / buckets, 1e-9)
+        counts = np.bincount(np.minimum(((samples['acked'] - start) / width).astype(int), buckets - 1),
+                             minlength=buckets)
+        return {
+            'count': len(samples),
+            'seconds': round(float(elapsed), 3),
+            'p50_ms': round(float(p50), 2),
+            'p95_ms': round(float(p95), 2),
+            'p99_ms': round(float(p99), 2),
+            'max_ms': round(float(latency.max()), 2),
+            'bucket_seconds': round(float(width), 3),
+            'lines_per_second': [round(float(c / width), 1) for c in counts],
+            'slowest': [{'line': i, 'command': cmd, 'ms': round(latency * 1000, 2)}
+                        for latency, i, cmd in sorted(self.heap, reverse=True)],
+        }
+
+    def report(self, buckets=10):
+        """Human-readable summary lines, or '' if nothing was recorded."""
+        summary = self.summary(buckets)
+        if summary is None:
+            return ''
+        lines = [f"Latency over {summary['count']} commands: p50 {summary['p50_ms']:.1f} ms, "
+                 f"p95 {summary['p95_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, max {summary['max_ms']:.1f} ms"]
+        rates = summary['lines_per_second']
+        lines.append(f"  Throughput per {summary['bucket_seconds']:.1f}s of {format_duration(summary['seconds'])}: "
+                     + ' '.join(f"{rate:.0f}" for rate in rates) + " lines/s")
+        for slow in summary['slowest']:
+            lines.append(f"  Slow: line {slow['line']} {slow['ms']:.1f} ms: {slow['command']}")
+        return '\n'.join(lines)
+
+    def export(self, path):
+        """Write the samples as CSV (.csv) or as a NumPy .npy structured array."""
+        samples = self.samples()
+        if path.endswith('.csv'):
+            with open(path, 'w', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['line', 'sent', 'acked', 'latency_ms'])
+                for line, sent, acked in samples:
+                    writer.writerow([line, f"{sent:.6f}", f"{acked:.6f}", f"{(acked - sent) * 1000:.3f}"])
+        else:
+            if not path.endswith('.npy'):
+                path += '.npy'
+            np.save(path, samples)
+        return path
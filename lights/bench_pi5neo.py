@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Frames per second of Pi5Neo's encoder, with an SPI device that only pretends to send
+import argparse
+import time
+
+from pi5neo import BIT_HIGH, BIT_LOW, EPixelType, Pi5Neo
+
+LED_COUNTS = [80, 300, 1000]
+
+class NullSpi:
+    """Stands in for spidev.SpiDev: accepts frames and throws them away
+
+    With speed_hz it takes as long as sending them would, without holding the GIL, as spidev does.
+    """
+    def __init__(self, speed_hz=None):
+        self.speed_hz = speed_hz
+        self.frames = 0
+
+    def writebytes2(self, data):
+        if self.speed_hz:
+            time.sleep(len(data) * 8 / self.speed_hz)
+        self.frames += 1
+
+    def xfer3(self, data):
+        self.frames += 1
+
+def per_bit_update(neo):
+    """The encoder update_strip() used before the lookup table, for comparison"""
+    raw_data = [0] * (neo.num_leds * neo.bytes_per_led)
+    total_bytes = 0
+    for pixel in neo.pixels.tolist():
+        for byte in [pixel[1], pixel[0]] + pixel[2:]:  # GRB(W) order
+            for i in range(8):
+                raw_data[total_bytes] = BIT_HIGH if byte & (1 << (7 - i)) else BIT_LOW
+                total_bytes += 1
+    neo.spi.xfer3(list(bytes(raw_data)))
+
+def change_all(neo, frame):
+    neo.fill_strip(frame & 255, 255 - (frame & 255), 127, 63)
+
+def change_one(neo, frame):
+    neo.set_led_color(frame % neo.num_leds, frame & 255, 0, 0)
+
+def change_none(neo, frame):
+    pass
+
+CHANGES = {'all': change_all, 'one': change_one, 'none': change_none}
+
+def frames_per_second(update, neo, seconds, change=change_all, render_ms=0.0):
+    """Run update(neo) for about seconds, calling change(neo, frame) before each frame; returns frames/s
+
+    render_ms of busy work per frame stands in for an effect computing it.
+    """
+    frames = 0
+    start_time = time.perf_counter()
+    while True:
+        render_end = time.perf_counter() + render_ms / 1000.0
+        while time.perf_counter() < render_end:
+            pass
+        change(neo, frames)
+        update(neo)
+        frames += 1
+        elapsed = time.perf_counter() - start_time
+        if elapsed >= seconds:
+            return frames / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Pi5Neo frame encoding without an LED strip")
+    parser.add_argument('--seconds', type=float, default=1.0, help="Time each run for this long (default 1)")
+    parser.add_argument('--rgbw', action='store_true', help="Encode RGBW pixels instead of RGB")
+    parser.add_argument('--compare', action='store_true', help="Also time the old per-bit encoder")
+    parser.add_argument('--changes', choices=list(CHANGES), default='all',
+                        help="Which LEDs change between frames (default all)")
+    parser.add_argument('--transfer', action='store_true', help="Take as long as the SPI transfer would at 800 kHz")
+    parser.add_argument('--render-ms', type=float, default=0.0, help="Busy work per frame, like an effect (default 0)")
+    parser.add_argument('--background', action='store_true', help="Send frames from Pi5Neo's transmit thread")
+    parser.add_argument('leds', type=int, nargs='*', help=f"Strip lengths (default {' '.join(map(str, LED_COUNTS))})")
+    args = parser.parse_args()
+
+    pixel_type = EPixelType.RGBW if args.rgbw else EPixelType.RGB
+    for num_leds in args.leds or LED_COUNTS:
+        neo = Pi5Neo(num_leds=num_leds, pixel_type=pixel_type, quiet_mode=True, spi=NullSpi(),
+                     background=args.background)
+        neo.spi.speed_hz = neo.spi_speed if args.transfer else None
+        fps = frames_per_second(lambda n: n.update_strip(None), neo, args.seconds, CHANGES[args.changes],
+                                args.render_ms)
+        neo.close()
+        stats = neo.stats
+        line = (f"{num_leds:5d} LEDs: {fps:9.0f} frames/s ({len(neo.raw_data)} bytes/frame), "
+                f"{stats['frames_sent']} sent, {stats['frames_skipped']} skipped, "
+                f"{stats['leds_encoded'] / max(stats['frames_encoded'], 1):.0f} LEDs encoded/frame")
+        if args.compare:
+            before = frames_per_second(per_bit_update, neo, args.seconds, CHANGES[args.changes], args.render_ms)
+            line += f", per-bit encoder {before:.0f} frames/s ({fps / before:.0f}x faster)"
+        print(line)
+
+if __name__ == '__main__':
+    main()
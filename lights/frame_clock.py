@@ -0,0 +1,77 @@
+# Fixed-timestep frame pacing for the LED effects, shared by lights.py and neo_lights.py
+import time
+
+POLICIES = ('drop', 'catchup')
+
+class FrameClock:
+    """Paces an animation at one frame per period on the monotonic clock.
+
+    Frame n is due at start + n * period, so time spent rendering and
+    sending a frame comes out of the wait for the next one instead of
+    adding to it, and errors don't accumulate. When a frame is late by a
+    whole period or more, the 'drop' policy skips the frames that are
+    already overdue so the animation keeps its speed; 'catchup' renders
+    them back to back without waiting until it is on schedule again, but
+    gives up on a backlog older than max_lag seconds.
+    """
+    def __init__(self, period, policy='drop', stats=None, max_lag=0.25, clock=time.monotonic, sleep=time.sleep):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown frame policy: {policy}. Available: {', '.join(POLICIES)}")
+        self.period = max(period, 0.0)
+        self.policy = policy
+        self.max_lag = max_lag
+        self.clock = clock
+        self.sleep = sleep
+        # Totals over every run of this clock; pass the same dict to several clocks to add them up
+        self.stats = stats if stats is not None else {}
+        for key in ('frames', 'dropped', 'seconds', 'target_seconds', 'jitter_total', 'jitter_max'):
+            self.stats.setdefault(key, 0 if key in ('frames', 'dropped') else 0.0)
+
+    def frames(self, count=None):
+        """Yield frame numbers from 0 up to count (forever if None), each when it is due.
+
+        The caller renders and shows frame n in the loop body; the clock
+        then waits for frame n + 1. Numbers of dropped frames are skipped.
+        """
+        begin = start = self.clock()
+        frame = due = 0  # Next frame, and how many have been shown or dropped
+        try:
+            while count is None or frame < count:
+                # How late this frame is starting is the jitter; with no period
+                # nothing is ever due, so there is none to measure
+                late = max(self.clock() - (start + frame * self.period), 0.0) if self.period > 0 else 0.0
+                self.stats['frames'] += 1
+                self.stats['jitter_total'] += late
+                self.stats['jitter_max'] = max(self.stats['jitter_max'], late)
+                due = frame + 1
+                yield frame
+
+                frame += 1
+                behind = self.clock() - (start + frame * self.period)
+                if behind < 0:
+                    self.sleep(-behind)
+                elif self.period > 0 and behind >= self.period:
+                    overdue = int(behind // self.period)
+                    if self.policy == 'drop':
+                        if count is not None:
+                            overdue = min(overdue, count - frame)
+                        frame += overdue
+                        due = frame
+                        self.stats['dropped'] += overdue
+                    elif behind > self.max_lag:
+                        # Too far behind to catch up: carry on from now
+                        start += overdue * self.period
+        finally:
+            self.stats['seconds'] += self.clock() - begin
+            self.stats['target_seconds'] += due * self.period
+
+def format_stats(stats):
+    """One line of achieved frame rate and jitter from FrameClock stats."""
+    frames = stats.get('frames', 0)
+    if not frames:
+        return "no frames"
+    seconds, target = stats['seconds'], stats['target_seconds']
+    fps = f"{frames / seconds:.1f}" if seconds else "-"
+    target_fps = f"{(frames + stats['dropped']) / target:.1f}" if target else "-"
+    return (f"{frames} frames at {fps} fps (target {target_fps}), {stats['dropped']} dropped, "
+            f"jitter mean {stats['jitter_total'] / frames * 1000:.2f} ms, max {stats['jitter_max'] * 1000:.2f} ms")
@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 # NeoPixel library strandtest example for rpi_ws281x
-import time
 from rpi_ws281x import Adafruit_NeoPixel, Color
 import argparse
 import ast
+from frame_clock import POLICIES, FrameClock, format_stats
 
 # LED strip configuration
 LED_COUNT = 80     # Number of LED pixels
@@ -13,32 +13,45 @@ LED_DMA = 10        # DMA channel
 LED_BRIGHTNESS = 250 # 0-255 (default, overridden by --brightness)
 LED_INVERT = False  # True to invert the signal
 LED_CHANNEL = 1     # Set to '1' for GPIOs 13, 19, 41, 45 or 53
+FRAME_POLICY = 'drop' # What to do with late frames: 'drop' or 'catchup' (see frame_clock.py)
+
+frame_stats = {}  # Frame rate and jitter of every effect run so far
+
+def frame_clock(wait_ms):
+    """Clock for an effect's frames, wait_ms apart."""
+    return FrameClock(wait_ms / 1000.0, FRAME_POLICY, frame_stats)
 
 # Define functions which animate LEDs in various ways
 def colorWipe(strip, color, wait_ms=50):
     """Wipe color across display a pixel at a time."""
-    for i in range(strip.numPixels()):
-        strip.setPixelColor(i, color)
+    filled = 0
+    for i in frame_clock(wait_ms).frames(strip.numPixels()):
+        # Up to and including i, in case frames were dropped
+        for k in range(filled, i + 1):
+            strip.setPixelColor(k, color)
+        filled = i + 1
         strip.show()
-        time.sleep(wait_ms / 1000.0)
 
 def solidColor(strip, color, wait_ms=5000):
     """Set all pixels to a solid color."""
-    for i in range(strip.numPixels()):
-        strip.setPixelColor(i, color)
-    strip.show()
-    time.sleep(wait_ms / 1000.0)
+    for _ in frame_clock(wait_ms).frames(1):
+        for i in range(strip.numPixels()):
+            strip.setPixelColor(i, color)
+        strip.show()
 
 def theaterChase(strip, color, wait_ms=50, iterations=10):
     """Movie theater light style chaser animation."""
-    for j in range(iterations):
-        for q in range(3):
-            for i in range(0, strip.numPixels(), 3):
-                strip.setPixelColor(i + q, color)
-            strip.show()
-            time.sleep(wait_ms / 1000.0)
+    q = None
+    for frame in frame_clock(wait_ms).frames(iterations * 3):
+        if q is not None:
             for i in range(0, strip.numPixels(), 3):
-                strip.setPixelColor(i + q, 0)
+                strip.setPixelColor(i + q, 0)  # Clear the last frame's lights
+        q = frame % 3
+        for i in range(0, strip.numPixels(), 3):
+            strip.setPixelColor(i + q, color)
+        strip.show()
+    for i in range(0, strip.numPixels(), 3):
+        strip.setPixelColor(i + q, 0)
 
 def wheel(pos):
     """Generate rainbow colors across 0-255 positions."""
@@ -53,30 +66,31 @@ def wheel(pos):
 
 def rainbow(strip, wait_ms=20, iterations=1):
     """Draw rainbow that fades across all pixels at once."""
-    for j in range(256 * iterations):
+    for j in frame_clock(wait_ms).frames(256 * iterations):
         for i in range(strip.numPixels()):
             strip.setPixelColor(i, wheel((i + j) & 255))
         strip.show()
-        time.sleep(wait_ms / 1000.0)
 
 def rainbowCycle(strip, wait_ms=20, iterations=5):
     """Draw rainbow that uniformly distributes itself across all pixels."""
-    for j in range(256 * iterations):
+    for j in frame_clock(wait_ms).frames(256 * iterations):
         for i in range(strip.numPixels()):
             strip.setPixelColor(i, wheel((int(i * 256 / strip.numPixels()) + j) & 255))
         strip.show()
-        time.sleep(wait_ms / 1000.0)
 
 def theaterChaseRainbow(strip, wait_ms=50):
     """Rainbow movie theater light style chaser animation."""
-    for j in range(256):
-        for q in range(3):
+    q = None
+    for frame in frame_clock(wait_ms).frames(256 * 3):
+        if q is not None:
             for i in range(0, strip.numPixels(), 3):
-                strip.setPixelColor(i + q, wheel((i + j) % 255))
-            strip.show()
-            time.sleep(wait_ms / 1000.0)
-            for i in range(0, strip.numPixels(), 3):
-                strip.setPixelColor(i + q, 0)
+                strip.setPixelColor(i + q, 0)  # Clear the last frame's lights
+        j, q = divmod(frame, 3)
+        for i in range(0, strip.numPixels(), 3):
+            strip.setPixelColor(i + q, wheel((i + j) % 255))
+        strip.show()
+    for i in range(0, strip.numPixels(), 3):
+        strip.setPixelColor(i + q, 0)
 
 def extract_rgb(color: Color) -> tuple:
     return ((color >> 16) & 0xFF, (color >> 8) & 0xFF, color & 0xFF)
@@ -100,22 +114,25 @@ def move_color_closer(current_color: Color, target_color: Color, step: int = 1)
     return Color(new_r, new_g, new_b)
 
 def fade(strip, start, end, wait_time=100):
-    while start != end:
-        start = move_color_closer(start, end)
-        solidColor(strip, start, 100)
-        #time.sleep(wait_time/1000)
+    last = -1
+    for frame in frame_clock(wait_time).frames():
+        start = move_color_closer(start, end, frame - last)  # More than one step if frames were dropped
+        last = frame
+        for i in range(strip.numPixels()):
+            strip.setPixelColor(i, start)
+        strip.show()
+        if start == end:
+            break
 
 def fade_in(strip, wait_time=10):
-    for i in range(255):
+    for i in frame_clock(wait_time).frames(255):
         strip.setBrightness(i)
         strip.show()
-        time.sleep(wait_time/1000)
     
 def fade_out(strip, wait_time=10):
-    for i in range(255, 0, -1):
-        strip.setBrightness(i)
+    for frame in frame_clock(wait_time).frames(255):
+        strip.setBrightness(255 - frame)
         strip.show()
-        time.sleep(wait_time/1000)
     
 # Main program logic
 if __name__ == '__main__':
@@ -124,7 +141,10 @@ if __name__ == '__main__':
     parser.add_argument('-c', '--clear', action='store_true', help='clear the display on exit')
     parser.add_argument('-p', '--pattern', type=str, help='run a specific pattern, e.g., "solid (255, 255, 0)" or "fade (255, 255, 0) (0, 255, 255)"')
     parser.add_argument('-b', '--brightness', type=int, default=LED_BRIGHTNESS, help='set brightness (0-255)')
+    parser.add_argument('--frame-policy', choices=POLICIES, default=FRAME_POLICY, help=f'late frames: drop them to keep the speed, or catch up (default {FRAME_POLICY})')
+    parser.add_argument('-s', '--stats', action='store_true', help='print the achieved frame rate and jitter')
     args = parser.parse_args()
+    FRAME_POLICY = args.frame_policy
 
     # Validate brightness
     if not (0 <= args.brightness <= 255):
@@ -216,6 +236,8 @@ if __name__ == '__main__':
                 rainbow(strip)
                 rainbowCycle(strip)
                 theaterChaseRainbow(strip)
+                if args.stats:
+                    print(f"Frames: {format_stats(frame_stats)}")
 
     except KeyboardInterrupt:
         if args.clear:
@@ -223,4 +245,6 @@ if __name__ == '__main__':
     except ValueError as e:
         print(f"Error: {e}")
         if args.clear:
-            colorWipe(strip, Color(0, 0, 0), 10)
\ No newline at end of file
+            colorWipe(strip, Color(0, 0, 0), 10)
+    if args.stats:
+        print(f"Frames: {format_stats(frame_stats)}")
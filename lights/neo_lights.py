@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 # NeoPixel animation script using Pi5Neo SPI interface
-import time
 import argparse
 import ast
+import numpy as np
+from frame_clock import POLICIES, FrameClock, format_stats
 from pi5neo import Pi5Neo, LEDColor, EPixelType
 
 # LED strip configuration
@@ -12,6 +13,14 @@ SPI_SPEED_KHZ = 800   # SPI speed in kHz (matches 800kHz from original)
 LED_BRIGHTNESS = 250  # 0-255 (default, overridden by --brightness)
 PIXEL_TYPE = EPixelType.RGB  # Set to EPixelType.RGBW for RGBW strips
 QUIET_MODE = False    # Set to True to suppress SPI debug messages
+BACKGROUND = False    # Set to True to send frames from a background thread while the next is rendered
+FRAME_POLICY = 'drop' # What to do with late frames: 'drop' or 'catchup' (see frame_clock.py)
+
+frame_stats = {}  # Frame rate and jitter of every effect run so far
+
+def frame_clock(wait_ms):
+    """Clock for an effect's frames, wait_ms apart."""
+    return FrameClock(wait_ms / 1000.0, FRAME_POLICY, frame_stats)
 
 def apply_brightness(color, brightness):
     """Scale RGB values based on brightness (0-255)."""
@@ -25,25 +34,28 @@ def apply_brightness(color, brightness):
 
 def colorWipe(neo, color, wait_ms=50):
     """Wipe color across display a pixel at a time."""
-    for i in range(neo.num_leds):
-        neo.set_led_color(i, color.red, color.green, color.blue, color.white)
-        neo.update_strip(wait_ms / 1000.0)
+    for i in frame_clock(wait_ms).frames(neo.num_leds):
+        # Up to and including i, in case frames were dropped
+        neo.set_range(0, i + 1, color.red, color.green, color.blue, color.white)
+        neo.update_strip(None)
 
 def solidColor(neo, color, wait_ms=5000):
     """Set all pixels to a solid color."""
-    neo.fill_strip(color.red, color.green, color.blue, color.white)
-    neo.update_strip(wait_ms / 1000.0)
+    for _ in frame_clock(wait_ms).frames(1):
+        neo.fill_strip(color.red, color.green, color.blue, color.white)
+        neo.update_strip(None)
 
 def theaterChase(neo, color, wait_ms=50, iterations=10):
     """Movie theater light style chaser animation."""
-    for j in range(iterations):
-        for q in range(3):
-            for i in range(0, neo.num_leds, 3):
-                neo.set_led_color(i + q, color.red, color.green, color.blue, color.white)
-            neo.update_strip(wait_ms / 1000.0)
-            for i in range(0, neo.num_leds, 3):
-                neo.set_led_color(i + q, 0, 0, 0, 0)
-            neo.update_strip(0)  # Immediate update to clear
+    q = None
+    for frame in frame_clock(wait_ms).frames(iterations * 3):
+        if q is not None:
+            neo.set_range(q, None, 0, 0, 0, 0, step=3)  # Clear the last frame's lights
+        q = frame % 3
+        neo.set_range(q, None, color.red, color.green, color.blue, color.white, step=3)
+        neo.update_strip(None)
+    neo.set_range(q, None, 0, 0, 0, 0, step=3)
+    neo.update_strip(None)
 
 def wheel(pos):
     """Generate rainbow colors across 0-255 positions."""
@@ -56,36 +68,38 @@ def wheel(pos):
         pos -= 170
         return LEDColor(0, pos * 3, 255 - pos * 3)
 
+def extract_rgb(color: LEDColor) -> tuple:
+    return (color.red, color.green, color.blue)
+
+# wheel() of every position as RGB rows, so whole-strip effects can look colors up all at once
+WHEEL = np.array([extract_rgb(wheel(pos)) for pos in range(256)], dtype=np.uint8)
+
 def rainbow(neo, wait_ms=20, iterations=1):
     """Draw rainbow that fades across all pixels at once."""
-    for j in range(256 * iterations):
-        for i in range(neo.num_leds):
-            color = wheel((i + j) & 255)
-            neo.set_led_color(i, color.red, color.green, color.blue, color.white)
-        neo.update_strip(wait_ms / 1000.0)
+    positions = np.arange(neo.num_leds)
+    for j in frame_clock(wait_ms).frames(256 * iterations):
+        neo.set_pixels(WHEEL[(positions + j) & 255])
+        neo.update_strip(None)
 
 def rainbowCycle(neo, wait_ms=20, iterations=5):
     """Draw rainbow that uniformly distributes itself across all pixels."""
-    for j in range(256 * iterations):
-        for i in range(neo.num_leds):
-            color = wheel((int(i * 256 / neo.num_leds) + j) & 255)
-            neo.set_led_color(i, color.red, color.green, color.blue, color.white)
-        neo.update_strip(wait_ms / 1000.0)
+    positions = np.arange(neo.num_leds) * 256 // neo.num_leds
+    for j in frame_clock(wait_ms).frames(256 * iterations):
+        neo.set_pixels(WHEEL[(positions + j) & 255])
+        neo.update_strip(None)
 
 def theaterChaseRainbow(neo, wait_ms=50):
     """Rainbow movie theater light style chaser animation."""
-    for j in range(256):
-        for q in range(3):
-            for i in range(0, neo.num_leds, 3):
-                color = wheel((i + j) % 255)
-                neo.set_led_color(i + q, color.red, color.green, color.blue, color.white)
-            neo.update_strip(wait_ms / 1000.0)
-            for i in range(0, neo.num_leds, 3):
-                neo.set_led_color(i + q, 0, 0, 0, 0)
-            neo.update_strip(0)  # Immediate update to clear
-
-def extract_rgb(color: LEDColor) -> tuple:
-    return (color.red, color.green, color.blue)
+    positions = np.arange(0, neo.num_leds, 3)
+    q = None
+    for frame in frame_clock(wait_ms).frames(256 * 3):
+        if q is not None:
+            neo.set_range(q, None, 0, 0, 0, 0, step=3)  # Clear the last frame's lights
+        j, q = divmod(frame, 3)
+        neo.set_pixels(WHEEL[(positions + j) % 255], start=q, step=3)
+        neo.update_strip(None)
+    neo.set_range(q, None, 0, 0, 0, 0, step=3)
+    neo.update_strip(None)
 
 def move_color_closer(current_color: LEDColor, target_color: LEDColor, step: int = 1) -> LEDColor:
     """Move current color closer to target color by step."""
@@ -103,25 +117,30 @@ def move_color_closer(current_color: LEDColor, target_color: LEDColor, step: int
     return LEDColor(new_r, new_g, new_b, new_w)
 
 def fade(neo, start: LEDColor, end: LEDColor, wait_ms=100):
-    """Fade from start color to end color."""
+    """Fade from start color to end color, one step per frame."""
     current = start
-    while current != end:
-        current = move_color_closer(current, end)
-        solidColor(neo, current, wait_ms / 1000.0)
+    last = -1
+    for frame in frame_clock(wait_ms).frames():
+        current = move_color_closer(current, end, frame - last)  # More than one step if frames were dropped
+        last = frame
+        neo.fill_strip(current.red, current.green, current.blue, current.white)
+        neo.update_strip(None)
+        if vars(current) == vars(end):
+            break
 
 def fade_in(neo, wait_ms=10):
     """Simulate fade-in by scaling brightness."""
-    for i in range(256):
+    for i in frame_clock(wait_ms).frames(256):
         scale = i / 255.0
         neo.fill_strip(int(255 * scale), int(255 * scale), int(255 * scale), int(255 * scale))
-        neo.update_strip(wait_ms / 1000.0)
+        neo.update_strip(None)
 
 def fade_out(neo, wait_ms=10):
     """Simulate fade-out by scaling brightness."""
-    for i in range(255, -1, -1):
-        scale = i / 255.0
+    for frame in frame_clock(wait_ms).frames(256):
+        scale = (255 - frame) / 255.0
         neo.fill_strip(int(255 * scale), int(255 * scale), int(255 * scale), int(255 * scale))
-        neo.update_strip(wait_ms / 1000.0)
+        neo.update_strip(None)
 
 # Main program logic
 if __name__ == '__main__':
@@ -130,7 +149,11 @@ if __name__ == '__main__':
     parser.add_argument('-c', '--clear', action='store_true', help='clear the display on exit')
     parser.add_argument('-p', '--pattern', type=str, help='run a specific pattern, e.g., "solid (255, 255, 0)" or "fade (255, 255, 0) (0, 255, 255)"')
     parser.add_argument('-b', '--brightness', type=int, default=LED_BRIGHTNESS, help='set brightness (0-255)')
+    parser.add_argument('--frame-policy', choices=POLICIES, default=FRAME_POLICY, help=f'late frames: drop them to keep the speed, or catch up (default {FRAME_POLICY})')
+    parser.add_argument('-s', '--stats', action='store_true', help='print the achieved frame rate and jitter')
+    parser.add_argument('--background', action='store_true', default=BACKGROUND, help='send frames from a background thread')
     args = parser.parse_args()
+    FRAME_POLICY = args.frame_policy
 
     # Validate brightness
     if not (0 <= args.brightness <= 255):
@@ -143,7 +166,8 @@ if __name__ == '__main__':
             num_leds=LED_COUNT,
             spi_speed_khz=SPI_SPEED_KHZ,
             pixel_type=PIXEL_TYPE,
-            quiet_mode=QUIET_MODE
+            quiet_mode=QUIET_MODE,
+            background=args.background
         )
     except Exception as e:
         print(f"Failed to initialize Pi5Neo: {e}")
@@ -236,6 +260,8 @@ if __name__ == '__main__':
                 rainbow(neo)
                 rainbowCycle(neo)
                 theaterChaseRainbow(neo)
+                if args.stats:
+                    print(f'Frames: {format_stats(frame_stats)}')
 
     except KeyboardInterrupt:
         if args.clear:
@@ -246,5 +272,8 @@ if __name__ == '__main__':
         if args.clear:
             neo.clear_strip()
             neo.update_strip()
+    neo.close()  # Sends any frames still queued
+    if args.stats:
+        print(f'Frames: {format_stats(frame_stats)}')
 
        
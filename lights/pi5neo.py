@@ -1,12 +1,24 @@
 # pi5neo/pi5neo.py
-import spidev
+import queue
+import threading
 import time
 from enum import Enum
 
+import numpy as np
+
 class EPixelType(Enum):
     RGB = 'RGB'
     RGBW = 'RGBW'
 
+# SPI byte for each data bit, MSB first: a long high pulse for 1, a short one for 0
+BIT_HIGH = 0xF8
+BIT_LOW = 0xC0
+# Bitstream of every possible color byte, so encoding a frame is one table lookup
+BITSTREAM = np.array([[BIT_HIGH if byte & (0x80 >> bit) else BIT_LOW for bit in range(8)]
+                      for byte in range(256)], dtype=np.uint8)
+# Columns of an RGB(W) pixel in the order the LEDs expect them (GRB or GRBW)
+WIRE_ORDER = {'RGB': [1, 0, 2], 'RGBW': [1, 0, 2, 3]}
+
 class LEDColor:
     """Represents an RGB or RGBW color for the NeoPixels"""
     def __init__(self, red=0, green=0, blue=0, white=0):
@@ -15,14 +27,70 @@ class LEDColor:
         self.blue = blue
         self.white = white
 
+def _channel(index):
+    """Property for one channel of a PixelColor, read from and written to its pixel buffer row"""
+    def get(self):
+        return int(self.row[index]) if index < len(self.row) else 0
+
+    def set(self, value):
+        if index < len(self.row):  # White on an RGB strip is dropped, as by set_led_color()
+            self.row[index] = value
+    return property(get, set)
+
+class PixelColor(LEDColor):
+    """An LEDColor that is one LED of a Pi5Neo, so setting its channels changes the LED"""
+    def __init__(self, row):
+        self.row = row  # View of the LED's row in Pi5Neo.pixels
+
+    red = _channel(0)
+    green = _channel(1)
+    blue = _channel(2)
+    white = _channel(3)
+
+class LEDState:
+    """The LEDs of a Pi5Neo as a list of LEDColor, backed by its pixel buffer
+
+    Items are PixelColor views and assigning an LEDColor to an item or slice sets those LEDs,
+    so code written for the old list of LEDColor keeps working.
+    """
+    def __init__(self, neo):
+        self.neo = neo
+
+    def __len__(self):
+        return self.neo.num_leds
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [PixelColor(row) for row in self.neo.pixels[index]]
+        return PixelColor(self.neo.pixels[index])
+
+    def __iter__(self):
+        return (PixelColor(row) for row in self.neo.pixels)
+
+    def __setitem__(self, index, color):
+        if isinstance(index, slice):
+            indices = range(*index.indices(self.neo.num_leds))
+            colors = list(color)
+            if len(colors) != len(indices):
+                raise ValueError(f"Can't set {len(indices)} LEDs from {len(colors)} colors")
+            for i, c in zip(indices, colors):
+                self[i] = c
+            return
+        self.neo.pixels[index] = self.neo._color(color.red, color.green, color.blue, color.white)
+
 class Pi5Neo:
-    def __init__(self, spi_device='/dev/spidev0.0', num_leds=10, spi_speed_khz=800, pixel_type=EPixelType.RGB, quiet_mode=False):
-        """Initialize the Pi5Neo class with SPI device, number of LEDs, speed, pixel type, and optional quiet mode"""
+    def __init__(self, spi_device='/dev/spidev0.0', num_leds=10, spi_speed_khz=800, pixel_type=EPixelType.RGB, quiet_mode=False, spi=None, background=False, queue_depth=1):
+        """Initialize the Pi5Neo class with SPI device, number of LEDs, speed, pixel type, and optional quiet mode
+
+        spi is an already open SPI object (anything with writebytes2) to use instead of opening spi_device.
+        With background, frames are encoded and sent by a thread of their own while the caller renders
+        the next one; at most queue_depth frames wait to be sent (see swap()).
+        """
         self.num_leds = num_leds
         self.pixel_type = pixel_type
         self.quiet_mode = quiet_mode
         self.spi_speed = spi_speed_khz * 1024 * 8  # Convert kHz to bytes per second
-        self.spi = spidev.SpiDev()  # Create SPI device instance
+        self.spi = spi  # Set by open_spi_device() unless one was given
 
         # Determine bytes per LED based on pixel_type
         self.pixel_type = pixel_type
@@ -33,11 +101,28 @@ class Pi5Neo:
         else:
             raise ValueError("Invalid pixel_type. Must be one of EPixelType.")
 
-        self.raw_data = [0] * (self.num_leds * self.bytes_per_led)  # Placeholder for raw data sent via SPI
-        self.led_state = [LEDColor()] * self.num_leds  # Initial state for each LED (off)
+        self.channels = self.bytes_per_led // 8
+        # Frame sent via SPI, encoded in place through a (LED, channel, bit) view of the same memory
+        self.raw_data = bytearray(self.num_leds * self.bytes_per_led)
+        self.frame = np.frombuffer(self.raw_data, dtype=np.uint8).reshape(self.num_leds, self.channels, 8)
+        # Color of each LED as RGB or RGBW columns, all off to begin with
+        self.pixels = np.zeros((self.num_leds, self.channels), dtype=np.uint8)
+        self.shown = None  # Copy of pixels as last encoded into raw_data; None until the first frame
+        self.stats = {'frames_skipped': 0, 'frames_encoded': 0, 'frames_sent': 0, 'leds_encoded': 0}
+
+        self.background = background
+        self.transmit_error = None  # What stopped the transmit thread sending, raised again in the caller
+        if background:
+            # Front buffers: one being sent and up to queue_depth waiting; pixels is the back buffer
+            self.free_buffers = queue.Queue()
+            for _ in range(max(queue_depth, 1) + 1):
+                self.free_buffers.put(np.empty_like(self.pixels))
+            self.ready_frames = queue.Queue()
+            self.transmit_thread = threading.Thread(target=self._transmit, name='pi5neo-transmit', daemon=True)
+            self.transmit_thread.start()
 
         # Open the SPI device
-        if self.open_spi_device(spi_device, quiet_mode):
+        if spi is not None or self.open_spi_device(spi_device, quiet_mode):
             time.sleep(0.1)  # Short delay to ensure device is ready
             self.clear_strip()  # Clear the strip on startup
             self.update_strip()
@@ -45,6 +130,8 @@ class Pi5Neo:
     def open_spi_device(self, device_path, quiet_mode):
         """Open the SPI device with the provided path"""
         try:
+            import spidev  # Only needed for a real device, so the rest works without it
+            self.spi = spidev.SpiDev()  # Create SPI device instance
             bus, device = map(int, device_path[-3:].split('.'))
             self.spi.open(bus, device)
             self.spi.max_speed_hz = self.spi_speed
@@ -58,8 +145,7 @@ class Pi5Neo:
 
     def send_spi_data(self):
         """Send the raw data buffer to the NeoPixel strip via SPI"""
-        spi_message = bytes(self.raw_data)
-        self.spi.xfer3(list(spi_message))  #previously spi.xfer2
+        self.spi.writebytes2(self.raw_data)  # Takes the buffer as is and splits it into transfers itself
 
     def bitmask(self, byte, position):
         """Retrieve the value of a specific bit in a byte"""
@@ -67,11 +153,7 @@ class Pi5Neo:
 
     def byte_to_bitstream(self, byte):
         """Convert a byte to the NeoPixel timing bitstream"""
-        bitstream = [0xC0] * 8  # Initialize with LOW bits
-        for i in range(8):
-            if self.bitmask(byte, i):
-                bitstream[i] = 0xF8  # Set HIGH bits for '1'
-        return bitstream
+        return BITSTREAM[byte].tolist()
 
     def rgb_to_spi_bitstream(self, red, green, blue):
         """Convert RGB values to the NeoPixel bitstream format for SPI"""
@@ -92,37 +174,159 @@ class Pi5Neo:
         """Turn off all LEDs on the strip"""
         self.fill_strip(0, 0, 0, 0)
 
+    @property
+    def led_state(self):
+        """The color of each LED as a list-like of LEDColor that reads and writes self.pixels (see LEDState)"""
+        return LEDState(self)
+
+    @led_state.setter
+    def led_state(self, colors):
+        LEDState(self)[:] = colors
+
+    def _color(self, red, green, blue, white):
+        return (red, green, blue, white)[:self.channels]
+
     def fill_strip(self, red=0, green=0, blue=0, white=0):
-        """Fill the entire strip with a specific color"""
-        color = LEDColor(red, green, blue, white)
-        self.led_state = [color] * self.num_leds  # Set all LEDs to the same color
+        """Fill the entire strip with a specific color
+
+        Channels must be 0-255; anything else raises OverflowError (the old per-bit encoder
+        silently kept only the low 8 bits). The same goes for every method that sets colors.
+        """
+        self.pixels[:] = self._color(red, green, blue, white)
 
     def set_led_color(self, index, red, green, blue, white=0):
-        """Set the color of an individual LED"""
+        """Set the color of an individual LED; channels above 255 or below 0 raise OverflowError"""
         if 0 <= index < self.num_leds:
-            self.led_state[index] = LEDColor(red, green, blue, white)
+            self.pixels[index] = self._color(red, green, blue, white)
             return True
         return False
 
-    def update_strip(self, sleep_duration=0.1):
+    def set_range(self, start, stop, red, green, blue, white=0, step=1):
+        """Set LEDs start to stop (exclusive, None for the end of the strip), every step'th one, to one color"""
+        self.pixels[start:stop:step] = self._color(red, green, blue, white)
+
+    def set_pixels(self, colors, start=0, step=1):
+        """Set LEDs from an (n, 3) or (n, 4) array of RGB(W) colors, starting at start and every step'th one
+
+        Colors past the end of the strip are dropped, and so is white on an RGB strip. On an RGBW strip
+        RGB colors turn white off.
+        """
+        colors = np.asarray(colors)
+        target = self.pixels[start::step]
+        count = min(len(colors), len(target))
+        columns = min(colors.shape[1], self.channels)
+        target[:count, :columns] = colors[:count, :columns]
+        target[:count, columns:] = 0
+
+    def roll(self, shift):
+        """Rotate the colors shift LEDs along the strip (backwards if negative), wrapping around the ends"""
+        self.pixels[:] = np.roll(self.pixels, shift, axis=0)
+
+    def shift(self, shift, red=0, green=0, blue=0, white=0):
+        """Move the colors shift LEDs along the strip (backwards if negative), filling the gap with a color"""
+        if shift == 0:
+            return
+        if abs(shift) >= self.num_leds:
+            self.fill_strip(red, green, blue, white)
+        elif shift > 0:
+            self.pixels[shift:] = self.pixels[:-shift].copy()
+            self.pixels[:shift] = self._color(red, green, blue, white)
+        else:
+            self.pixels[:shift] = self.pixels[-shift:].copy()
+            self.pixels[shift:] = self._color(red, green, blue, white)
+
+    def encode(self, channels, leds=slice(None)):
+        """Encode an (n, channels) uint8 array of wire-order color bytes into the frame buffer at leds"""
+        np.take(BITSTREAM, channels, axis=0, out=self.frame[leds])
+
+    def changed_leds(self, pixels=None):
+        """Slice of the LEDs from the first to the last one changed since the last frame, or None"""
+        if self.shown is None:
+            return slice(0, self.num_leds)
+        changed = np.flatnonzero(((self.pixels if pixels is None else pixels) != self.shown).any(axis=1))
+        if not len(changed):
+            return None
+        return slice(int(changed[0]), int(changed[-1]) + 1)
+
+    def show_frame(self, pixels, force=False):
+        """Encode the LEDs of pixels that changed since the last frame and send the frame, unless nothing changed"""
+        leds = slice(0, self.num_leds) if force else self.changed_leds(pixels)
+        if leds is None:
+            self.stats['frames_skipped'] += 1
+            return
+        self.encode(pixels[leds, WIRE_ORDER[self.pixel_type.value]], leds)
+        if self.shown is None:
+            self.shown = pixels.copy()
+        else:
+            self.shown[leds] = pixels[leds]
+        self.stats['frames_encoded'] += 1
+        self.stats['leds_encoded'] += leds.stop - leds.start
+        self.send_spi_data()
+        self.stats['frames_sent'] += 1
+
+    def _transmit(self):
+        """Transmit thread: show frames from ready_frames until it gets None"""
+        while True:
+            item = self.ready_frames.get()
+            try:
+                if item is None:
+                    return
+                front, force = item
+                if self.transmit_error is None:
+                    try:
+                        self.show_frame(front, force)
+                    except Exception as e:
+                        self.transmit_error = e
+                self.free_buffers.put(front)
+            finally:
+                self.ready_frames.task_done()
+
+    def _check_transmit(self):
+        if self.transmit_error is not None:
+            raise self.transmit_error
+
+    def swap(self, force=False):
+        """Hand a copy of the pixels to the transmit thread and return, so the next frame can be rendered
+
+        Blocks while queue_depth frames are already waiting to be sent, which keeps rendering from
+        running ahead of the strip.
+        """
+        self._check_transmit()
+        front = self.free_buffers.get()
+        np.copyto(front, self.pixels)
+        self.ready_frames.put((front, force))
+
+    def wait_vsync(self):
+        """Block until every frame handed over by swap() has been sent"""
+        if self.background:
+            self.ready_frames.join()
+            self._check_transmit()
+
+    def close(self):
+        """Send any frames still waiting, stop the transmit thread and close the SPI device"""
+        if self.background and self.transmit_thread.is_alive():
+            self.ready_frames.put(None)
+            self.transmit_thread.join()
+        if hasattr(self.spi, 'close'):
+            self.spi.close()
+        self._check_transmit()
+
+    def update_strip(self, sleep_duration=0.1, force=False):
         """Send the current state of the LED strip to the NeoPixels
          Parameters:
         - sleep_duration (float): The duration (in seconds) to pause after sending the data.
           If None, no delay is introduced.
+        - force (bool): Re-encode and send the whole frame even if nothing changed, e.g. after
+          the strip has been powered off.
+
+        Only the LEDs that changed since the last frame are re-encoded, and a frame identical
+        to the last one is not sent at all; self.stats counts what happened. In background mode
+        this swaps buffers and the transmit thread does the rest.
         """
-        total_bytes = 0
-        for i in range(self.num_leds):
-            led = self.led_state[i]  # Get the color for each LED
-
-            if self.pixel_type is EPixelType.RGB:
-                bitstream = self.rgb_to_spi_bitstream(led.red, led.green, led.blue)
-            elif self.pixel_type is EPixelType.RGBW:
-                bitstream = self.rgbw_to_spi_bitstream(led.red, led.green, led.blue, led.white)
-
-            for j in range(self.bytes_per_led):
-                self.raw_data[total_bytes] = bitstream[j]
-                total_bytes += 1
-        self.send_spi_data()
+        if self.background:
+            self.swap(force)
+        else:
+            self.show_frame(self.pixels, force)
 
         if sleep_duration is not None:
-            time.sleep(sleep_duration)
\ No newline at end of file
+            time.sleep(sleep_duration)
@@ -0,0 +1,224 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import time
+
+import numpy as np
+
+from gcode_parser import bounds, parse_commands, segment_lengths
+from gcode_reader import read_gcode_file
+
+CACHE_DIR = os.path.expanduser('~/.cache/sand/patterns')
+CACHE_VERSION = 1  # Bump when the entry format or preprocessing output changes
+MAX_CACHE_BYTES = 64 * 1024 * 1024  # Least recently used entries go beyond this
+
+def file_digest(file_path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(digest, options=None):
+    """Entry name for a file digest plus the preprocessing options applied to it."""
+    options = json.dumps(options or {}, sort_keys=True)
+    return hashlib.sha256(f"{CACHE_VERSION}:{digest}:{options}".encode()).hexdigest()[:32]
+
+class CachedPattern:
+    """A compiled pattern on disk: commands, move array and metadata.
+
+    The command blob and the move array are memory-mapped, so opening an
+    entry costs the same whatever the size of the pattern.
+    """
+
+    def __init__(self, cache_dir, key):
+        base = os.path.join(cache_dir, key)
+        with open(base + '.json', 'r') as f:
+            self.meta = json.load(f)
+        self.commands_path = base + '.cmds'
+        self.moves_path = base + '.npy'
+        self.total = self.meta['lines']
+        os.utime(base + '.json')  # Mark as recently used for eviction
+
+    def commands(self):
+        """Lazily yield the cached commands from a memory map."""
+        if os.path.getsize(self.commands_path) == 0:
+            return
+        with open(self.commands_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            size = len(mm)
+            while start < size:
+                end = mm.find(b'\n', start)
+                if end < 0:
+                    end = size
+                yield mm[start:end].decode()
+                start = end + 1
+
+    def moves(self):
+        """The MOVE_DTYPE array of the processed commands (read-only memmap), or None."""
+        if not os.path.exists(self.moves_path):
+            return None
+        return np.load(self.moves_path, mmap_mode='r')
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+def _entry_files(cache_dir, key):
+    return [os.path.join(cache_dir, key + ext) for ext in ('.json', '.cmds', '.npy')]
+
+def remove_entry(cache_dir, key):
+    """Delete all files of one entry."""
+    for path in _entry_files(cache_dir, key):
+        if os.path.exists(path):
+            os.remove(path)
+
+def list_entries(cache_dir=CACHE_DIR):
+    """Metadata of every entry, least recently used first."""
+    if not os.path.isdir(cache_dir):
+        return []
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith('.json'):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            with open(path, 'r') as f:
+                meta = json.load(f)
+            meta['used'] = os.path.getmtime(path)
+        except (OSError, ValueError):
+            continue
+        entries.append(meta)
+    entries.sort(key=lambda meta: meta['used'])
+    return entries
+
+def prune(cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+    """Evict entries whose source file changed or vanished, then trim to max_bytes."""
+    removed = 0
+    kept = []
+    for meta in list_entries(cache_dir):
+        source = meta['source']
+        # Size and mtime are a cheap check; the file is only hashed if they moved
+        stale = (not os.path.exists(source) or os.path.getsize(source) != meta['source_size']
+                 or (os.path.getmtime(source) != meta['source_mtime'] and file_digest(source) != meta['digest']))
+        if stale:
+            remove_entry(cache_dir, meta['key'])
+            removed += 1
+        else:
+            kept.append(meta)
+
+    total = sum(meta['bytes'] for meta in kept)
+    for meta in kept:
+        if total <= max_bytes:
+            break
+        remove_entry(cache_dir, meta['key'])
+        total -= meta['bytes']
+        removed += 1
+    return removed
+
+def store(file_path, commands, options=None, digest=None, cache_dir=CACHE_DIR):
+    """Write processed commands for a file to the cache and return the entry."""
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = digest or file_digest(file_path)
+    key = cache_key(digest, options)
+    source = os.path.abspath(file_path)
+
+    blob = '\n'.join(commands).encode()
+    _write_atomic(os.path.join(cache_dir, key + '.cmds'), blob)
+    meta = {
+        'key': key,
+        'source': source,
+        'source_size': os.path.getsize(file_path),
+        'source_mtime': os.path.getmtime(file_path),
+        'digest': digest,
+        'options': options or {},
+        'lines': len(commands),
+        'bytes': len(blob),
+        'created': time.time(),
+    }
+    try:
+        moves = parse_commands(commands)
+    except ValueError:
+        moves = None  # Relative moves: commands are cached, geometry is not
+    if moves is not None and len(moves):
+        npy_path = os.path.join(cache_dir, key + '.npy')
+        tmp = f"{npy_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp, moves)
+        os.replace(tmp, npy_path)
+        meta['bytes'] += moves.nbytes
+        meta['bounds'] = [float(v) for v in bounds(moves)]
+        meta['start'] = [float(moves['x'][0]), float(moves['y'][0])]
+        meta['end'] = [float(moves['x'][-1]), float(moves['y'][-1])]
+        meta['path_length'] = float(segment_lengths(moves).sum())
+    # The metadata file is written last and marks the entry as complete
+    _write_atomic(os.path.join(cache_dir, key + '.json'), json.dumps(meta).encode())
+
+    # Older entries for the same file with the same options are now stale
+    for old in list_entries(cache_dir):
+        if old['source'] == source and old['options'] == meta['options'] and old['key'] != key:
+            remove_entry(cache_dir, old['key'])
+    return CachedPattern(cache_dir, key)
+
+def compile_pattern(file_path, build=None, options=None, cache_dir=CACHE_DIR):
+    """Load a pattern from the cache, building and storing it on a miss.
+
+    build() must return the processed command list; by default the file's
+    cleaned commands are used. Returns (entry, hit).
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"G-code file '{file_path}' not found")
+    digest = file_digest(file_path)
+    key = cache_key(digest, options)
+    if os.path.exists(os.path.join(cache_dir, key + '.json')):
+        try:
+            return CachedPattern(cache_dir, key), True
+        except (OSError, ValueError):
+            remove_entry(cache_dir, key)
+    commands = build() if build else read_gcode_file(file_path)
+    entry = store(file_path, commands, options, digest, cache_dir)
+    prune(cache_dir)
+    return entry, False
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the compiled-pattern cache")
+    parser.add_argument('--cache-dir', type=str, default=CACHE_DIR, help=f"Cache directory (default {CACHE_DIR})")
+    sub = parser.add_subparsers(dest='action', required=True)
+    warm_parser = sub.add_parser('warm', help="Compile G-code files into the cache (no preprocessing)")
+    warm_parser.add_argument('gcode_files', nargs='+', help="Path(s) to G-code file(s)")
+    sub.add_parser('list', help="List cached entries")
+    sub.add_parser('prune', help="Evict stale entries and trim the cache to its size limit")
+    sub.add_parser('clear', help="Delete every entry")
+    args = parser.parse_args()
+
+    if args.action == 'warm':
+        for gcode_file in args.gcode_files:
+            try:
+                start_time = time.perf_counter()
+                entry, hit = compile_pattern(gcode_file, cache_dir=args.cache_dir)
+            except FileNotFoundError as e:
+                print(e)
+                continue
+            state = 'cached' if hit else 'compiled'
+            print(f"{gcode_file}: {state}, {entry.total} commands "
+                  f"in {(time.perf_counter() - start_time) * 1000:.1f} ms")
+    elif args.action == 'list':
+        entries = list_entries(args.cache_dir)
+        for meta in entries:
+            print(f"{meta['key']}  {meta['lines']:>7} lines  {meta['bytes']:>9} bytes  "
+                  f"{meta['source']} {json.dumps(meta['options'], sort_keys=True)}")
+        print(f"{len(entries)} entries, {sum(meta['bytes'] for meta in entries)} bytes")
+    elif args.action == 'prune':
+        print(f"Removed {prune(args.cache_dir)} entries")
+    elif args.action == 'clear':
+        entries = list_entries(args.cache_dir)
+        for meta in entries:
+            remove_entry(args.cache_dir, meta['key'])
+        print(f"Removed {len(entries)} entries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import glob
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from estimate import DEFAULT_SETTINGS, format_duration, load_settings, plan_moves
+from gcode_parser import parse_gcode
+from gcode_reader import count_gcode_lines
+from pattern_cache import file_digest
+from transitions import move_endpoints
+
+INDEX_PATH = os.path.expanduser('~/.cache/sand/patterns.db')
+INDEX_VERSION = 2  # Bump when the metadata or how it is computed changes
+PATTERN_DIR = 'patterns'
+PATTERN_GLOBS = ('*.gcode', '*.sdf')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS patterns (
+    path TEXT PRIMARY KEY,
+    mtime REAL, size INTEGER, digest TEXT,
+    lines INTEGER, moves INTEGER, length REAL, seconds REAL,
+    min_x REAL, min_y REAL, max_x REAL, max_y REAL,
+    start_x REAL, start_y REAL, end_x REAL, end_y REAL, end_feed REAL,
+    indexed REAL
+);
+"""
+COLUMNS = ('path', 'mtime', 'size', 'digest', 'lines', 'moves', 'length', 'seconds', 'min_x', 'min_y', 'max_x',
+           'max_y', 'start_x', 'start_y', 'end_x', 'end_y', 'end_feed', 'indexed')
+
+def open_index(index_path=INDEX_PATH):
+    """Open (creating if needed) the index database."""
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    db = sqlite3.connect(index_path)
+    db.row_factory = sqlite3.Row
+    db.executescript(SCHEMA)
+    return db
+
+def _meta(db, key):
+    row = db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row['value'] if row else None
+
+def _pattern_files(directory):
+    files = []
+    for pattern in PATTERN_GLOBS:
+        files += glob.glob(os.path.join(directory, pattern))
+    return sorted(os.path.abspath(f) for f in files)
+
+def file_metadata(gcode_file, settings=None, digest=None):
+    """Metadata row for one file: counts, path length, bounds, end points and run time."""
+    moves = parse_gcode(gcode_file)
+    plan = plan_moves(moves, settings)
+    start, end, feed = move_endpoints(moves)
+    known = moves[~(np.isnan(moves['x']) | np.isnan(moves['y']))]
+    stat = os.stat(gcode_file)
+    return {
+        'path': os.path.abspath(gcode_file),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'digest': digest or file_digest(gcode_file),
+        'lines': count_gcode_lines(gcode_file),
+        'moves': len(moves),
+        'length': round(float(plan['length'].sum()), 3),
+        'seconds': round(float(plan['time'].sum()), 3),
+        'min_x': float(known['x'].min()) if len(known) else None,
+        'min_y': float(known['y'].min()) if len(known) else None,
+        'max_x': float(known['x'].max()) if len(known) else None,
+        'max_y': float(known['y'].max()) if len(known) else None,
+        'start_x': start[0] if start else None,
+        'start_y': start[1] if start else None,
+        'end_x': end[0] if end else None,
+        'end_y': end[1] if end else None,
+        'end_feed': feed,
+        'indexed': round(time.time(), 3),
+    }
+
+def update_index(db, directory=PATTERN_DIR, settings=None, stats=None):
+    """Bring the index up to date with the pattern files in directory.
+
+    A file whose mtime and size match its row is not opened at all; one
+    whose contents hash the same as before only gets its mtime refreshed.
+    Everything is re-indexed when the GRBL settings used for the run time
+    estimates change. If stats is a dict it receives counts of what
+    happened to the files.
+    """
+    settings = settings or DEFAULT_SETTINGS
+    fingerprint = json.dumps([INDEX_VERSION, sorted(settings.items())])
+    if _meta(db, 'fingerprint') != fingerprint:
+        # The columns may have changed too
+        db.execute("DROP TABLE IF EXISTS patterns")
+        db.executescript(SCHEMA)
+        db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+
+    counts = {'added': 0, 'updated': 0, 'touched': 0, 'unchanged': 0, 'removed': 0}
+    files = _pattern_files(directory)
+    rows = {row['path']: row for row in db.execute("SELECT path, mtime, size, digest FROM patterns")}
+    for path in files:
+        stat = os.stat(path)
+        row = rows.get(path)
+        if row is not None and row['mtime'] == stat.st_mtime and row['size'] == stat.st_size:
+            counts['unchanged'] += 1
+            continue
+        digest = file_digest(path)
+        if row is not None and row['digest'] == digest:
+            db.execute("UPDATE patterns SET mtime = ?, size = ? WHERE path = ?", (stat.st_mtime, stat.st_size, path))
+            counts['touched'] += 1
+            continue
+        try:
+            meta = file_metadata(path, settings, digest)
+        except ValueError as e:
+            print(f"{path}: {e}")
+            continue
+        db.execute(f"INSERT OR REPLACE INTO patterns VALUES ({', '.join('?' * len(COLUMNS))})",
+                   [meta[column] for column in COLUMNS])
+        counts['updated' if row is not None else 'added'] += 1
+
+    # Files that are gone from this directory
+    prefix = os.path.join(os.path.abspath(directory), '')
+    present = set(files)
+    for path in rows:
+        if path.startswith(prefix) and path not in present:
+            db.execute("DELETE FROM patterns WHERE path = ?", (path,))
+            counts['removed'] += 1
+    db.commit()
+    if stats is not None:
+        stats.update(counts)
+    return db
+
+def lookup(db, gcode_file):
+    """The indexed metadata of a file as a dict, or None if it isn't indexed or has changed since."""
+    path = os.path.abspath(gcode_file)
+    row = db.execute("SELECT * FROM patterns WHERE path = ?", (path,)).fetchone()
+    if row is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if row['mtime'] != stat.st_mtime or row['size'] != stat.st_size:
+        return None
+    return dict(row)
+
+def indexed_endpoints(db, gcode_file):
+    """(start, end, feed at the end) of a file from the index, like transitions.endpoints().
+
+    None if the file isn't indexed or has changed since.
+    """
+    meta = lookup(db, gcode_file)
+    if meta is None:
+        return None
+    start = (meta['start_x'], meta['start_y']) if meta['start_x'] is not None else None
+    end = (meta['end_x'], meta['end_y']) if meta['end_x'] is not None else None
+    return start, end, meta.get('end_feed')
+
+def find_patterns(db, max_seconds=None, exclude=()):
+    """Indexed patterns with known end points, optionally no longer than max_seconds."""
+    query = "SELECT * FROM patterns WHERE start_x IS NOT NULL"
+    params = []
+    if max_seconds is not None:
+        query += " AND seconds <= ?"
+        params.append(max_seconds)
+    rows = [dict(row) for row in db.execute(query + " ORDER BY path", params)]
+    return [row for row in rows if os.path.basename(row['path']) not in exclude]
+
+def order_patterns(rows, start=(0.0, 0.0), budget=None):
+    """Order patterns so each starts near where the last ended (greedy nearest neighbour).
+
+    With budget (seconds), patterns that would overrun it are left out.
+    """
+    remaining = list(rows)
+    ordered = []
+    position = start
+    total = 0.0
+    while remaining:
+        row = min(remaining, key=lambda r: math.dist(position, (r['start_x'], r['start_y'])))
+        remaining.remove(row)
+        if budget is not None and total + row['seconds'] > budget:
+            continue
+        ordered.append(row)
+        total += row['seconds']
+        position = (row['end_x'], row['end_y'])
+    return ordered
+
+def main():
+    parser = argparse.ArgumentParser(description="Index pattern metadata for choosing and ordering patterns")
+    parser.add_argument('--index', type=str, default=INDEX_PATH, help=f"Index database (default {INDEX_PATH})")
+    parser.add_argument('--dir', type=str, default=PATTERN_DIR, help=f"Pattern directory (default {PATTERN_DIR})")
+    parser.add_argument('--settings', type=str, help="File with GRBL '$$' output for the run time estimates")
+    sub = parser.add_subparsers(dest='action')
+    sub.add_parser('update', help="Index new and changed patterns (the default)")
+    sub.add_parser('list', help="Show the indexed patterns")
+    playlist_parser = sub.add_parser('playlist', help="Write a playlist ordered to keep transitions short")
+    playlist_parser.add_argument('--max-time', type=float, metavar='MINUTES',
+                                 help="Stop adding patterns once the playlist would run longer than this")
+    playlist_parser.add_argument('--exclude', nargs='*', default=['wiper.gcode'],
+                                 help="File names to leave out (default wiper.gcode)")
+    playlist_parser.add_argument('-o', '--output', type=str, help="Write the playlist here instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        settings = load_settings(args.settings) if args.settings else DEFAULT_SETTINGS
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+    db = open_index(args.index)
+    start_time = time.perf_counter()
+    stats = {}
+    update_index(db, args.dir, settings, stats)
+    elapsed = time.perf_counter() - start_time
+
+    if args.action in (None, 'update'):
+        print(f"Indexed {args.dir} in {elapsed * 1000:.0f} ms: " + ', '.join(f"{n} {k}" for k, n in stats.items()))
+    elif args.action == 'list':
+        for row in db.execute("SELECT * FROM patterns ORDER BY path"):
+            print(f"{os.path.relpath(row['path'])}: {row['lines']} lines, {row['length'] / 1000:.1f} m, "
+                  f"{format_duration(row['seconds'])}, start ({row['start_x']}, {row['start_y']}) "
+                  f"end ({row['end_x']}, {row['end_y']})")
+    else:
+        budget = args.max_time * 60 if args.max_time else None
+        rows = order_patterns(find_patterns(db, budget, args.exclude), budget=budget)
+        base = os.path.dirname(os.path.abspath(args.output)) if args.output else os.getcwd()
+        lines = [os.path.relpath(row['path'], base) for row in rows]
+        total = sum(row['seconds'] for row in rows)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(f"# {len(rows)} patterns, estimated {format_duration(total)}\n")
+                f.write('\n'.join(lines) + '\n')
+            print(f"Playlist of {len(rows)} patterns ({format_duration(total)}) written to {args.output}")
+        else:
+            print('\n'.join(lines))
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import glob
+import os
+import struct
+import sys
+import time
+import zlib
+from multiprocessing import Pool
+
+import numpy as np
+
+from gcode_parser import parse_gcode
+from pattern_cache import file_digest
+from smart_wipe import sample_path
+from transitions import TABLE_HEIGHT, TABLE_WIDTH
+from wipes import BALL_DIAMETER
+
+PREVIEW_DIR = os.path.expanduser('~/.cache/sand/previews')
+PREVIEW_VERSION = 1  # Bump when the rendering changes
+IMAGE_WIDTH = 425  # Pixels; the height follows the table's aspect ratio
+SAND = 225  # Grey level of untouched sand
+GROOVE = 110  # How much darker the bottom of the ball's track is
+
+def groove_distance(x, y, shape, radius):
+    """Per-pixel distance to the nearest path sample, in pixels, or inf beyond radius.
+
+    Samples mark their pixels once; then each offset within the ball's
+    radius is applied to the whole mark grid at once, so the cost depends
+    on the ball size, not the number of segments.
+    """
+    rows, cols = shape
+    marks = np.zeros(shape, dtype=bool)
+    ix = np.clip(np.round(x).astype(np.int64), 0, cols - 1)
+    iy = np.clip(np.round(y).astype(np.int64), 0, rows - 1)
+    marks[iy, ix] = True
+    r = int(np.ceil(radius))
+    padded = np.pad(marks, r)
+    distance = np.full(shape, np.inf)
+    for dy in range(-r, r + 1):
+        for dx in range(-r, r + 1):
+            d = np.hypot(dx, dy)
+            if d <= radius:
+                hit = padded[r + dy:r + dy + rows, r + dx:r + dx + cols]
+                np.minimum(distance, np.where(hit, d, np.inf), out=distance)
+    return distance
+
+def render_preview(moves, image_width=IMAGE_WIDTH, ball_diameter=BALL_DIAMETER, width=TABLE_WIDTH,
+                   height=TABLE_HEIGHT):
+    """Greyscale uint8 image of the sand after moves, top row at the far edge of the table.
+
+    The ball leaves a groove as wide as itself, darkest along the middle
+    and shaded like the section of a sphere towards its edges.
+    """
+    scale = image_width / width
+    shape = (max(int(round(height * scale)), 1), image_width)
+    if not len(moves):
+        return np.full(shape, SAND, dtype=np.uint8)
+    x, y = sample_path(moves, 0.5 / scale)
+    radius = max(ball_diameter * scale / 2, 0.5)
+    distance = groove_distance(x * scale, y * scale, shape, radius)
+    depth = np.sqrt(np.clip(1 - (distance / radius) ** 2, 0, 1))
+    image = (SAND - GROOVE * depth).astype(np.uint8)
+    return image[::-1]
+
+def write_pgm(path, image):
+    with open(path, 'wb') as f:
+        f.write(f"P5\n{image.shape[1]} {image.shape[0]}\n255\n".encode())
+        f.write(image.tobytes())
+
+def write_png(path, image):
+    """Write a greyscale uint8 image as PNG with nothing but the standard library."""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    rows, cols = image.shape
+    # Filter type 0 (none) before every row
+    raw = np.hstack([np.zeros((rows, 1), dtype=np.uint8), image]).tobytes()
+    with open(path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        f.write(chunk(b'IHDR', struct.pack('>IIBBBBB', cols, rows, 8, 0, 0, 0, 0)))
+        f.write(chunk(b'IDAT', zlib.compress(raw, 6)))
+        f.write(chunk(b'IEND', b''))
+
+def write_image(path, image, fmt=None):
+    """Write as fmt ('png' or 'pgm'), by default PGM if path ends in .pgm and PNG otherwise."""
+    if (fmt or os.path.splitext(path)[1].lower().lstrip('.')) == 'pgm':
+        write_pgm(path, image)
+    else:
+        write_png(path, image)
+
+def preview_path(gcode_file, image_width=IMAGE_WIDTH, ball_diameter=BALL_DIAMETER, fmt='png',
+                 preview_dir=PREVIEW_DIR):
+    """Thumbnail path for a file's contents and the rendering options."""
+    digest = file_digest(gcode_file)
+    return os.path.join(preview_dir, f"{digest[:32]}-{PREVIEW_VERSION}-{image_width}-{ball_diameter:g}.{fmt}")
+
+def cached_preview(gcode_file, image_width=IMAGE_WIDTH, ball_diameter=BALL_DIAMETER, fmt='png',
+                   preview_dir=PREVIEW_DIR):
+    """Path of the file's thumbnail, rendering it unless the cache has it; returns (path, hit)."""
+    path = preview_path(gcode_file, image_width, ball_diameter, fmt, preview_dir)
+    if os.path.exists(path):
+        return path, True
+    image = render_preview(parse_gcode(gcode_file), image_width, ball_diameter)
+    os.makedirs(preview_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write_image(tmp, image, fmt)
+    os.replace(tmp, path)
+    return path, False
+
+def _batch_preview(job):
+    gcode_file, image_width, ball_diameter, fmt = job
+    start_time = time.perf_counter()
+    try:
+        path, hit = cached_preview(gcode_file, image_width, ball_diameter, fmt)
+    except (FileNotFoundError, ValueError) as e:
+        return gcode_file, None, str(e), 0.0
+    return gcode_file, path, 'cached' if hit else 'rendered', time.perf_counter() - start_time
+
+def main():
+    parser = argparse.ArgumentParser(description="Render G-code patterns as the ball would leave the sand")
+    parser.add_argument('--width', type=int, default=IMAGE_WIDTH, help=f"Image width in pixels (default {IMAGE_WIDTH})")
+    parser.add_argument('--ball', type=float, default=BALL_DIAMETER,
+                        help=f"Ball diameter in mm, the width of the track (default {BALL_DIAMETER:g})")
+    parser.add_argument('--format', choices=['png', 'pgm'], default='png', help="Thumbnail format (default png)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(),
+                        help="Render this many files in parallel (default: one per core)")
+    parser.add_argument('-o', '--output', type=str,
+                        help="Render one file to this .png or .pgm path instead of the thumbnail cache")
+    parser.add_argument('gcode_files', nargs='*', help="G-code or .sdf file(s) (default: patterns/*)")
+    args = parser.parse_args()
+
+    if args.output:
+        if len(args.gcode_files) != 1:
+            print("Error: --output takes exactly one G-code file")
+            sys.exit(1)
+        try:
+            image = render_preview(parse_gcode(args.gcode_files[0]), args.width, args.ball)
+        except FileNotFoundError as e:
+            print(e)
+            sys.exit(1)
+        write_image(args.output, image)
+        print(f"Preview written to {args.output}")
+        return
+
+    gcode_files = args.gcode_files or sorted(glob.glob(os.path.join('patterns', '*.gcode'))
+                                             + glob.glob(os.path.join('patterns', '*.sdf')))
+    jobs = [(gcode_file, args.width, args.ball, args.format) for gcode_file in gcode_files]
+    start_time = time.perf_counter()
+    with Pool(max(min(args.jobs, len(jobs)), 1)) as pool:
+        for gcode_file, path, outcome, seconds in pool.imap(_batch_preview, jobs):
+            if path is None:
+                print(f"{gcode_file}: {outcome}")
+            else:
+                print(f"{gcode_file}: {outcome} in {seconds * 1000:.0f} ms -> {path}")
+    print(f"{len(jobs)} previews in {time.perf_counter() - start_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+from collections import deque
+
+from estimate import format_duration
+
+# Verbosity levels: errors only, progress lines, every command and reply
+QUIET, NORMAL, VERBOSE = 0, 1, 2
+PROGRESS_INTERVAL = 10.0  # Seconds between progress lines
+RING_SIZE = 4096  # Per-command trace records kept in memory
+DUMP_DIR = os.path.expanduser('~/.cache/sand/logs')
+
+class RunLog:
+    """Console output, JSON-lines event log and in-memory command trace for a run.
+
+    Per-command records only go into a ring buffer of plain tuples, so the
+    serial loop does no formatting or I/O for them; the buffer is written
+    out by dump(), which runs on every error. Everything else is an event:
+    printed when the verbosity allows and appended to log_file as one JSON
+    object per line (buffered, flushed on errors and close()).
+    """
+
+    def __init__(self, level=NORMAL, log_file=None, interval=PROGRESS_INTERVAL, ring_size=RING_SIZE,
+                 dump_dir=DUMP_DIR):
+        self.level = level
+        self.interval = interval
+        self.dump_dir = dump_dir
+        self.ring = deque(maxlen=ring_size)
+        self.file = open(log_file, 'a', buffering=1 << 16) if log_file else None
+        self.status = None  # A grbl_status.StatusPoller to report live position from
+        self.dumps = 0  # Numbers this log's dump files, which can come within the same second
+        self.begin()
+
+    def begin(self, total=None, schedule=None, done=0):
+        """Start counting progress for a new batch of commands, done of them already sent."""
+        self.total = total
+        self.schedule = schedule
+        self.first = done
+        self.done = done
+        self.started = time.monotonic()
+        self.next_progress = self.started + self.interval
+
+    def event(self, event, message=None, level=NORMAL, **fields):
+        """Record a structured event; message is what the console shows."""
+        record = {'time': round(time.time(), 3), 'event': event}
+        if message is not None:
+            record['message'] = message.strip()
+        record.update(fields)
+        self.ring.append(record)
+        if self.file:
+            self.file.write(json.dumps(record) + '\n')
+        if message is not None and level <= self.level:
+            print(message)
+
+    def warning(self, message, **fields):
+        self.event('warning', message, **fields)
+
+    def error(self, message, **fields):
+        """Record an error, flush the event log and dump the command trace."""
+        self.event('error', message, level=QUIET, **fields)
+        if self.file:
+            self.file.flush()
+        self.dump()
+
+    def sent(self, i, cmd):
+        self.ring.append((time.monotonic(), 'sent', i, cmd))
+        if self.level >= VERBOSE:
+            print(f"[{i}/{self.total or '?'}] Sending: {cmd}")
+
+    def reply(self, i, response):
+        self.ring.append((time.monotonic(), 'reply', i, response))
+        self.done = i
+        if self.level >= VERBOSE:
+            print(f"-> [{i}] Response: {response}")
+        if time.monotonic() >= self.next_progress:
+            self.progress()
+
+    def progress(self):
+        """Emit a progress event; called at most once per interval from reply()."""
+        now = time.monotonic()
+        self.next_progress = now + self.interval
+        elapsed = now - self.started
+        rate = (self.done - self.first) / elapsed if elapsed > 0 else 0.0
+        fields = {'done': self.done, 'total': self.total, 'lines_per_second': round(rate, 1)}
+        message = f"[{self.done}/{self.total or '?'}]"
+        if self.total:
+            message += f" {100.0 * self.done / self.total:.1f}%"
+        message += f" {rate:.0f} lines/s"
+        if self.schedule is not None:
+            left = self.schedule[-1] - self.schedule[min(self.done, len(self.schedule) - 1)]
+            fields['eta_seconds'] = round(float(left), 1)
+            message += f", ETA {format_duration(left)}"
+        status = self.status.latest if self.status is not None else None
+        if status is not None and status['mpos'] is not None:
+            x, y = status['mpos'][:2]
+            fields['machine'] = {key: status[key] for key in ('state', 'mpos', 'feed', 'planner_free', 'rx_free')}
+            message += f", {status['state']} X{x:.1f} Y{y:.1f}"
+            if status['feed'] is not None:
+                message += f" F{status['feed']:.0f}"
+            if status['planner_free'] is not None:
+                message += f" Bf {status['planner_free']}/{status['rx_free']}"
+        self.event('progress', message, **fields)
+
+    def finish(self, ok=True):
+        """Close a batch with a summary event."""
+        elapsed = time.monotonic() - self.started
+        message = f"{'Sent' if ok else 'Stopped after'} {self.done - self.first} lines in {format_duration(elapsed)}"
+        self.event('finish', message, ok=ok, done=self.done, total=self.total, seconds=round(elapsed, 3))
+
+    def dump(self, path=None):
+        """Write the ring buffer as JSON lines; returns the path written."""
+        if path is None:
+            os.makedirs(self.dump_dir, exist_ok=True)
+            now = time.time()
+            self.dumps += 1
+            stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}.{int(now * 1000) % 1000:03d}"
+            path = os.path.join(self.dump_dir, f"trace-{stamp}-{os.getpid()}-{self.dumps}.jsonl")
+        # Map the monotonic trace clock onto wall time for the dump
+        offset = time.time() - time.monotonic()
+        with open(path, 'w') as f:
+            for record in list(self.ring):
+                if isinstance(record, tuple):
+                    stamp, kind, i, text = record
+                    record = {'time': round(stamp + offset, 4), 'event': kind, 'line': i, 'text': text}
+                f.write(json.dumps(record) + '\n')
+        print(f"Trace written to {path}")
+        return path
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,250 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+
+import serial
+
+from estimate import read_settings
+from gcode_reader import read_gcode_file, read_playlist
+from grbl_status import DEFAULT_RATE, StatusPoller
+from run_log import NORMAL, QUIET, VERBOSE, RunLog
+from send import SERIAL_PORT, connect_grbl, send_file
+from transitions import plan_transition
+
+# Daemon settings
+SOCKET_PATH = '/tmp/sand.sock'  # Local control socket shared by daemon and client
+
+class SandDaemon:
+    """Owns the GRBL serial connection and runs queued jobs in order."""
+
+    def __init__(self, port=SERIAL_PORT, stream=False, eta=False, log=None, status_rate=DEFAULT_RATE,
+                 transitions=False, **preprocess):
+        self.port = port
+        self.stream = stream
+        self.eta = eta
+        self.transitions = transitions
+        self.last_file = None  # Pattern the ball last finished, for transitions
+        self.status_rate = status_rate
+        self.log = log or RunLog()
+        self.settings = None  # GRBL planner settings for time estimates
+        self.preprocess = preprocess  # Options for send.load_commands()
+        self.ser = None
+        self.jobs = queue.Queue()
+        self.current = None
+        self.completed = 0
+        self.lock = threading.Lock()
+
+    def connect(self):
+        """Handshake with GRBL; only needed at startup or after a serial error."""
+        self.ser = connect_grbl(self.port)
+        if self.status_rate:
+            # The poller stands in for the port and keeps the live position
+            self.ser = StatusPoller(self.ser, self.status_rate).start()
+            self.log.status = self.ser
+        if self.eta:
+            self.settings = read_settings(self.ser)
+
+    def submit(self, files, preamble=None):
+        """Queue a job: a list of G-code files sharing an optional preamble."""
+        for path in files + ([preamble] if preamble else []):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"G-code file '{path}' not found")
+        self.jobs.put({'files': files, 'preamble': preamble})
+        return self.jobs.qsize()
+
+    def clear(self):
+        """Drop all queued jobs; the running job is left to finish."""
+        dropped = 0
+        while True:
+            try:
+                self.jobs.get_nowait()
+            except queue.Empty:
+                return dropped
+            dropped += 1
+
+    def status(self):
+        """Snapshot of the daemon state for the client."""
+        with self.lock:
+            return {
+                'port': self.port,
+                'connected': self.ser is not None and self.ser.is_open,
+                'machine': getattr(self.ser, 'latest', None),
+                'current': self.current,
+                'queued': [job['files'] for job in list(self.jobs.queue) if job],
+                'completed': self.completed,
+            }
+
+    def run_job(self, job):
+        """Send every file of a job over the already-open connection."""
+        preamble_commands = read_gcode_file(job['preamble']) if job['preamble'] else []
+        for gcode_file in job['files']:
+            with self.lock:
+                self.current = gcode_file
+            transition = None
+            if self.transitions and self.last_file is not None:
+                transition = plan_transition(self.last_file, gcode_file)
+            self.last_file = None
+            try:
+                if send_file(self.ser, gcode_file, preamble_commands, stream=self.stream, settings=self.settings,
+                             log=self.log, transition=transition, **self.preprocess):
+                    self.last_file = gcode_file
+            except FileNotFoundError as e:
+                self.log.error(f"Error: {e}", file=gcode_file)
+
+    def worker(self):
+        """Run jobs in sequence, reconnecting only if the port was lost."""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                if self.ser is None:
+                    self.connect()
+                self.run_job(job)
+            except serial.SerialException as e:
+                self.log.error(f"Serial error: {e}")
+                if self.ser is not None:
+                    self.ser.close()
+                self.ser = None
+                self.last_file = None
+            except Exception as e:
+                self.log.error(f"Error: {e}")
+            finally:
+                with self.lock:
+                    self.current = None
+                    self.completed += 1
+        if self.ser is not None:
+            self.ser.close()
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """Handle one JSON request per connection from the client."""
+
+    def handle(self):
+        daemon = self.server.daemon
+        try:
+            request = json.loads(self.rfile.readline())
+            action = request.get('action')
+            if action == 'add':
+                position = daemon.submit(request['files'], request.get('preamble'))
+                reply = {'ok': True, 'queued': position}
+            elif action == 'status':
+                reply = {'ok': True, 'status': daemon.status()}
+            elif action == 'clear':
+                reply = {'ok': True, 'dropped': daemon.clear()}
+            elif action == 'dump':
+                reply = {'ok': True, 'path': daemon.log.dump()}
+            elif action == 'shutdown':
+                daemon.clear()
+                daemon.jobs.put(None)
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                reply = {'ok': True}
+            else:
+                reply = {'ok': False, 'error': f"Unknown action: {action}"}
+        except (ValueError, KeyError, FileNotFoundError) as e:
+            reply = {'ok': False, 'error': str(e)}
+        self.wfile.write((json.dumps(reply) + '\n').encode())
+
+def serve(port=SERIAL_PORT, socket_path=SOCKET_PATH, stream=False, **preprocess):
+    """Connect to GRBL once and serve jobs until shut down."""
+    daemon = SandDaemon(port, stream=stream, **preprocess)
+    daemon.connect()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)  # Stale socket from a previous run
+    server = socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler)
+    server.daemon = daemon
+    worker = threading.Thread(target=daemon.worker, daemon=True)
+    worker.start()
+    print(f"Sand daemon listening on {socket_path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        daemon.clear()
+        daemon.jobs.put(None)
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+    worker.join()
+
+def request(payload, socket_path=SOCKET_PATH):
+    """Send one request to a running daemon and return its reply."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(payload) + '\n').encode())
+        with sock.makefile('r') as f:
+            return json.loads(f.readline())
+
+def main():
+    parser = argparse.ArgumentParser(description="Sand table daemon: keeps GRBL connected and runs queued jobs")
+    parser.add_argument('--socket', type=str, default=SOCKET_PATH, help="Path to the control socket")
+    sub = parser.add_subparsers(dest='action', required=True)
+
+    serve_parser = sub.add_parser('serve', help="Run the daemon in the foreground")
+    serve_parser.add_argument('--port', type=str, default=SERIAL_PORT, help="Serial port of the GRBL controller")
+    serve_parser.add_argument('--stream', action='store_true', help="Use character-counting streaming")
+    serve_parser.add_argument('--simplify', type=float, metavar='MM', help="Simplify G1 paths to MM tolerance")
+    serve_parser.add_argument('--arcs', type=float, metavar='MM', help="Fit G2/G3 arcs to MM tolerance")
+    serve_parser.add_argument('--compact', action='store_true', help="Send minimal G-code serialization")
+    serve_parser.add_argument('--steps-per-mm', type=float, help="Quantize compacted axes to this step resolution")
+    serve_parser.add_argument('--cache', action='store_true', help="Reuse preprocessed patterns from the on-disk cache")
+    serve_parser.add_argument('--eta', action='store_true', help="Estimate run times from the controller's $$ settings")
+    serve_parser.add_argument('--transitions', action='store_true',
+                              help="Move between consecutive patterns along the table edge")
+    serve_parser.add_argument('--status-hz', type=float, default=DEFAULT_RATE,
+                              help="Poll GRBL's status this many times a second (default: don't poll)")
+    serve_parser.add_argument('-v', '--verbose', action='store_true', help="Print every command and reply")
+    serve_parser.add_argument('-q', '--quiet', action='store_true', help="Only print errors")
+    serve_parser.add_argument('--log-file', type=str, help="Append structured events to this file as JSON lines")
+
+    add_parser = sub.add_parser('add', help="Queue G-code files or a playlist as one job")
+    add_parser.add_argument('--preamble', type=str, help="Path to preamble G-code file")
+    add_parser.add_argument('--playlist', type=str, help="Playlist file with one G-code path per line")
+    add_parser.add_argument('gcode_files', nargs='*', help="Path(s) to G-code file(s)")
+
+    sub.add_parser('status', help="Show the running and queued jobs")
+    sub.add_parser('clear', help="Drop all queued jobs")
+    sub.add_parser('dump', help="Write the recent command trace to a file")
+    sub.add_parser('shutdown', help="Stop the daemon after the running job")
+    args = parser.parse_args()
+
+    if args.action == 'serve':
+        level = QUIET if args.quiet else VERBOSE if args.verbose else NORMAL
+        log = RunLog(level, args.log_file)
+        try:
+            serve(args.port, args.socket, stream=args.stream, eta=args.eta, log=log, status_rate=args.status_hz,
+                  transitions=args.transitions,
+                  cache=args.cache, simplify=args.simplify, arcs=args.arcs, compact=args.compact,
+                  steps_per_mm=args.steps_per_mm)
+        finally:
+            log.close()
+        return
+
+    payload = {'action': args.action}
+    if args.action == 'add':
+        files = list(args.gcode_files)
+        if args.playlist:
+            files += read_playlist(args.playlist)
+        if not files:
+            print("Error: At least one G-code file or a playlist must be provided")
+            sys.exit(1)
+        # The daemon may run from another directory
+        payload['files'] = [os.path.abspath(f) for f in files]
+        payload['preamble'] = os.path.abspath(args.preamble) if args.preamble else None
+
+    try:
+        reply = request(payload, args.socket)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Error: No sand daemon listening on {args.socket}")
+        sys.exit(1)
+    if not reply.get('ok'):
+        print(f"Error: {reply.get('error')}")
+        sys.exit(1)
+    print(json.dumps(reply, indent=2))
+
+if __name__ == "__main__":
+    main()
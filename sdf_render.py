@@ -0,0 +1,234 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+SDF_EXTENSION = '.sdf'
+# Same preamble as Sandify's exports in patterns/
+HEADER = ['M5', 'G21', 'G17', 'G90', 'F1000']
+
+def is_sdf(file_path):
+    return file_path.lower().endswith(SDF_EXTENSION)
+
+def load_sdf(file_path):
+    """Read a Sandify project file."""
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Sandify file '{file_path}' not found")
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+# Shapes, as unit-sized vertices centered on (0, 0), like Sandify's
+
+def rose(layer):
+    """r = sin(n/d * theta), traced until the curve closes."""
+    n, d = int(layer.get('roseN', 3)), int(layer.get('roseD', 2))
+    p = 2 if (n * d) % 2 == 0 else 1
+    theta = np.pi * np.arange(d * p * 32 * n + 1) / (32 * n)
+    r = np.sin(n / d * theta)
+    return r * np.cos(theta), r * np.sin(theta)
+
+def circle(layer):
+    theta = np.linspace(0, 2 * np.pi, 129)
+    if layer.get('circleDirection') == 'counterclockwise':
+        theta = -theta
+    return np.cos(theta), np.sin(theta)
+
+def polygon(layer):
+    theta = np.linspace(0, 2 * np.pi, int(layer.get('polygonSides', 4)) + 1)
+    return np.cos(theta), np.sin(theta)
+
+def star(layer):
+    points = int(layer.get('starPoints', 5))
+    theta = np.pi * np.arange(2 * points + 1) / points
+    r = np.where(np.arange(2 * points + 1) % 2 == 0, 1.0, float(layer.get('starRatio', 0.5)))
+    return r * np.cos(theta), r * np.sin(theta)
+
+def fractal_spirograph(layer):
+    """Circles riding on circles, each relativeSize times smaller and velocity times faster."""
+    circles = int(layer.get('fractalSpirographNumCircles', 4))
+    relative = float(layer.get('fractalSpirographRelativeSize', 3))
+    velocity = float(layer.get('fractalSpirographVelocity', 2))
+    resolution = int(layer.get('fractalSpirographResolution', 1))
+    alternate = layer.get('fractalSpirographAlternateRotation', False)
+    t = np.linspace(0, 2 * np.pi, 128 * resolution * int(velocity ** (circles - 1)) + 1)
+    x, y = np.zeros_like(t), np.zeros_like(t)
+    radius, speed, direction = 1.0, 1.0, 1.0
+    for _ in range(circles):
+        x += radius * np.cos(direction * speed * t)
+        y += radius * np.sin(direction * speed * t)
+        radius /= relative
+        speed *= velocity
+        if alternate:
+            direction = -direction
+    scale = np.hypot(x, y).max()
+    return x / scale, y / scale
+
+SHAPES = {'rose': rose, 'circle': circle, 'polygon': polygon, 'star': star,
+          'fractalSpirograph': fractal_spirograph}
+
+def transform(x, y, layer, center):
+    """Scale unit vertices to the layer's size, rotate them clockwise and move them into place."""
+    x = x * layer.get('width', 100) / 2
+    y = y * layer.get('height', 100) / 2
+    angle = -math.radians(layer.get('rotation', 0))
+    cos, sin = math.cos(angle), math.sin(angle)
+    x, y = x * cos - y * sin, x * sin + y * cos
+    return x + center[0] + layer.get('x', 0), y + center[1] + layer.get('y', 0)
+
+def wiper_lines(layer, bounds):
+    """Sandify's 'Lines' wiper: parallel lines wiperSize apart at wiperAngleDeg over the whole table.
+
+    Line k is x cos(a) + y sin(a) = k * size from the table's corner; the
+    lines run back and forth and are joined along the edges.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    width, height = max_x - min_x, max_y - min_y
+    angle = math.radians(layer.get('wiperAngleDeg', 15))
+    cos, sin = max(math.cos(angle), 1e-9), max(math.sin(angle), 1e-9)
+    c = np.arange(0, width * cos + height * sin, float(layer.get('wiperSize', 4)))
+    # Ends on the bottom or right edge and on the left or top edge
+    low_x = np.minimum(c / cos, width)
+    low_y = (c - low_x * cos) / sin
+    high_y = np.minimum(c / sin, height)
+    high_x = (c - high_y * sin) / cos
+    forward = np.arange(len(c)) % 2 == 1
+    x = np.empty(2 * len(c))
+    y = np.empty(2 * len(c))
+    x[0::2] = np.where(forward, low_x, high_x)
+    y[0::2] = np.where(forward, low_y, high_y)
+    x[1::2] = np.where(forward, high_x, low_x)
+    y[1::2] = np.where(forward, high_y, low_y)
+    return np.append(x, width) + min_x, np.append(y, height) + min_y
+
+def perimeter_path(start, end, bounds):
+    """Points from start to end along the table edge, as Sandify's 'along perimeter' connection.
+
+    The ball moves sideways to the nearer left or right edge, follows the
+    perimeter the shorter way round and moves sideways to end.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    mid = (min_x + max_x) / 2
+    out_point = (min_x if start[0] < mid else max_x, start[1])
+    in_point = (min_x if end[0] < mid else max_x, end[1])
+    if out_point[0] == in_point[0]:
+        return [out_point, in_point, end]
+    # Via the top or the bottom edge, whichever is shorter
+    up = (max_y - out_point[1]) + (max_y - in_point[1])
+    down = (out_point[1] - min_y) + (in_point[1] - min_y)
+    edge = max_y if up <= down else min_y
+    return [out_point, (out_point[0], edge), (in_point[0], edge), in_point, end]
+
+def clip_to_bounds(x, y, bounds):
+    """Keep a path on the table: split it where it crosses an edge, then clamp it.
+
+    Parts outside the table become moves along the edge, which is what
+    the ball would do anyway. Vectorized over all segments.
+    """
+    min_x, min_y, max_x, max_y = bounds
+    if len(x) < 2:
+        return np.clip(x, min_x, max_x), np.clip(y, min_y, max_y)
+    dx, dy = np.diff(x), np.diff(y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.stack([(min_x - x[:-1]) / dx, (max_x - x[:-1]) / dx,
+                      (min_y - y[:-1]) / dy, (max_y - y[:-1]) / dy], axis=1)
+    t[~((t > 0) & (t < 1))] = np.inf
+    t.sort(axis=1)
+    # Each segment contributes its start point and its crossings, in order
+    t = np.concatenate([np.zeros((len(dx), 1)), t], axis=1)
+    keep = np.isfinite(t)
+    seg = np.broadcast_to(np.arange(len(dx))[:, None], t.shape)[keep]
+    t = t[keep]
+    cx = np.append(x[seg] + t * dx[seg], x[-1])
+    cy = np.append(y[seg] + t * dy[seg], y[-1])
+    return np.clip(cx, min_x, max_x), np.clip(cy, min_y, max_y)
+
+def render(project, stats=None):
+    """Trace a Sandify project's visible layers into one (x, y) path in machine coordinates.
+
+    Layers are drawn in order, each joined to the last by its connection
+    method and clipped to the machine's bounds. If stats is a dict it
+    receives the layers drawn and those skipped as unsupported.
+    """
+    machine = project.get('machine', {})
+    bounds = (machine.get('minX', 0), machine.get('minY', 0), machine.get('maxX', 500), machine.get('maxY', 500))
+    center = ((bounds[0] + bounds[2]) / 2, (bounds[1] + bounds[3]) / 2)
+    layers = project.get('layers', {})
+    drawn, skipped = [], []
+    xs, ys = [], []
+    for layer_id in layers.get('ids', []):
+        layer = layers['entities'][layer_id]
+        if not layer.get('visible', True):
+            continue
+        kind = layer.get('type')
+        if kind == 'wiper' and layer.get('wiperType', 'Lines') == 'Lines':
+            x, y = wiper_lines(layer, bounds)
+        elif kind in SHAPES:
+            x, y = transform(*SHAPES[kind](layer), layer, center)
+        else:
+            skipped.append(f"{kind} '{layer.get('name', layer_id)}'")
+            continue
+        if layer.get('effectIds'):
+            skipped.append(f"effects of '{layer.get('name', layer_id)}'")
+        x, y = clip_to_bounds(x, y, bounds)
+        if xs and layer.get('connectionMethod') == 'along perimeter':
+            path = perimeter_path((xs[-1][-1], ys[-1][-1]), (x[0], y[0]), bounds)
+            xs.append(np.array([p[0] for p in path]))
+            ys.append(np.array([p[1] for p in path]))
+        xs.append(x)
+        ys.append(y)
+        drawn.append(f"{kind} '{layer.get('name', layer_id)}'")
+    if stats is not None:
+        stats['drawn'] = drawn
+        stats['skipped'] = skipped
+    if not xs:
+        return np.zeros(0), np.zeros(0)
+    return np.concatenate(xs), np.concatenate(ys)
+
+def sdf_commands(file_path):
+    """Lazily yield G-code for a Sandify project; unsupported layers are noted in comments."""
+    stats = {}
+    x, y = render(load_sdf(file_path), stats)
+    yield from HEADER
+    for name in stats['skipped']:
+        yield f"; Skipped unsupported {name}"
+    # Drop repeated points, which are moves without steps
+    keep = np.ones(len(x), dtype=bool)
+    keep[1:] = (np.round(np.diff(x), 3) != 0) | (np.round(np.diff(y), 3) != 0)
+    for px, py in zip(x[keep], y[keep]):
+        yield f"G1 X{px:.3f} Y{py:.3f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a Sandify (.sdf) project to G-code without the web app")
+    parser.add_argument('-o', '--output', type=str, help="Write the G-code here instead of stdout")
+    parser.add_argument('sdf_file', help="Sandify project file")
+    args = parser.parse_args()
+
+    try:
+        project = load_sdf(args.sdf_file)
+    except (FileNotFoundError, ValueError) as e:
+        print(f"{args.sdf_file}: {e}")
+        sys.exit(1)
+    start_time = time.perf_counter()
+    stats = {}
+    x, _ = render(project, stats)
+    elapsed = time.perf_counter() - start_time
+    if args.output:
+        with open(args.output, 'w') as f:
+            for line in sdf_commands(args.sdf_file):
+                f.write(line + '\n')
+    else:
+        for line in sdf_commands(args.sdf_file):
+            print(line)
+
+    report = sys.stderr if not args.output else sys.stdout
+    print(f"{args.sdf_file}: {len(x)} points from {', '.join(stats['drawn']) or 'no layers'} "
+          f"in {elapsed * 1000:.1f} ms", file=report)
+    for name in stats['skipped']:
+        print(f"  Skipped unsupported {name}", file=report)
+
+if __name__ == "__main__":
+    main()
@@ -3,20 +3,32 @@ import time
 import sys
 import os
 import argparse
+import signal
+from collections import deque
+from itertools import islice
+
+from gcode_reader import count_gcode_lines, iter_gcode_file, read_gcode_file, read_playlist
+from arcfit import fit_arcs
+from checkpoint import Checkpoint, load_checkpoint, restore_commands, with_motion
+from compact import compact_commands
+from estimate import command_schedule, format_duration, load_settings, read_settings
+from gcode_parser import parse_commands, parse_gcode
+from grbl_status import DEFAULT_RATE, StatusPoller
+from latency import LatencyRecorder
+from run_log import NORMAL, QUIET, VERBOSE, RunLog
+from pattern_cache import compile_pattern
+from pattern_index import INDEX_PATH, indexed_endpoints, lookup, open_index
+from simplify import simplify_commands
+from smart_wipe import plan_wipe
+from transitions import endpoints, plan_transition, transition_commands
+from wipes import BALL_DIAMETER, STRATEGIES, best_strategy, wipe_end
+from wipes import wipe as table_wipe
 
 # GRBL settings
 SERIAL_PORT = '/dev/ttyACM0'  # Adjust if needed (e.g., '/dev/ttyUSB0')
 BAUD_RATE = 115200
 TIMEOUT = 120  # Increased timeout for stability
-
-def read_gcode_file(file_path):
-    """Read G-code from file and return list of commands."""
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"G-code file '{file_path}' not found")
-    with open(file_path, 'r') as f:
-        # Strip whitespace, comments, and empty lines
-        commands = [line.strip() for line in f if line.strip() and not line.startswith((';', '('))]
-    return commands
+RX_BUFFER_SIZE = 128  # GRBL serial receive buffer size in bytes (streaming mode)
 
 def wait_for_grbl(ser, timeout=50):
     """Wait for GRBL to respond with startup message."""
@@ -53,109 +65,502 @@ def initialize_grbl(ser, timeout=5):
     print("No GRBL startup message received")
     return False
 
-def send_gcode(commands, ser):
-    """Send G-code commands to GRBL."""
-    for i, cmd in enumerate(commands, 1):
+def read_response(ser):
+    """Wait for the next non-empty line from GRBL, or '' on timeout."""
+    start_time = time.time()
+    response = ''
+    while time.time() - start_time < TIMEOUT:
+        response = ser.readline().decode().strip()
+        if response:
+            break
+        time.sleep(0.1)  # Avoid tight loop
+    return response
+
+def send_gcode(commands, ser, total=None, schedule=None, log=None, latency=None, checkpoint=None, start=1):
+    """Send G-code commands to GRBL.
+
+    commands may be any iterable; pass total when it has no len(), or
+    leave it out to show progress without a total. schedule
+    is an estimate.command_schedule() used to show the time left, log a
+    run_log.RunLog for progress and the command trace, latency a
+    latency.LatencyRecorder for write-to-ack times and checkpoint a
+    checkpoint.Checkpoint told about every 'ok'. Lines are numbered from
+    start, so a resumed file keeps its line numbers.
+    """
+    if total is None and hasattr(commands, '__len__'):
+        total = len(commands)
+    log = log or RunLog()
+    log.begin(total, schedule, start - 1)
+    for i, cmd in enumerate(commands, start):
         cmd = cmd.strip()
         if not cmd:
             continue
 
-        print(f"[{i}/{len(commands)}] Sending: {cmd}")
+        log.sent(i, cmd)
+        sent = time.monotonic()
         ser.write((cmd + '\n').encode())
 
         # Wait for response with extended timeout for long moves
-        start_time = time.time()
-        response = ''
-        while time.time() - start_time < TIMEOUT:
-            response = ser.readline().decode().strip()
-            if response:
-                break
-            time.sleep(0.1)  # Avoid tight loop
-        print(f"-> Response: {response}")
+        response = read_response(ser)
+        if latency is not None:
+            latency.record(i, cmd, sent, time.monotonic())
+        log.reply(i, response)
 
         if response == 'ok':
-            pass
+            if checkpoint is not None:
+                checkpoint.ack(i, cmd)
         elif 'error' in response.lower():
-            print(f"GRBL error: {response}")
+            log.error(f"GRBL error: {response} on line {i}: {cmd}", line=i, command=cmd, response=response)
+            log.finish(False)
             return False
         elif response == '':
-            print("No response from GRBL, possible timeout")
+            log.error("No response from GRBL, possible timeout", line=i, command=cmd)
+            log.finish(False)
             return False
         else:
-            print(f"Unexpected response: {response}")
+            log.warning(f"Unexpected response: {response}", line=i, response=response)
+    log.finish()
     return True
 
-def send_files(preamble_file, gcode_files):
-    """Send preamble and G-code files to GRBL."""
+def stream_gcode(commands, ser, total=None, schedule=None, log=None, latency=None, checkpoint=None, start=1):
+    """Stream G-code to GRBL using the character-counting protocol.
+
+    Lines are sent as long as they fit in GRBL's RX buffer, so the planner
+    never runs dry waiting for the next round trip. Every ok/error is matched
+    to the oldest unacknowledged line, in the order GRBL processes them.
+    """
+    if total is None and hasattr(commands, '__len__'):
+        total = len(commands)
+    log = log or RunLog()
+    log.begin(total, schedule, start - 1)
+    in_flight = deque()  # (index, command, bytes, sent time) awaiting ok/error
+    buffered = 0
+    failed = False
+
+    def wait_for_ack():
+        """Consume one ok/error reply; returns False on timeout."""
+        nonlocal buffered, failed
+        while True:
+            response = read_response(ser)
+            if response == '':
+                log.error("No response from GRBL, possible timeout", line=in_flight[0][0])
+                return False
+            if response == 'ok' or response.lower().startswith('error'):
+                break
+            # Status reports, [MSG:...] and alarms don't acknowledge a line
+            log.warning(f"Unexpected response: {response}", response=response)
+        i, cmd, size, sent = in_flight.popleft()
+        buffered -= size
+        if latency is not None:
+            latency.record(i, cmd, sent, time.monotonic())
+        log.reply(i, response)
+        if response == 'ok':
+            if checkpoint is not None:
+                checkpoint.ack(i, cmd)
+        else:
+            log.error(f"GRBL error: {response} on line {i}: {cmd}", line=i, command=cmd, response=response)
+            failed = True
+        return True
+
+    for i, cmd in enumerate(commands, start):
+        cmd = cmd.strip()
+        if not cmd:
+            continue
+
+        data = (cmd + '\n').encode()
+        if len(data) > RX_BUFFER_SIZE:
+            log.error(f"Line {i} is longer than GRBL's RX buffer: {cmd}", line=i, command=cmd)
+            failed = True
+            break
+
+        # Block until GRBL has room for this line
+        while buffered + len(data) > RX_BUFFER_SIZE:
+            if not wait_for_ack():
+                log.finish(False)
+                return False
+        if failed:
+            break
+
+        log.sent(i, cmd)
+        in_flight.append((i, cmd, len(data), time.monotonic()))
+        ser.write(data)
+        buffered += len(data)
+
+    # Drain replies for everything still in GRBL's buffer
+    while in_flight:
+        if not wait_for_ack():
+            log.finish(False)
+            return False
+    log.finish(not failed)
+    return not failed
+
+def connect_grbl(port=SERIAL_PORT):
+    """Open the serial port, soft-reset GRBL and wait until it is ready."""
+    ser = serial.Serial(port, BAUD_RATE, timeout=TIMEOUT)
+    time.sleep(2)  # Wait for serial connection
+    print(f"Connected to GRBL on {port}")
+
+    # Initialize GRBL
+    if not initialize_grbl(ser):
+        ser.close()
+        raise RuntimeError("Failed to initialize GRBL")
+
+    # Wake up GRBL
+    ser.write(b'\r\n\r\n')
+    time.sleep(0.2)
+    ser.flushInput()
+
+    # Query GRBL status
+    ser.write(b'?')
+    time.sleep(0.1)
+    status = ser.readline().decode().strip()
+    print(f"GRBL status: {status}")
+    return ser
+
+def preprocess_commands(gcode_file, simplify=None, arcs=None, compact=False, steps_per_mm=None):
+    """Read a file and return its commands as a list, applying any preprocessing.
+
+    Arcs are fitted first so the line simplifier only sees what is left of
+    the chords, and compaction runs last on the final command stream.
+    """
+    if not (simplify or arcs or compact):
+        commands = read_gcode_file(gcode_file)
+        print(f"Loaded {len(commands)} G-code commands from {gcode_file}")
+        return commands
+
+    commands = iter_gcode_file(gcode_file)
+    if arcs:
+        arc_stats = {}
+        commands = fit_arcs(commands, arcs, arc_stats)
+    if simplify:
+        simplify_stats = {}
+        commands = simplify_commands(commands, simplify, simplify_stats)
+    if compact:
+        compact_stats = {}
+        commands = compact_commands(commands, steps_per_mm, compact_stats)
+    commands = list(commands)
+
+    loaded = arc_stats['input'] if arcs else simplify_stats['input'] if simplify else compact_stats['input_lines']
+    print(f"Loaded {loaded} G-code commands from {gcode_file}, preprocessed to {len(commands)} "
+          f"({loaded / max(len(commands), 1):.2f}x)")
+    if arcs:
+        print(f"  Arc fitting: {arc_stats['arcs']} arcs at {arcs} mm, "
+              f"max deviation {arc_stats['max_deviation']:.3f} mm")
+    if simplify:
+        print(f"  Simplification: {simplify_stats['removed']} lines removed at {simplify} mm")
+    if compact:
+        saved = compact_stats['input_bytes'] - compact_stats['output_bytes']
+        print(f"  Compaction: {compact_stats['input_bytes']} -> {compact_stats['output_bytes']} bytes ({saved} saved)")
+    return commands
+
+def load_commands(gcode_file, cache=False, **preprocess):
+    """Return (commands, total) for a file, applying any preprocessing.
+
+    With cache, the processed commands come from the compiled-pattern cache
+    (see pattern_cache.py) and are only rebuilt when the file or the options
+    change. Without cache or preprocessing the file is streamed lazily from
+    disk; otherwise the processed commands are collected so the progress
+    total is exact.
+    """
+    if cache:
+        options = {key: value for key, value in preprocess.items() if value}
+        entry, hit = compile_pattern(gcode_file, lambda: preprocess_commands(gcode_file, **preprocess), options)
+        if hit:
+            print(f"Loaded {entry.total} G-code commands from cache for {gcode_file}")
+        return entry.commands(), entry.total
+
+    if not any(preprocess.values()):
+        total = count_gcode_lines(gcode_file)
+        print(f"Loaded {total} G-code commands from {gcode_file}")
+        return iter_gcode_file(gcode_file), total
+
+    commands = preprocess_commands(gcode_file, **preprocess)
+    return commands, len(commands)
+
+def estimate_schedule(commands, settings):
+    """Plan commands with the GRBL motion model; None if they can't be parsed."""
     try:
-        ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=TIMEOUT)
-        time.sleep(2)  # Wait for serial connection
-        print(f"Connected to GRBL on {SERIAL_PORT}")
+        schedule = command_schedule(parse_commands(commands), len(commands), settings)
+    except ValueError as e:
+        print(f"No time estimate: {e}")
+        return None
+    print(f"Estimated time: {format_duration(schedule[-1])}")
+    return schedule
+
+def send_file(ser, gcode_file, preamble_commands=None, stream=False, settings=None, log=None, latency_file=None,
+              resume=False, wipe=None, transition=None, **preprocess):
+    """Send one G-code file, preceded by the preamble if given.
+
+    With GRBL settings (see estimate.py) the run time is estimated up front
+    and progress shows the time left. Every command's latency is recorded
+    and summarized at the end; with latency_file the samples are also
+    written there, with the pattern's name added (lat.csv -> lat-zen.csv).
+    Progress is checkpointed as lines are acknowledged; with resume, a file
+    that was interrupted continues from its checkpoint (without the
+    preamble) and one that completed is skipped. wipe and transition are
+    commands sent after the preamble to clear the table (see wipes.py) and
+    to bring the ball to the file's first point (see transitions.py). Other keyword arguments are preprocessing
+    options passed to load_commands().
+    """
+    sender = stream_gcode if stream else send_gcode
+    log = log or RunLog()
+    record = load_checkpoint(gcode_file, preprocess) if resume else None
+    if record is not None and record['done']:
+        log.event('skip', f"\nSkipping {gcode_file}: completed in the interrupted run", file=gcode_file)
+        return True
 
-        # Initialize GRBL
-        if not initialize_grbl(ser):
-            raise RuntimeError("Failed to initialize GRBL")
+    # Send preamble if provided
+    if preamble_commands and record is None:
+        log.event('preamble', "\nSending preamble", file=gcode_file)
+        if not sender(preamble_commands, ser, log=log):
+            log.event('failed', f"Failed to send preamble for {gcode_file}", level=QUIET, file=gcode_file)
+            return False
+
+    if wipe and record is None:
+        log.event('wipe', "\nWiping the table", file=gcode_file)
+        if not sender(wipe, ser, log=log):
+            log.event('failed', f"Failed to wipe before {gcode_file}", level=QUIET, file=gcode_file)
+            return False
+
+    if transition and record is None:
+        log.event('transition', "\nMoving to the start along the table edge", file=gcode_file)
+        if not sender(transition, ser, log=log):
+            log.event('failed', f"Failed to move to the start of {gcode_file}", level=QUIET, file=gcode_file)
+            return False
 
-        # Wake up GRBL
-        ser.write(b'\r\n\r\n')
-        time.sleep(0.2)
-        ser.flushInput()
+    # Send G-code file
+    log.event('file', f"\nSending G-code file: {gcode_file}", file=gcode_file)
+    commands, total = load_commands(gcode_file, **preprocess)
+    schedule = None
+    if settings is not None:
+        commands = list(commands)
+        schedule = estimate_schedule(commands, settings)
 
-        # Query GRBL status
-        ser.write(b'?')
-        time.sleep(0.1)
-        status = ser.readline().decode().strip()
-        print(f"GRBL status: {status}")
+    start = 1
+    checkpoint = Checkpoint(gcode_file, preprocess, total)
+    if record is not None:
+        start = record['line'] + 1
+        log.event('resume', f"Resuming at line {start} of {total} (last acknowledged {record['acked']})",
+                  file=gcode_file, line=start)
+        restore, active = restore_commands(record)
+        if not sender(restore, ser, log=log):
+            log.event('failed', f"Failed to restore state for {gcode_file}", level=QUIET, file=gcode_file)
+            return False
+        commands = with_motion(islice(commands, record['line'], None), record['state']['motion'], active)
+        checkpoint = Checkpoint(gcode_file, preprocess, total, record['line'], record['state'])
+
+    latency = LatencyRecorder()
+    ok = False
+    try:
+        ok = sender(commands, ser, total=total, schedule=schedule, log=log, latency=latency,
+                    checkpoint=checkpoint, start=start)
+    finally:
+        # Also on Ctrl-C, so --resume picks up from here
+        checkpoint.save(done=ok)
+    summary = latency.summary()
+    if summary:
+        log.event('latency', latency.report(), file=gcode_file, **summary)
+    if latency_file and len(latency):
+        root, ext = os.path.splitext(latency_file)
+        name = os.path.splitext(os.path.basename(gcode_file))[0]
+        path = latency.export(f"{root}-{name}{ext}")
+        log.event('latency_file', f"Latency samples written to {path}", path=path)
+    if not ok:
+        log.event('failed', f"Failed to send {gcode_file}", level=QUIET, file=gcode_file)
+        return False
+    return True
+
+def file_endpoints(gcode_file, index=None):
+    """transitions.endpoints() of a file, from the pattern index without parsing it when the index is up to date."""
+    known = indexed_endpoints(index, gcode_file) if index is not None else None
+    return known if known is not None else endpoints(gcode_file)
+
+def resolve_wipe(wipe, ball_diameter=BALL_DIAMETER, settings=None):
+    """The full-wipe strategy for wipe: itself if it names one, else the fastest (for 'auto' and 'smart')."""
+    if not wipe:
+        return None
+    return wipe if wipe in STRATEGIES else best_strategy(ball_diameter=ball_diameter, settings=settings)
+
+def plan_wipe_and_transition(previous, gcode_file, wipe=None, transitions=False, ball_diameter=BALL_DIAMETER,
+                             settings=None, index=None, full_strategy=None):
+    """(wipe, transition) commands to send before gcode_file; either may be None.
+
+    previous is the file the ball last finished, or None if where the ball
+    is isn't known. wipe is a strategy from wipes.py, 'smart' to wipe only
+    where previous drew (see smart_wipe.py; a full wipe when there is no
+    previous file or when it is no faster) or None. full_strategy is
+    resolve_wipe(wipe), worked out here if not given; pass it in when
+    planning several files. Full wipes are generated lazily. With
+    transitions, the ball then moves along the table edge from where the
+    wipe or the previous file left it to the file's first point. End and
+    start points come from the pattern index (see pattern_index.py) when
+    it is up to date; files are only parsed when it isn't.
+    """
+    commands = end = None
+    if wipe and full_strategy is None:
+        full_strategy = resolve_wipe(wipe, ball_diameter, settings)
+    if wipe == 'smart' and previous:
+        stats = {}
+        commands = plan_wipe(parse_gcode(previous), ball_diameter, settings=settings, stats=stats,
+                             full_strategy=full_strategy)
+        end = stats['end']
+    elif wipe:
+        commands = table_wipe(full_strategy, ball_diameter=ball_diameter)
+        end = wipe_end(full_strategy, ball_diameter=ball_diameter)
+
+    transition = None
+    if transitions and end is not None:
+        start, _, _ = file_endpoints(gcode_file, index)
+        transition = transition_commands(end, start) if start is not None else None
+    elif transitions and previous and index is not None:
+        _, end, feed = file_endpoints(previous, index)
+        start, _, _ = file_endpoints(gcode_file, index)
+        transition = transition_commands(end, start, feed) if end is not None and start is not None else None
+    elif transitions and previous:
+        transition = plan_transition(previous, gcode_file)
+    return commands, transition
+
+def send_files(preamble_file, gcode_files, port=SERIAL_PORT, stream=False, eta=False, settings_file=None,
+               log=None, status_rate=DEFAULT_RATE, resume=False, transitions=False, wipe=None,
+               ball_diameter=BALL_DIAMETER, **preprocess):
+    """Send preamble and G-code files to GRBL.
+
+    With eta, run times are estimated from settings_file, or from the
+    controller's own '$$' settings if no file is given. With status_rate,
+    GRBL is polled with '?' that many times a second and progress shows
+    the live position. With resume, each file picks up from its checkpoint
+    (see send_file()). With transitions, each file after the first is
+    reached from where the previous one ended along the table edge instead
+    of by its own lead-in move. With wipe, the table is wiped before each
+    file (see plan_wipe_and_transition()).
+    """
+    log = log or RunLog()
+    try:
+        ser = connect_grbl(port)
+        link = ser
+        if status_rate:
+            link = StatusPoller(ser, status_rate).start()
+            log.status = link
+        settings = None
+        if eta:
+            settings = load_settings(settings_file) if settings_file else read_settings(link)
 
         # Load preamble commands if provided
         preamble_commands = read_gcode_file(preamble_file) if preamble_file else []
 
+        # The pattern index knows run times without parsing anything
+        index = open_index() if os.path.exists(INDEX_PATH) else None
+        if index is not None:
+            indexed = [lookup(index, gcode_file) for gcode_file in gcode_files]
+            if all(indexed):
+                seconds = sum(meta['seconds'] for meta in indexed)
+                log.event('playlist', f"{len(indexed)} files, estimated {format_duration(seconds)} in total",
+                          files=len(indexed), seconds=seconds)
+
+        full_strategy = resolve_wipe(wipe, ball_diameter, settings)  # Once, not per file
+        previous = None
         for gcode_file in gcode_files:  # Corrected line
             try:
-                # Send preamble if provided
-                if preamble_commands:
-                    print(f"\nSending preamble: {preamble_file}")
-                    if not send_gcode(preamble_commands, ser):
-                        print(f"Failed to send preamble for {gcode_file}")
-                        continue
-
-                # Send G-code file
-                print(f"\nSending G-code file: {gcode_file}")
-                commands = read_gcode_file(gcode_file)
-                print(f"Loaded {len(commands)} G-code commands from {gcode_file}")
-                if not send_gcode(commands, ser):
-                    print(f"Failed to send {gcode_file}")
-                    continue
+                wipe_commands, transition = plan_wipe_and_transition(previous, gcode_file, wipe, transitions,
+                                                                     ball_diameter, settings, index, full_strategy)
+                previous = None  # Where the ball is after a failed file is anyone's guess
+                if send_file(link, gcode_file, preamble_commands, stream=stream, settings=settings, log=log,
+                             resume=resume, wipe=wipe_commands, transition=transition, **preprocess):
+                    previous = gcode_file
             except FileNotFoundError as e:
                 print(e)
                 continue
 
-        print("All G-code transmissions complete")
-        ser.close()
+        log.event('complete', "All G-code transmissions complete")
+        if index is not None:
+            index.close()
+        link.close()
+    except KeyboardInterrupt:
+        log.error("Interrupted; continue with --resume")
     except serial.SerialException as e:
-        print(f"Serial error: {e}")
+        log.error(f"Serial error: {e}")
     except Exception as e:
-        print(f"Error: {e}")
+        log.error(f"Error: {e}")
     finally:
+        log.status = None
+        if 'link' in locals() and link is not ser:
+            link.stop()
         if 'ser' in locals() and ser.is_open:
             ser.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Send G-code files to GRBL with optional preamble")
     parser.add_argument('--preamble', type=str, help="Path to preamble G-code file")
-    parser.add_argument('gcode_files', nargs='+', help="Path(s) to G-code file(s)")
+    parser.add_argument('--port', type=str, default=SERIAL_PORT,
+                        help=f"Serial port of the GRBL controller (default {SERIAL_PORT})")
+    parser.add_argument('--stream', action='store_true',
+                        help="Stream with GRBL's character-counting protocol instead of waiting for each 'ok'")
+    parser.add_argument('--simplify', type=float, metavar='MM',
+                        help="Drop G1 points within MM of the simplified path (Ramer-Douglas-Peucker)")
+    parser.add_argument('--arcs', type=float, metavar='MM',
+                        help="Replace runs of G1 chords with G2/G3 arcs within MM of the original path")
+    parser.add_argument('--compact', action='store_true',
+                        help="Drop redundant words, comments and trailing zeros before sending")
+    parser.add_argument('--steps-per-mm', type=float,
+                        help="With --compact, quantize axes to the machine's step resolution ($100/$101)")
+    parser.add_argument('--cache', action='store_true',
+                        help="Reuse preprocessed patterns from the on-disk cache (see pattern_cache.py)")
+    parser.add_argument('--playlist', type=str,
+                        help="Playlist file with one G-code path per line, sent after any files given")
+    parser.add_argument('--transitions', action='store_true',
+                        help="Move from each pattern's end to the next one's start along the table edge")
+    parser.add_argument('--wipe', choices=['auto', 'smart'] + list(STRATEGIES),
+                        help="Wipe the table before each file: a strategy from wipes.py, 'auto' for the fastest, "
+                             "or 'smart' to wipe only where the previous file drew")
+    parser.add_argument('--ball', type=float, default=BALL_DIAMETER,
+                        help=f"With --wipe, ball diameter and wipe line spacing in mm (default {BALL_DIAMETER:g})")
+    parser.add_argument('--eta', action='store_true',
+                        help="Estimate each file's run time from GRBL's planner settings and show the time left")
+    parser.add_argument('--settings', type=str,
+                        help="With --eta, read GRBL settings from a saved '$$' dump instead of the controller")
+    parser.add_argument('--resume', action='store_true',
+                        help="Continue an interrupted run: skip finished files, resume the interrupted one")
+    parser.add_argument('--status-hz', type=float, default=DEFAULT_RATE,
+                        help="Poll GRBL's status this many times a second (default: don't poll)")
+    parser.add_argument('--latency-file', type=str,
+                        help="Write per-command latency samples to this .csv or .npy path (pattern name appended)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Print every command and reply")
+    parser.add_argument('-q', '--quiet', action='store_true', help="Only print errors")
+    parser.add_argument('--log-file', type=str, help="Append structured events to this file as JSON lines")
+    parser.add_argument('gcode_files', nargs='*', help="Path(s) to G-code file(s)")
     args = parser.parse_args()
 
-    if not args.gcode_files:
-        print("Error: At least one G-code file must be provided")
+    gcode_files = list(args.gcode_files)
+    if args.playlist:
+        try:
+            gcode_files += read_playlist(args.playlist)
+        except FileNotFoundError as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+    if not gcode_files:
+        print("Error: At least one G-code file or a playlist must be provided")
         sys.exit(1)
 
     # Verify preamble file exists if provided
     if args.preamble and not os.path.exists(args.preamble):
         print(f"Error: Preamble file '{args.preamble}' not found")
         sys.exit(1)
+    if args.settings and not os.path.exists(args.settings):
+        print(f"Error: Settings file '{args.settings}' not found")
+        sys.exit(1)
 
-    send_files(args.preamble, args.gcode_files)
+    level = QUIET if args.quiet else VERBOSE if args.verbose else NORMAL
+    log = RunLog(level, args.log_file)
+    # 'kill -USR1 <pid>' writes the recent command trace without stopping
+    signal.signal(signal.SIGUSR1, lambda signum, frame: log.dump())
+    try:
+        send_files(args.preamble, gcode_files, port=args.port, stream=args.stream, eta=args.eta,
+                   settings_file=args.settings, log=log, status_rate=args.status_hz, resume=args.resume,
+                   transitions=args.transitions, wipe=args.wipe, ball_diameter=args.ball,
+                   latency_file=args.latency_file, cache=args.cache, simplify=args.simplify, arcs=args.arcs,
+                   compact=args.compact, steps_per_mm=args.steps_per_mm)
+    finally:
+        log.close()
 
 if __name__ == "__main__":
     main()
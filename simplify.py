@@ -0,0 +1,211 @@
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+
+from gcode_reader import iter_gcode_file, parse_words
+
+DEFAULT_TOLERANCE = 0.5  # mm; well under the width of the ball's track
+
+# Words that can appear on a plain drawing move: G1/G01 plus the two axes
+PATH_WORDS = {'G', 'X', 'Y'}
+# G codes that leave the position and coordinate system alone
+MODAL_G = {0, 1, 2, 3, 17, 20, 21, 90, 91}
+
+def iter_paths(commands):
+    """Group commands into runs of plain absolute G1 moves.
+
+    Yields ('cmd', command) for anything that must pass through untouched, and
+    ('path', anchor, moves) for each run of consecutive 'G1 X.. Y..' lines.
+    anchor is the (x, y) the run starts from (None if the position is not
+    known), and moves is a list of (command, x, y) with modal axes resolved.
+    """
+    motion = None
+    absolute = True
+    x = y = None
+    moves = []
+    anchor = None
+
+    for cmd in commands:
+        words = parse_words(cmd)
+        letters = {letter for letter, _ in words}
+        gcodes = [value for letter, value in words if letter == 'G']
+        move_g = [g for g in gcodes if g in (0, 1, 2, 3)]
+        is_path = (letters <= PATH_WORDS and bool(letters & {'X', 'Y'}) and absolute
+                   and all(g == 1 for g in gcodes) and (gcodes or motion == 1))
+
+        if is_path:
+            if not moves:
+                anchor = (x, y) if x is not None and y is not None else None
+            for letter, value in words:
+                if letter == 'X':
+                    x = value
+                elif letter == 'Y':
+                    y = value
+            motion = 1
+            if x is None or y is None:
+                # Can't place a point with an unknown axis; emit as-is
+                yield ('cmd', cmd)
+                continue
+            moves.append((cmd, x, y))
+            continue
+
+        if moves:
+            yield ('path', anchor, moves)
+            moves = []
+        yield ('cmd', cmd)
+
+        # Track modal state so the next run knows where it starts
+        if move_g:
+            motion = move_g[-1]
+        if 90 in gcodes:
+            absolute = True
+        if 91 in gcodes:
+            absolute = False
+        if any(g not in MODAL_G for g in gcodes) or not absolute:
+            x = y = None  # G28, G92 and relative moves lose track of position
+            continue
+        for letter, value in words:
+            if letter == 'X':
+                x = value
+            elif letter == 'Y':
+                y = value
+
+    if moves:
+        yield ('path', anchor, moves)
+
+def segment_distances(p, a, b):
+    """Distance from each point p to the segment a-b (all (n, 2) arrays)."""
+    ab = b - a
+    ap = p - a
+    length_sq = np.einsum('ij,ij->i', ab, ab)
+    t = np.einsum('ij,ij->i', ap, ab) / np.where(length_sq > 0, length_sq, 1.0)
+    t = np.clip(t, 0.0, 1.0)
+    return np.hypot(*(ap - t[:, None] * ab).T)
+
+def rdp_mask(points, tolerance):
+    """Ramer-Douglas-Peucker: boolean mask of the points to keep.
+
+    Every span that still needs splitting is processed in the same NumPy pass,
+    so the Python-level loop runs once per recursion depth, not once per span.
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    starts = np.array([0])
+    ends = np.array([n - 1])
+
+    while len(starts):
+        inner = ends - starts > 1
+        starts, ends = starts[inner], ends[inner]
+        if not len(starts):
+            break
+
+        # Interior point indices of every span, concatenated
+        lengths = ends - starts - 1
+        offsets = np.cumsum(lengths) - lengths
+        span = np.repeat(np.arange(len(starts)), lengths)
+        idx = starts[span] + 1 + np.arange(lengths.sum()) - offsets[span]
+        dist = segment_distances(points[idx], points[starts[span]], points[ends[span]])
+
+        # Farthest point per span (first one on ties)
+        dmax = np.maximum.reduceat(dist, offsets)
+        at_max = np.flatnonzero(dist == dmax[span])
+        first = at_max[np.unique(span[at_max], return_index=True)[1]]
+        split = dmax > tolerance
+        mid = idx[first][split]
+        keep[mid] = True
+        starts = np.concatenate([starts[split], mid])
+        ends = np.concatenate([mid, ends[split]])
+    return keep
+
+def simplify_commands(commands, tolerance=DEFAULT_TOLERANCE, stats=None):
+    """Yield commands with each run of G1 moves simplified to tolerance (mm).
+
+    Kept lines are passed through verbatim, except that the first one in a
+    run gets the run's G1 if the line that carried it was dropped. If stats is a dict, its 'input'
+    and 'removed' counts are updated as the commands are consumed.
+    """
+    if stats is None:
+        stats = {}
+    stats.setdefault('input', 0)
+    stats.setdefault('removed', 0)
+
+    for item in iter_paths(commands):
+        if item[0] == 'cmd':
+            stats['input'] += 1
+            yield item[1]
+            continue
+
+        _, anchor, moves = item
+        stats['input'] += len(moves)
+        points = np.array([(x, y) for _, x, y in moves])
+        if anchor is not None:
+            # The run starts where the previous command left off; that point
+            # is fixed but is not re-emitted
+            keep = rdp_mask(np.vstack([anchor, points]), tolerance)[1:]
+        else:
+            keep = rdp_mask(points, tolerance)
+        stats['removed'] += len(moves) - int(keep.sum())
+        first = True
+        for i, ((cmd, _, _), kept) in enumerate(zip(moves, keep)):
+            if not kept:
+                continue
+            if first and i > 0 and not any(letter == 'G' for letter, _ in parse_words(cmd)):
+                # The run's G1 was on a line that was dropped; later lines
+                # relied on it being modal
+                cmd = 'G1 ' + cmd
+            first = False
+            yield cmd
+
+def simplify_file(gcode_file, tolerance=DEFAULT_TOLERANCE, output_file=None):
+    """Simplify one file; returns (input_lines, removed_lines)."""
+    stats = {}
+    commands = simplify_commands(iter_gcode_file(gcode_file), tolerance, stats)
+    if output_file:
+        with open(output_file, 'w') as f:
+            for cmd in commands:
+                f.write(cmd + '\n')
+    else:
+        for _ in commands:
+            pass
+    return stats['input'], stats['removed']
+
+def main():
+    parser = argparse.ArgumentParser(description="Simplify G-code polylines with Ramer-Douglas-Peucker")
+    parser.add_argument('-t', '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Maximum deviation in mm (default {DEFAULT_TOLERANCE})")
+    parser.add_argument('-o', '--output-dir', type=str, help="Write simplified files to this directory")
+    parser.add_argument('gcode_files', nargs='*', help="G-code file(s) (default: patterns/*.gcode)")
+    args = parser.parse_args()
+
+    gcode_files = args.gcode_files or sorted(glob.glob(os.path.join('patterns', '*.gcode')))
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    total_in = total_removed = 0
+    start_time = time.perf_counter()
+    for gcode_file in gcode_files:
+        output_file = os.path.join(args.output_dir, os.path.basename(gcode_file)) if args.output_dir else None
+        try:
+            lines, removed = simplify_file(gcode_file, args.tolerance, output_file)
+        except FileNotFoundError as e:
+            print(e)
+            continue
+        total_in += lines
+        total_removed += removed
+        percent = 100.0 * removed / lines if lines else 0.0
+        print(f"{gcode_file}: {lines} -> {lines - removed} lines ({removed} removed, {percent:.1f}%)")
+
+    if not total_in:
+        sys.exit(1)
+    print(f"Total: removed {total_removed} of {total_in} lines "
+          f"({100.0 * total_removed / total_in:.1f}%) in {time.perf_counter() - start_time:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from estimate import DEFAULT_SETTINGS, format_duration, load_settings, plan_moves
+from gcode_parser import parse_gcode, segment_lengths
+from transitions import TABLE_HEIGHT, TABLE_WIDTH
+from wipes import BALL_DIAMETER, FEED_RATE, best_strategy, wipe, wipe_end, wipe_gcode, wipe_time
+
+MARGIN = 10.0  # mm of untouched sand wiped around every disturbed cell
+CELL_SIZE = 5.0  # mm per coverage grid cell
+FULL_WIPE = os.path.join('patterns', 'wiper.gcode')
+
+def sample_path(moves, step, start=None):
+    """Points every step mm or closer along all moves, arcs followed along the arc."""
+    lengths = segment_lengths(moves, start)
+    x, y = np.nan_to_num(moves['x']), np.nan_to_num(moves['y'])
+    px, py = np.empty_like(x), np.empty_like(y)
+    px[1:], py[1:] = x[:-1], y[:-1]
+    px[:1], py[:1] = (start if start is not None else (x[:1], y[:1]))
+
+    counts = np.ceil(lengths / step).astype(np.int64) + 1
+    seg = np.repeat(np.arange(len(moves)), counts)
+    first = np.cumsum(counts) - counts
+    t = (np.arange(len(seg)) - first[seg]) / np.maximum(counts[seg] - 1, 1)
+    sx = px[seg] + t * (x[seg] - px[seg])
+    sy = py[seg] + t * (y[seg] - py[seg])
+
+    arcs = np.isin(moves['motion'][seg], (2, 3))
+    if arcs.any():
+        s = seg[arcs]
+        cx, cy = px[s] + moves['i'][s], py[s] + moves['j'][s]
+        radius = np.hypot(moves['i'][s], moves['j'][s])
+        begin = np.arctan2(py[s] - cy, px[s] - cx)
+        sweep = np.arctan2(y[s] - cy, x[s] - cx) - begin
+        # Same sweep rules as gcode_parser.segment_lengths()
+        ccw = moves['motion'][s] == 3
+        sweep = np.where(ccw, np.mod(sweep, 2 * np.pi), -np.mod(-sweep, 2 * np.pi))
+        sweep[sweep == 0] = np.where(ccw, 2 * np.pi, -2 * np.pi)[sweep == 0]
+        angle = begin + t[arcs] * sweep
+        sx[arcs] = cx + radius * np.cos(angle)
+        sy[arcs] = cy + radius * np.sin(angle)
+    return sx, sy
+
+def dilate(grid, radius):
+    """Grow the True cells of a 2D grid by a disk of radius cells."""
+    r = int(np.ceil(radius))
+    if r <= 0:
+        return grid
+    padded = np.pad(grid, r)
+    out = np.zeros_like(grid)
+    rows, cols = grid.shape
+    for dy in range(-r, r + 1):
+        for dx in range(-r, r + 1):
+            if dx * dx + dy * dy <= radius * radius:
+                out |= padded[r + dy:r + dy + rows, r + dx:r + dx + cols]
+    return out
+
+def coverage_grid(moves, ball_diameter=BALL_DIAMETER, margin=MARGIN, width=TABLE_WIDTH, height=TABLE_HEIGHT,
+                  cell=CELL_SIZE):
+    """Boolean grid, rows along y, of the cells the ball disturbed plus margin.
+
+    The path is sampled every half cell, each sample marks its cell, and
+    the marks are grown by the ball's radius plus the margin.
+    """
+    rows, cols = int(np.ceil(height / cell)), int(np.ceil(width / cell))
+    grid = np.zeros((rows, cols), dtype=bool)
+    if not len(moves):
+        return grid
+    x, y = sample_path(moves, cell / 2)
+    ix = np.clip((x / cell).astype(np.int64), 0, cols - 1)
+    iy = np.clip((y / cell).astype(np.int64), 0, rows - 1)
+    grid[iy, ix] = True
+    return dilate(grid, (ball_diameter / 2 + margin) / cell)
+
+def _runs(grid, spacing, cell, length, across):
+    """(across, lo, hi) of every run of disturbed cells in each band of rows one spacing wide."""
+    rows = grid.shape[0]
+    band_rows = max(int(round(spacing / cell)), 1)
+    runs = []
+    for top in range(0, rows, band_rows):
+        used = grid[top:top + band_rows].any(axis=0).astype(np.int8)
+        edges = np.flatnonzero(np.diff(np.concatenate([[0], used, [0]])))
+        at = min((top + band_rows / 2) * cell, across)
+        for first, stop in zip(edges[0::2], edges[1::2]):
+            runs.append((at, first * cell, min(stop * cell, length)))
+    return runs
+
+# Neighbouring cells, straight ones first so routes prefer them
+NEIGHBOURS = [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+
+def _on_grid(grid, cell, x, y):
+    """Whether each point (x along the columns, y along the rows) is in or on the edge of a True cell."""
+    rows, cols = grid.shape
+    inside = np.zeros(len(x), dtype=bool)
+    for dx in (-1e-6, 1e-6):
+        for dy in (-1e-6, 1e-6):
+            ix = np.clip(np.floor(x / cell + dx).astype(np.int64), 0, cols - 1)
+            iy = np.clip(np.floor(y / cell + dy).astype(np.int64), 0, rows - 1)
+            inside |= grid[iy, ix]
+    return inside
+
+def _stays_on_grid(grid, cell, a, b):
+    """Whether the straight line from a to b only crosses True cells."""
+    t = np.linspace(0.0, 1.0, int(np.ceil(math.dist(a, b) / (cell / 4))) + 1)
+    return bool(_on_grid(grid, cell, a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1])).all())
+
+def _nearest_cell(grid, cell, point):
+    """(row, column) of the True cell whose centre is nearest point."""
+    iy, ix = np.nonzero(grid)
+    k = int(np.argmin(np.hypot((ix + 0.5) * cell - point[0], (iy + 0.5) * cell - point[1])))
+    return int(iy[k]), int(ix[k])
+
+def _grid_route(grid, cell, a, b):
+    """Points after a up to b through True cells only, or None if they aren't connected.
+
+    A breadth-first search over the cells finds the way, then every corner
+    that can be seen past is dropped.
+    """
+    if a == b or _stays_on_grid(grid, cell, a, b):
+        return [b]
+    source, target = _nearest_cell(grid, cell, a), _nearest_cell(grid, cell, b)
+    steps = np.full(grid.shape, -1, dtype=np.int64)
+    steps[target] = 0
+    front = np.zeros_like(grid)
+    front[target] = True
+    step = 0
+    while steps[source] < 0 and front.any():
+        step += 1
+        front = dilate(front, 1.5) & grid & (steps < 0)
+        steps[front] = step
+    if steps[source] < 0:
+        return None
+
+    rows, cols = grid.shape
+    cells = [source]
+    while steps[cells[-1]] > 0:
+        r, c = cells[-1]
+        cells.append(next((r + dr, c + dc) for dr, dc in NEIGHBOURS
+                          if 0 <= r + dr < rows and 0 <= c + dc < cols and steps[r + dr, c + dc] == steps[r, c] - 1))
+    corners = [((c + 0.5) * cell, (r + 0.5) * cell) for r, c in cells] + [b]
+    route, here, i = [], a, 0
+    while i < len(corners):
+        while i + 1 < len(corners) and _stays_on_grid(grid, cell, here, corners[i + 1]):
+            i += 1
+        here = corners[i]
+        route.append(here)
+        i += 1
+    return route
+
+def _corridor(grid, cell, a, b, radius):
+    """grid with the cells along the line from a to b, grown by radius cells, set too."""
+    rows, cols = grid.shape
+    t = np.linspace(0.0, 1.0, int(np.ceil(math.dist(a, b) / (cell / 2))) + 1)
+    marks = np.zeros_like(grid)
+    marks[np.clip(((a[1] + t * (b[1] - a[1])) / cell).astype(np.int64), 0, rows - 1),
+          np.clip(((a[0] + t * (b[0] - a[0])) / cell).astype(np.int64), 0, cols - 1)] = True
+    return grid | dilate(marks, radius)
+
+def _visit_runs(grid, spacing, cell, length, across, start):
+    """Points, travel routes and run count of the runs of grid taken nearest first.
+
+    Returns (points, travel, runs, None), or (None, None, None, (a, b)) when
+    the way from a to b can't stay on disturbed cells.
+    """
+    runs = np.array(_runs(grid, spacing, cell, length, across), dtype=float).reshape(-1, 3)
+    if not len(runs):
+        return [], [], 0, None
+    at, lo, hi = runs[:, 0], runs[:, 1], runs[:, 2]
+    left = np.ones(len(runs), dtype=bool)
+    position = (float(lo[0]), float(at[0])) if start is None else tuple(start)
+    points, travel = [], []
+    for _ in range(len(runs)):
+        to_lo = np.where(left, np.hypot(lo - position[0], at - position[1]), np.inf)
+        to_hi = np.where(left, np.hypot(hi - position[0], at - position[1]), np.inf)
+        k = int(np.argmin(np.minimum(to_lo, to_hi)))
+        first, last = (lo[k], hi[k]) if to_lo[k] <= to_hi[k] else (hi[k], lo[k])
+        first, last = (float(first), float(at[k])), (float(last), float(at[k]))
+        route = _grid_route(grid, cell, position, first)
+        if route is None:
+            return None, None, None, (position, first)
+        if points or start is not None:
+            travel.append([position] + route)
+        points += route + [last]
+        position = last
+        left[k] = False
+    return points, travel, len(runs), None
+
+def _boustrophedon(grid, spacing, cell, length, across, start=None, margin=MARGIN, stats=None):
+    """Lines along the grid's columns axis over the disturbed cells, spacing apart across its rows.
+
+    Each band of rows one spacing wide gets a line over every run of
+    disturbed cells in it, not one from its first disturbed cell to its
+    last, so untouched sand between runs isn't wiped. The runs are taken
+    nearest first from start (or the first run), each from whichever end
+    is closer; on a full grid that is the usual back and forth. The moves
+    between runs go round through disturbed cells, so they don't draw on
+    clean sand; where the disturbed sand is in separate pieces, the
+    straight way between them is added to the grid, as wide as a track
+    plus margin, and wiped too. Returns (along, across) points; if stats
+    is a dict, it receives the number of 'lines', the 'travel' routes
+    between them and the 'grid' wiped.
+    """
+    radius = (spacing / 2 + margin) / cell
+    while True:
+        points, travel, lines, blocked = _visit_runs(grid, spacing, cell, length, across, start)
+        if blocked is None:
+            break
+        grid = _corridor(grid, cell, *blocked, radius)
+    if stats is not None:
+        stats['lines'] = lines
+        stats['travel'] = travel
+        stats['grid'] = grid
+    return points
+
+def wipe_points(grid, spacing=BALL_DIAMETER, width=TABLE_WIDTH, height=TABLE_HEIGHT, cell=CELL_SIZE,
+                orientation='x', start=None, margin=MARGIN, stats=None):
+    """(x, y) points of lines over the disturbed cells, starting near start.
+
+    orientation 'x' runs the lines along the table's width, 'y' along its
+    height. stats is as for _boustrophedon(), in (x, y) points and a grid
+    with rows along y.
+    """
+    if orientation == 'x':
+        return _boustrophedon(grid, spacing, cell, width, height, start, margin, stats)
+    start = None if start is None else (start[1], start[0])
+    points = [(x, y) for y, x in _boustrophedon(grid.T, spacing, cell, height, width, start, margin, stats)]
+    if stats is not None:
+        stats['travel'] = [[(x, y) for y, x in route] for route in stats['travel']]
+        stats['grid'] = stats['grid'].T
+    return points
+
+def plan_wipe(moves, ball_diameter=BALL_DIAMETER, margin=MARGIN, width=TABLE_WIDTH, height=TABLE_HEIGHT,
+              cell=CELL_SIZE, feed=FEED_RATE, settings=None, stats=None, full_strategy='auto'):
+    """Commands that wipe only where moves disturbed the sand.
+
+    Both line orientations are planned and the one with the shorter
+    estimated time is kept, starting from where moves end. If that is no
+    faster than the full wipe full_strategy (see wipes.py; 'auto' for the
+    fastest), the full wipe is returned instead. If stats is a dict, it
+    receives the coverage, the strategy used ('smart' or the full one),
+    both plans' times and the (x, y) where the wipe ends.
+    """
+    grid = coverage_grid(moves, ball_diameter, margin, width, height, cell)
+    start = None
+    if len(moves):
+        start = (float(np.nan_to_num(moves['x'][-1])), float(np.nan_to_num(moves['y'][-1])))
+    best = None
+    for orientation in ('x', 'y'):
+        planned = {}
+        points = wipe_points(grid, ball_diameter, width, height, cell, orientation, start, margin, planned)
+        commands = list(wipe_gcode(points, feed))
+        seconds = wipe_time(commands, settings, start)
+        if best is None or seconds < best[0]:
+            best = (seconds, orientation, commands, planned['lines'], points[-1] if points else start)
+
+    seconds, orientation, commands, lines, end = best
+    if full_strategy == 'auto':
+        full_strategy = best_strategy(width, height, ball_diameter, feed, settings)
+    full_commands = list(wipe(full_strategy, width, height, ball_diameter, feed))
+    full_seconds = wipe_time(full_commands, settings, start)
+    strategy = 'smart'
+    if full_seconds <= seconds:
+        strategy, orientation, commands, seconds = full_strategy, None, full_commands, full_seconds
+        lines, end = None, wipe_end(full_strategy, width, height, ball_diameter)
+    if stats is not None:
+        stats['cells'] = int(grid.size)
+        stats['disturbed'] = int(grid.sum())
+        stats['strategy'] = strategy
+        stats['orientation'] = orientation
+        stats['lines'] = lines
+        stats['seconds'] = seconds
+        stats['full_strategy'] = full_strategy
+        stats['full_seconds'] = full_seconds
+        stats['end'] = end
+    return commands
+
+def format_saving(seconds):
+    """'2:03 saved', '0:12 slower' or 'no time saved' for a difference in seconds."""
+    if round(seconds) > 0:
+        return f"{format_duration(seconds)} saved"
+    if round(seconds) < 0:
+        return f"{format_duration(-seconds)} slower"
+    return "no time saved"
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan a wipe that only covers where the last pattern drew")
+    parser.add_argument('--ball', type=float, default=BALL_DIAMETER,
+                        help=f"Ball diameter and wipe line spacing in mm (default {BALL_DIAMETER:g})")
+    parser.add_argument('--margin', type=float, default=MARGIN,
+                        help=f"Extra mm wiped around the disturbed sand (default {MARGIN:g})")
+    parser.add_argument('--cell', type=float, default=CELL_SIZE,
+                        help=f"Coverage grid resolution in mm (default {CELL_SIZE:g})")
+    parser.add_argument('--feed', type=float, default=FEED_RATE, help=f"Wipe feed rate in mm/min (default {FEED_RATE})")
+    parser.add_argument('--full', type=str, default=FULL_WIPE,
+                        help=f"Full-table wipe to compare against (default {FULL_WIPE})")
+    parser.add_argument('--settings', type=str, help="File with GRBL '$$' output (default: built-in settings)")
+    parser.add_argument('-o', '--output', type=str, help="Write the wipe G-code here instead of stdout")
+    parser.add_argument('gcode_file', help="The pattern on the table now")
+    args = parser.parse_args()
+
+    try:
+        settings = load_settings(args.settings) if args.settings else DEFAULT_SETTINGS
+        moves = parse_gcode(args.gcode_file)
+    except FileNotFoundError as e:
+        print(e)
+        sys.exit(1)
+
+    stats = {}
+    commands = plan_wipe(moves, args.ball, args.margin, cell=args.cell, feed=args.feed, settings=settings,
+                         stats=stats)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write('\n'.join(commands) + '\n')
+    else:
+        print('\n'.join(commands))
+
+    report = sys.stderr if not args.output else sys.stdout
+    disturbed = f"Disturbed {100.0 * stats['disturbed'] / stats['cells']:.1f}% of the table; "
+    if stats['strategy'] == 'smart':
+        print(disturbed + f"{stats['lines']} lines along {stats['orientation'].upper()} in "
+              f"{format_duration(stats['seconds'])}", file=report)
+    else:
+        print(disturbed + f"a smart wipe would be no faster, so full {stats['strategy']} wipe in "
+              f"{format_duration(stats['seconds'])}", file=report)
+    print(f"Full {stats['full_strategy']} wipe: {format_duration(stats['full_seconds'])}, "
+          f"{format_saving(stats['full_seconds'] - stats['seconds'])}", file=report)
+    grid = np.ones((int(np.ceil(TABLE_HEIGHT / args.cell)), int(np.ceil(TABLE_WIDTH / args.cell))), dtype=bool)
+    raster = wipe_time(wipe_gcode(wipe_points(grid, args.ball, cell=args.cell), args.feed), settings)
+    print(f"Full raster at the same spacing: {format_duration(raster)}, "
+          f"{format_saving(raster - stats['seconds'])}", file=report)
+    if os.path.exists(args.full):
+        full = float(plan_moves(parse_gcode(args.full), settings)['time'].sum())
+        print(f"Full wipe {args.full}: {format_duration(full)}, {format_saving(full - stats['seconds'])}",
+              file=report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+from simplify import simplify_commands
+
+def test_dropped_first_line_keeps_its_g1():
+    commands = ['G0 X0 Y0', 'G1 X1 Y0', 'X2 Y0', 'X3 Y0', 'X3 Y5']
+    assert list(simplify_commands(commands, 0.5)) == ['G0 X0 Y0', 'G1 X3 Y0', 'X3 Y5']
+
+def test_kept_first_line_is_verbatim():
+    commands = ['G0 X0 Y0', 'G1 X1 Y2', 'X2 Y0', 'X3 Y2']
+    assert list(simplify_commands(commands, 0.5)) == commands
+
+def test_stats_count_removed_lines():
+    stats = {}
+    list(simplify_commands(['G0 X0 Y0', 'G1 X1 Y0', 'X2 Y0', 'X3 Y0', 'X3 Y5'], 0.5, stats))
+    assert stats == {'input': 5, 'removed': 2}
@@ -0,0 +1,30 @@
+import numpy as np
+
+from gcode_parser import parse_commands
+from smart_wipe import CELL_SIZE, _stays_on_grid, coverage_grid, wipe_points
+
+def travel_segments(stats):
+    return [(a, b) for route in stats['travel'] for a, b in zip(route, route[1:])]
+
+def test_travel_stays_on_disturbed_sand():
+    # A C shape: runs along its top end far from the next ones down its back
+    moves = parse_commands(['G0 X700 Y50', 'G1 X100 Y50', 'G1 X100 Y300', 'G1 X700 Y300'])
+    grid = coverage_grid(moves)
+    for orientation in ('x', 'y'):
+        stats = {}
+        wipe_points(grid, orientation=orientation, start=(700.0, 300.0), stats=stats)
+        assert (stats['grid'] == grid).all()
+        assert any(len(route) > 2 for route in stats['travel'])  # Some had to go round
+        for a, b in travel_segments(stats):
+            assert _stays_on_grid(grid, CELL_SIZE, a, b), (orientation, a, b)
+
+def test_separate_pieces_are_joined_and_wiped():
+    grid = np.zeros((70, 170), dtype=bool)
+    grid[5:15, 10:30] = True
+    grid[50:60, 130:160] = True
+    stats = {}
+    points = wipe_points(grid, start=(60.0, 40.0), stats=stats)
+    assert points
+    assert (stats['grid'] >= grid).all() and stats['grid'].sum() > grid.sum()
+    for a, b in travel_segments(stats):
+        assert _stays_on_grid(stats['grid'], CELL_SIZE, a, b), (a, b)
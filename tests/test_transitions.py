@@ -0,0 +1,40 @@
+import math
+
+from transitions import DIRECT_DISTANCE, TABLE_HEIGHT, TABLE_WIDTH, edge_path, transition_commands
+
+def route_length(start, points):
+    return sum(math.dist(a, b) for a, b in zip([start] + points, points))
+
+def test_same_point_needs_no_move():
+    assert edge_path((100, 100), (100, 100)) == []
+    assert transition_commands((100, 100), (100, 100)) == []
+
+def test_close_points_move_straight():
+    assert edge_path((425, 175), (426, 176)) == [(426, 176)]
+    assert len(edge_path((100, 100), (100, 100.0000001))) <= 1  # No detour for a rounding-sized gap
+    assert edge_path((400, 175), (400 + DIRECT_DISTANCE, 175)) == [(400 + DIRECT_DISTANCE, 175)]
+
+def test_close_points_give_one_command():
+    assert transition_commands((425, 175), (426, 176), 1500) == ['G21', 'G90', 'G1 X426 Y176 F1500']
+
+def test_points_on_the_same_edge_stay_on_it():
+    assert edge_path((100, 0), (300, 0)) == [(300, 0)]
+    assert edge_path((800, 0), (850, 100)) == [(850.0, 0.0), (850, 100)]
+    assert edge_path((0, 300), (200, TABLE_HEIGHT)) == [(0.0, TABLE_HEIGHT), (200, TABLE_HEIGHT)]
+
+def test_points_near_the_edge_follow_it():
+    points = edge_path((100, 20), (700, 20))
+    assert points == [(100, 0.0), (700, 0.0), (700, 20)]
+
+def test_long_detour_moves_straight():
+    # Out to opposite edges and round the end of the table is far longer than straight across
+    points = edge_path((425, 150), (425, 200))
+    assert points == [(425, 200)]
+
+def test_edge_route_is_never_much_longer_than_direct():
+    for start, end in [((10, 10), (840, 340)), ((425, 175), (10, 300)), ((5, 175), (845, 175))]:
+        points = edge_path(start, end)
+        assert points[-1] == end
+        assert route_length(start, points) <= 3.0 * math.dist(start, end) + 1e-9
+        for x, y in points:
+            assert 0 <= x <= TABLE_WIDTH and 0 <= y <= TABLE_HEIGHT
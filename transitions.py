@@ -0,0 +1,157 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+
+from compact import format_number
+from gcode_parser import parse_gcode
+from pattern_cache import file_digest
+
+TABLE_WIDTH = 850  # mm
+TABLE_HEIGHT = 350  # mm
+FEED_RATE = 1000  # mm/min, used when the previous pattern never set one
+CACHE_DIR = os.path.expanduser('~/.cache/sand/transitions')
+CACHE_VERSION = 2  # Bump when the planned paths change
+DIRECT_DISTANCE = 10.0  # mm, about a ball width: closer points are joined by a straight move
+EDGE_DETOUR = 3.0  # Take the edge only while it is at most this many times the straight distance
+
+def move_endpoints(moves):
+    """((x, y) of the first known position, (x, y) of the last, feed at the end) of a MOVE_DTYPE array.
+
+    Points are None if there are no moves.
+    """
+    known = np.flatnonzero(~(np.isnan(moves['x']) | np.isnan(moves['y'])))
+    if not len(known):
+        return None, None, None
+    first, last = moves[known[0]], moves[known[-1]]
+    feed = float(moves['feed'][-1])
+    return ((float(first['x']), float(first['y'])), (float(last['x']), float(last['y'])),
+            None if math.isnan(feed) else feed)
+
+def endpoints(gcode_file):
+    """move_endpoints() of a pattern file.
+
+    The first position is where the pattern's lead-in move goes, e.g.
+    (426, 0) for 'G1 X426 y0'.
+    """
+    return move_endpoints(parse_gcode(gcode_file))
+
+def _edge_position(point, width, height):
+    """Nearest point on the table edge, and its distance clockwise from (0, 0) around the edge."""
+    x = min(max(point[0], 0.0), width)
+    y = min(max(point[1], 0.0), height)
+    # Distance to the bottom, right, top and left edge
+    gaps = [y, width - x, height - y, x]
+    edge = gaps.index(min(gaps))
+    if edge == 0:
+        return (x, 0.0), x
+    if edge == 1:
+        return (width, y), width + y
+    if edge == 2:
+        return (x, height), width + height + (width - x)
+    return (0.0, y), 2 * width + height + (height - y)
+
+def edge_path(start, end, width=TABLE_WIDTH, height=TABLE_HEIGHT):
+    """Points from start to end that run along the table edge as far as possible.
+
+    Each point goes straight out to its nearest edge, then the path follows
+    the perimeter the shorter way round, turning at the corners. The ball
+    has already ploughed the edge for most patterns, so the move leaves
+    little visible trace. The edge is only preferred: points within
+    DIRECT_DISTANCE of each other, or whose edge route is more than
+    EDGE_DETOUR times the straight distance, get a single straight move.
+    start itself is not included.
+    """
+    direct = math.dist(start, end)
+    if direct <= 1e-6:
+        return []
+    if direct <= DIRECT_DISTANCE:
+        return [end]
+    (out_point, out_s), (in_point, in_s) = _edge_position(start, width, height), _edge_position(end, width, height)
+    perimeter = 2 * (width + height)
+    corners = [((0.0, 0.0), 0.0), ((width, 0.0), width), ((width, height), width + height),
+               ((0.0, height), 2 * width + height)]
+    clockwise = (in_s - out_s) % perimeter
+    if clockwise <= perimeter / 2:
+        ahead = [((s - out_s) % perimeter, corner) for corner, s in corners]
+        length = clockwise
+    else:
+        ahead = [((out_s - s) % perimeter, corner) for corner, s in corners]
+        length = perimeter - clockwise
+    along = [corner for distance, corner in sorted(ahead) if 0 < distance < length]
+    path = [out_point] + along + [in_point, end]
+    # Drop points that don't move (start already on the edge, corners at the ends)
+    points = []
+    previous = start
+    route = 0.0
+    for point in path:
+        step = math.dist(point, previous)
+        if step > 1e-6:
+            points.append(point)
+            route += step
+            previous = point
+    if route > EDGE_DETOUR * direct:
+        return [end]
+    return points
+
+def transition_commands(start, end, feed=None, width=TABLE_WIDTH, height=TABLE_HEIGHT):
+    """G-code that moves the ball from start to end, along the table edge where that is worth it."""
+    points = edge_path(start, end, width, height)
+    if not points:
+        return []
+    commands = ['G21', 'G90']
+    for n, (x, y) in enumerate(points):
+        words = f"G1 X{format_number(round(x, 3))} Y{format_number(round(y, 3))}"
+        if n == 0:
+            words += f" F{format_number(feed or FEED_RATE)}"
+        commands.append(words)
+    return commands
+
+def plan_transition(previous_file, next_file, width=TABLE_WIDTH, height=TABLE_HEIGHT, cache_dir=CACHE_DIR):
+    """Commands that take the ball from where previous_file ends to where next_file starts.
+
+    The plan is cached per pattern pair, keyed on both files' contents and
+    the table size, so a playlist only parses each pair once. Returns an
+    empty list when either pattern has no known position.
+    """
+    key = hashlib.sha256(json.dumps([CACHE_VERSION, file_digest(previous_file), file_digest(next_file),
+                                     width, height]).encode()).hexdigest()[:32]
+    path = os.path.join(cache_dir, key + '.json')
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)['commands']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    _, end, feed = endpoints(previous_file)
+    start, _, _ = endpoints(next_file)
+    commands = [] if end is None or start is None else transition_commands(end, start, feed, width, height)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump({'from': os.path.abspath(previous_file), 'to': os.path.abspath(next_file),
+                   'commands': commands}, f)
+    os.replace(tmp, path)
+    return commands
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the edge-following transitions between consecutive patterns")
+    parser.add_argument('--width', type=float, default=TABLE_WIDTH, help=f"Table width in mm (default {TABLE_WIDTH})")
+    parser.add_argument('--height', type=float, default=TABLE_HEIGHT,
+                        help=f"Table height in mm (default {TABLE_HEIGHT})")
+    parser.add_argument('gcode_files', nargs='+', help="G-code files in playlist order")
+    args = parser.parse_args()
+
+    for previous_file, next_file in zip(args.gcode_files, args.gcode_files[1:]):
+        _, end, _ = endpoints(previous_file)
+        start, _, _ = endpoints(next_file)
+        commands = plan_transition(previous_file, next_file, args.width, args.height)
+        print(f"{previous_file} -> {next_file}: {end} -> {start}")
+        for cmd in commands:
+            print(f"  {cmd}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,9 @@
 #/bin/bash
 
-
-python send2.py patterns/wiper.py
-python send2.py $1
+# Queue on the sand daemon if it is running (no reconnect or reset between
+# patterns), otherwise send both files over a single connection.
+if python sand_daemon.py status >/dev/null 2>&1; then
+    python sand_daemon.py add patterns/wiper.gcode $1
+else
+    python send.py patterns/wiper.gcode $1
+fi
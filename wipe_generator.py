@@ -1,41 +1,40 @@
-# G-code generator for clearing an 850x350 mm sand table with horizontal lines
-# Starting at (0,0), draws lines every N mm (default 10 mm)
-
-# Table dimensions
-TABLE_WIDTH = 850  # mm
-TABLE_HEIGHT = 350  # mm
-LINE_SPACING = 10  # mm, distance between horizontal lines
-FEED_RATE = 1000    # mm/min, speed of movement (capped at 500 due to controller limit)
-
-# Note: If feed rate is still limited, check your controller's max feed rate setting
-
-# Generate G-code
-gcode = []
-# Initial setup: set units to mm, absolute positioning
-gcode.append("G21 ; Set units to millimeters")
-gcode.append("G90 ; Use absolute positioning")
-
-# Start at (0,0)
-gcode.append("G00 X0 Y0 ; Move to starting position")
-
-# Generate horizontal lines
-y = 0
-while y <= TABLE_HEIGHT:
-    # Move to start of line
-    gcode.append(f"G01 X0 Y{y} F{FEED_RATE} ; Draw line to left")
-    gcode.append(f"G01 X{TABLE_WIDTH} Y{y} F{FEED_RATE} ; Draw line to right")
-    y += LINE_SPACING
-    if y <= TABLE_HEIGHT:
-        gcode.append(f"G01 x{TABLE_WIDTH} Y{y} F{FEED_RATE} ; Shift down")
-        gcode.append(f"G01 X0 Y{y} F{FEED_RATE} ; Draw line to left")
-        y += LINE_SPACING
-
-# Lift tool and return to home
-gcode.append("G00 X0 Y0 ; Return to home")
-
-# Save G-code to file
-with open("sand_table_clear.gcode", "w") as f:
-    for line in gcode:
-        f.write(line + "\n")
-
-print("G-code generated and saved to 'sand_table_clear.gcode'")
\ No newline at end of file
+# G-code generator for clearing the sand table (see wipes.py for the strategies)
+# Writes the fastest full-table wipe for the ball and table size to a file
+
+import argparse
+
+from estimate import DEFAULT_SETTINGS, format_duration, load_settings
+from transitions import TABLE_HEIGHT, TABLE_WIDTH
+from wipes import BALL_DIAMETER, FEED_RATE, STRATEGIES, strategy_times, wipe
+
+OUTPUT_FILE = "sand_table_clear.gcode"
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate G-code that clears the sand table")
+    parser.add_argument('--strategy', choices=['auto'] + list(STRATEGIES), default='auto',
+                        help="Wipe pattern (default auto: the one with the lowest estimated time)")
+    parser.add_argument('--width', type=float, default=TABLE_WIDTH, help=f"Table width in mm (default {TABLE_WIDTH})")
+    parser.add_argument('--height', type=float, default=TABLE_HEIGHT,
+                        help=f"Table height in mm (default {TABLE_HEIGHT})")
+    parser.add_argument('--ball', type=float, default=BALL_DIAMETER,
+                        help=f"Ball diameter and line spacing in mm (default {BALL_DIAMETER:g})")
+    parser.add_argument('--feed', type=float, default=FEED_RATE, help=f"Feed rate in mm/min (default {FEED_RATE})")
+    parser.add_argument('--settings', type=str, help="File with GRBL '$$' output for the time estimates")
+    parser.add_argument('-o', '--output', type=str, default=OUTPUT_FILE, help=f"Output file (default {OUTPUT_FILE})")
+    args = parser.parse_args()
+
+    settings = load_settings(args.settings) if args.settings else DEFAULT_SETTINGS
+    times = strategy_times(args.width, args.height, args.ball, args.feed, settings)
+    strategy = min(times, key=times.get) if args.strategy == 'auto' else args.strategy
+    for name, seconds in times.items():
+        print(f"{'*' if name == strategy else ' '} {name}: {format_duration(seconds)}")
+
+    # Save G-code to file
+    with open(args.output, "w") as f:
+        for line in wipe(strategy, args.width, args.height, args.ball, args.feed):
+            f.write(line + "\n")
+
+    print(f"G-code generated and saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
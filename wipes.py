@@ -0,0 +1,120 @@
+import math
+from collections import deque
+
+from compact import format_number
+from estimate import plan_moves
+from gcode_parser import parse_commands
+from transitions import TABLE_HEIGHT, TABLE_WIDTH
+
+BALL_DIAMETER = 10.0  # mm, also the spacing of the wipe lines
+FEED_RATE = 2000  # mm/min, as in patterns/wiper.gcode
+
+def _offsets(length, spacing):
+    """Evenly spaced positions from 0 to length, no more than spacing apart."""
+    count = max(math.ceil(length / spacing), 1)
+    return [length * k / count for k in range(count + 1)]
+
+def _boustrophedon(along, across, spacing):
+    """(a, b) points of back-and-forth lines along the a axis, stepping along b."""
+    forward = True
+    for b in _offsets(across, spacing):
+        yield (0.0, b) if forward else (along, b)
+        yield (along, b) if forward else (0.0, b)
+        forward = not forward
+
+def raster(width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER):
+    """Back-and-forth lines across the short axis, stepping along the long one."""
+    if width >= height:
+        return ((x, y) for y, x in _boustrophedon(height, width, ball_diameter))
+    return _boustrophedon(width, height, ball_diameter)
+
+def zigzag(width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER):
+    """Back-and-forth lines along the long axis: fewer, longer strokes than raster()."""
+    if width >= height:
+        return _boustrophedon(width, height, ball_diameter)
+    return ((x, y) for y, x in _boustrophedon(height, width, ball_diameter))
+
+def spiral(width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER):
+    """Rectangular spiral from the outer edge inwards, rings one ball width apart."""
+    x0, y0, x1, y1 = 0.0, 0.0, float(width), float(height)
+    yield (x0, y0)
+    while True:
+        yield (x1, y0)
+        y0 += ball_diameter
+        if y0 > y1:
+            return
+        yield (x1, y1)
+        x1 -= ball_diameter
+        if x0 > x1:
+            return
+        yield (x0, y1)
+        y1 -= ball_diameter
+        if y0 > y1:
+            return
+        yield (x0, y0)
+        x0 += ball_diameter
+        if x0 > x1:
+            return
+
+def diagonal(width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER):
+    """45 degree back-and-forth hatch, like patterns/wiper.gcode, joined along the edges."""
+    def low(c):  # End of the line x + y = c on the bottom or right edge
+        x = min(c, width)
+        return (x, c - x)
+
+    def high(c):  # ... and on the left or top edge
+        y = min(c, height)
+        return (c - y, y)
+
+    previous = None
+    forward = True
+    for c in _offsets(width + height, ball_diameter * math.sqrt(2)):
+        first, last = (high(c), low(c)) if forward else (low(c), high(c))
+        # Turn the corner rather than cutting across it
+        if previous is not None:
+            if forward and previous < height < c:
+                yield (0.0, float(height))
+            elif not forward and previous < width < c:
+                yield (float(width), 0.0)
+        yield first
+        if last != first:
+            yield last
+        previous = c
+        forward = not forward
+
+STRATEGIES = {'raster': raster, 'zigzag': zigzag, 'spiral': spiral, 'diagonal': diagonal}
+
+def wipe_gcode(points, feed=FEED_RATE):
+    """Lazily yield G-code for a wipe through points."""
+    yield 'G21'
+    yield 'G90'
+    yield f"F{format_number(feed)}"
+    for x, y in points:
+        yield f"G1 X{format_number(round(x, 3))} Y{format_number(round(y, 3))}"
+
+def wipe_time(commands, settings=None, start=None):
+    """Estimated seconds to run commands (see estimate.py)."""
+    return float(plan_moves(parse_commands(list(commands)), settings, start)['time'].sum())
+
+def strategy_times(width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER, feed=FEED_RATE,
+                   settings=None):
+    """Estimated seconds of every strategy, by name."""
+    return {name: wipe_time(wipe_gcode(strategy(width, height, ball_diameter), feed), settings)
+            for name, strategy in STRATEGIES.items()}
+
+def best_strategy(width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER, feed=FEED_RATE,
+                  settings=None):
+    """Name of the strategy with the lowest estimated time for the table."""
+    times = strategy_times(width, height, ball_diameter, feed, settings)
+    return min(times, key=times.get)
+
+def wipe_end(strategy, width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER):
+    """(x, y) where a strategy's wipe leaves the ball."""
+    return deque(STRATEGIES[strategy](width, height, ball_diameter), maxlen=1)[0]
+
+def wipe(strategy='auto', width=TABLE_WIDTH, height=TABLE_HEIGHT, ball_diameter=BALL_DIAMETER, feed=FEED_RATE,
+         settings=None):
+    """Lazily yield the G-code of a full-table wipe; 'auto' picks the fastest strategy."""
+    if strategy == 'auto':
+        strategy = best_strategy(width, height, ball_diameter, feed, settings)
+    return wipe_gcode(STRATEGIES[strategy](width, height, ball_diameter), feed)